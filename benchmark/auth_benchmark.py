@@ -0,0 +1,123 @@
+# -*- coding=utf-8
+"""CosS3Auth签名速度对比
+
+对比旧版本(每次请求计算sign_key, 重新encode所有头部名称, 无条件构造调试日志)与当前CosS3Auth
+在upload_part请求上每秒可以计算的签名数, 两者在同一时间点的签名结果必须一致
+
+    python benchmark/auth_benchmark.py
+"""
+import os
+import sys
+import time
+import hmac
+import timeit
+import hashlib
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from requests import Request  # noqa: E402
+from six.moves.urllib.parse import quote, urlparse  # noqa: E402
+from qcloud_cos import CosConfig  # noqa: E402
+from qcloud_cos.cos_auth import CosS3Auth  # noqa: E402
+from qcloud_cos.cos_comm import to_bytes, to_str  # noqa: E402
+
+logger = logging.getLogger('legacy_auth')
+
+
+def legacy_filter_headers(data):
+    valid_headers = [
+        "cache-control", "content-disposition", "content-encoding", "content-type", "content-md5", "content-length",
+        "expect", "expires", "host", "if-match", "if-modified-since", "if-none-match", "if-unmodified-since", "origin",
+        "range", "transfer-encoding", "pic-operations",
+    ]
+    headers = {}
+    for i in data:
+        if str.lower(i) in valid_headers or str.lower(i).startswith("x-cos-") or str.lower(i).startswith("x-ci-"):
+            headers[i] = data[i]
+    return headers
+
+
+def legacy_sign(auth, r):
+    """旧版本CosS3Auth.__call__的实现"""
+    path = auth._path
+    uri_params = auth._params if auth._sign_params else {}
+    headers = legacy_filter_headers(r.headers)
+    if auth._sign_host:
+        contain_host = False
+        for i in headers:
+            if str.lower(i) == "host":
+                contain_host = True
+                break
+        if not contain_host:
+            url_parsed = urlparse(r.url)
+            if url_parsed.hostname is not None:
+                headers["host"] = url_parsed.hostname
+    headers = dict([(quote(to_bytes(to_str(k)), '-_.~').lower(), quote(to_bytes(to_str(v)), '-_.~')) for k, v in
+                    headers.items()])
+    uri_params = dict([(quote(to_bytes(to_str(k)), '-_.~').lower(), quote(to_bytes(to_str(v)), '-_.~')) for k, v in
+                       uri_params.items()])
+    format_str = u"{method}\n{host}\n{params}\n{headers}\n".format(
+        method=r.method.lower(),
+        host=path,
+        params='&'.join(map(lambda tupl: "%s=%s" % (tupl[0], tupl[1]), sorted(uri_params.items()))),
+        headers='&'.join(map(lambda tupl: "%s=%s" % (tupl[0], tupl[1]), sorted(headers.items())))
+    )
+    logger.debug("format str: " + format_str)
+    start_sign_time = int(time.time())
+    sign_time = "{bg_time};{ed_time}".format(bg_time=start_sign_time - 60, ed_time=start_sign_time + auth._expire)
+    sha1 = hashlib.sha1()
+    sha1.update(to_bytes(format_str))
+    str_to_sign = "sha1\n{time}\n{sha1}\n".format(time=sign_time, sha1=sha1.hexdigest())
+    logger.debug('str_to_sign: ' + str(str_to_sign))
+    sign_key = hmac.new(to_bytes(auth._secret_key), to_bytes(sign_time), hashlib.sha1).hexdigest()
+    sign = hmac.new(to_bytes(sign_key), to_bytes(str_to_sign), hashlib.sha1).hexdigest()
+    logger.debug('sign_key: ' + str(sign_key))
+    logger.debug('sign: ' + str(sign))
+    sign_tpl = "q-sign-algorithm=sha1&q-ak={ak}&q-sign-time={sign_time}&q-key-time={key_time}&q-header-list={headers}&q-url-param-list={params}&q-signature={sign}"
+    r.headers['Authorization'] = sign_tpl.format(
+        ak=auth._secret_id, sign_time=sign_time, key_time=sign_time, params=';'.join(sorted(uri_params.keys())),
+        headers=';'.join(sorted(headers.keys())), sign=sign)
+    logger.debug("sign_key" + str(sign_key))
+    logger.debug(r.headers['Authorization'])
+    logger.debug("request headers: " + str(r.headers))
+    return r
+
+
+def make_request():
+    headers = {
+        'Content-Length': '1048576',
+        'Content-MD5': '1B2M2Y8AsgTpgAmY7PhCfg==',
+        'Content-Type': 'application/octet-stream',
+        'User-Agent': 'cos-python-sdk-v5',
+        'Accept-Encoding': 'gzip, deflate',
+        'x-cos-meta-author': 'benchmark',
+        'x-cos-traffic-limit': '819200',
+    }
+    url = 'https://examplebucket-1250000000.cos.ap-guangzhou.myqcloud.com/dir/object.dat'
+    return Request('PUT', url, headers=headers).prepare()
+
+
+def bench(number):
+    conf = CosConfig(Region='ap-guangzhou', SecretId='AKIDEXAMPLE', SecretKey='SecretKeyExample')
+    params = {'partNumber': '1', 'uploadId': '1585130821cbb7df1d11846c073ad648e8f33b087cec2381df437acdc833cf654b9ecc6361'}
+    auth = CosS3Auth(conf, 'dir/object.dat', params)
+    r = make_request()
+
+    now = int(time.time())
+    real_time = time.time
+    time.time = lambda: now  # 固定签名时间, 比较两种实现的结果
+    try:
+        assert legacy_sign(auth, r).headers['Authorization'] == auth(r).headers['Authorization']
+    finally:
+        time.time = real_time
+
+    legacy = min(timeit.repeat(lambda: legacy_sign(auth, r), number=number, repeat=3)) / number
+    current = min(timeit.repeat(lambda: auth(r), number=number, repeat=3)) / number
+    print('{name:<24} legacy: {legacy:10.0f} sign/s  current: {current:10.0f} sign/s  speedup: {speedup:.2f}x'.format(
+        name='upload_part', legacy=1 / legacy, current=1 / current, speedup=legacy / current))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
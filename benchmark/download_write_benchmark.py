@@ -0,0 +1,100 @@
+# -*- coding=utf-8
+"""分块下载写入本地文件的吞吐对比
+
+模拟ResumableDownLoader的写入过程, 不发送网络请求, 数据来自内存:
+legacy为每个分块重新打开临时文件, seek后通过pget_stream_to_file写入;
+pwrite为预分配临时文件后所有线程共享一个fd, 通过pwrite_stream_to_fd按绝对偏移写入.
+
+    python benchmark/download_write_benchmark.py [文件大小GB] [分块大小MB] [线程数] [目录]
+"""
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from qcloud_cos.streambody import StreamBody  # noqa: E402
+
+CHUNK = os.urandom(1024 * 1024)
+
+
+class FakeResponse(object):
+    """模拟requests的响应, iter_content依次返回内存中的数据"""
+
+    def __init__(self, length):
+        self.headers = {'Content-Length': str(length)}
+        self._remain = length
+
+    def iter_content(self, chunk_size):
+        while self._remain > 0:
+            size = min(chunk_size, self._remain, len(CHUNK))
+            self._remain -= size
+            yield CHUNK[:size]
+
+
+def split_parts(file_size, part_size):
+    return [(offset, min(part_size, file_size - offset)) for offset in range(0, file_size, part_size)]
+
+
+def legacy_write(path, file_size, parts, threads):
+    open(path, 'a').close()
+
+    def _write(part):
+        offset, length = part
+        with open(path, 'rb+') as f:
+            f.seek(offset, 0)
+            StreamBody(FakeResponse(length)).pget_stream_to_file(f, offset, length)
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(_write, parts))
+
+
+def pwrite_write(path, file_size, parts, threads):
+    fd = os.open(path, os.O_RDWR | os.O_CREAT)
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, file_size)
+        else:
+            os.ftruncate(fd, file_size)
+
+        def _write(part):
+            offset, length = part
+            StreamBody(FakeResponse(length)).pwrite_stream_to_fd(fd, offset, length)
+
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(_write, parts))
+    finally:
+        os.close(fd)
+
+
+def bench(name, func, directory, file_size, parts, threads):
+    path = os.path.join(directory, 'download_write_benchmark_' + uuid.uuid4().hex)
+    try:
+        start = time.time()
+        func(path, file_size, parts, threads)
+        elapsed = time.time() - start
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    print('{name:<8} {seconds:8.3f}s {speed:8.3f} GB/s'.format(
+        name=name, seconds=elapsed, speed=file_size / elapsed / 1024 ** 3))
+
+
+def main():
+    file_size = int(float(sys.argv[1] if len(sys.argv) > 1 else 2) * 1024 ** 3)
+    part_size = int(sys.argv[2] if len(sys.argv) > 2 else 20) * 1024 * 1024
+    threads = int(sys.argv[3] if len(sys.argv) > 3 else 10)
+    directory = sys.argv[4] if len(sys.argv) > 4 else '.'
+    if not hasattr(os, 'pwrite'):
+        print('os.pwrite is not supported on this platform')
+        return
+    parts = split_parts(file_size, part_size)
+    print('file size: {0} MB, parts: {1}, threads: {2}'.format(file_size // 1024 // 1024, len(parts), threads))
+    bench('legacy', legacy_write, directory, file_size, parts, threads)
+    bench('pwrite', pwrite_write, directory, file_size, parts, threads)
+
+
+if __name__ == '__main__':
+    main()
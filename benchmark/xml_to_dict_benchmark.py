@@ -0,0 +1,101 @@
+# -*- coding=utf-8
+"""xml_to_dict解析耗时对比
+
+对比旧版本(Xml2Dict + str + replace + eval)与当前xml_to_dict在单页list_objects,
+list_objects_versions和list_parts响应上的耗时
+
+    python benchmark/xml_to_dict_benchmark.py
+"""
+import os
+import sys
+import timeit
+import xml.etree.ElementTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from qcloud_cos.cos_comm import xml_to_dict, format_dict, decode_result  # noqa: E402
+from qcloud_cos.xml2dict import Xml2Dict  # noqa: E402
+
+NAMESPACE = 'http://www.qcloud.com/document/product/436/7751'
+
+
+def legacy_xml_to_dict(data, origin_str="", replace_str=""):
+    """旧版本的实现"""
+    root = xml.etree.ElementTree.fromstring(data)
+    xmldict = Xml2Dict(root)
+    xmlstr = str(xmldict)
+    xmlstr = xmlstr.replace("{http://www.qcloud.com/document/product/436/7751}", "")
+    xmlstr = xmlstr.replace("{https://cloud.tencent.com/document/product/436}", "")
+    xmlstr = xmlstr.replace("{http://doc.s3.amazonaws.com/2006-03-01}", "")
+    xmlstr = xmlstr.replace("{http://s3.amazonaws.com/doc/2006-03-01/}", "")
+    xmlstr = xmlstr.replace("{http://www.w3.org/2001/XMLSchema-instance}", "")
+    if origin_str:
+        xmlstr = xmlstr.replace(origin_str, replace_str)
+    return eval(xmlstr)
+
+
+def gen_list_objects_page(count=1000):
+    items = []
+    for i in range(count):
+        items.append(
+            '<Contents><Key>prefix%2Fdir%2Fobject-{i:06d}.dat</Key>'
+            '<LastModified>2024-01-01T00:00:00.000Z</LastModified>'
+            '<ETag>&quot;d41d8cd98f00b204e9800998ecf8427e&quot;</ETag><Size>{i}</Size>'
+            '<Owner><ID>1250000000</ID><DisplayName>1250000000</DisplayName></Owner>'
+            '<StorageClass>STANDARD</StorageClass></Contents>'.format(i=i))
+    return ('<?xml version="1.0" encoding="UTF-8"?><ListBucketResult xmlns="{ns}"><Name>examplebucket-1250000000</Name>'
+            '<EncodingType>url</EncodingType><Prefix>prefix%2F</Prefix><Marker></Marker><MaxKeys>1000</MaxKeys>'
+            '<IsTruncated>true</IsTruncated><NextMarker>prefix%2Fdir%2Fobject-000999.dat</NextMarker>{items}'
+            '</ListBucketResult>').format(ns=NAMESPACE, items=''.join(items)).encode('utf-8')
+
+
+def gen_list_versions_page(count=1000):
+    items = []
+    for i in range(count):
+        items.append(
+            '<Version><Key>object-{i:06d}.dat</Key><VersionId>MTg0NDUxNzc2ODQ{i:06d}</VersionId>'
+            '<IsLatest>true</IsLatest><LastModified>2024-01-01T00:00:00.000Z</LastModified>'
+            '<ETag>&quot;d41d8cd98f00b204e9800998ecf8427e&quot;</ETag><Size>{i}</Size>'
+            '<StorageClass>STANDARD</StorageClass><Owner><ID>1250000000</ID>'
+            '<DisplayName>1250000000</DisplayName></Owner></Version>'.format(i=i))
+    return ('<?xml version="1.0" encoding="UTF-8"?><ListVersionsResult xmlns="{ns}"><Name>examplebucket-1250000000</Name>'
+            '<EncodingType>url</EncodingType><Prefix></Prefix><KeyMarker></KeyMarker><VersionIdMarker></VersionIdMarker>'
+            '<MaxKeys>1000</MaxKeys><IsTruncated>false</IsTruncated>{items}'
+            '</ListVersionsResult>').format(ns=NAMESPACE, items=''.join(items)).encode('utf-8')
+
+
+def gen_list_parts_page(count=1000):
+    items = []
+    for i in range(1, count + 1):
+        items.append(
+            '<Part><PartNumber>{i}</PartNumber><LastModified>2024-01-01T00:00:00.000Z</LastModified>'
+            '<ETag>&quot;d41d8cd98f00b204e9800998ecf8427e&quot;</ETag><Size>1048576</Size></Part>'.format(i=i))
+    return ('<?xml version="1.0" encoding="UTF-8"?><ListPartsResult xmlns="{ns}"><Bucket>examplebucket-1250000000</Bucket>'
+            '<EncodingType>url</EncodingType><Key>object.dat</Key><UploadId>1585130821cbb7df1d</UploadId>'
+            '<StorageClass>STANDARD</StorageClass><PartNumberMarker>0</PartNumberMarker>'
+            '<NextPartNumberMarker>{count}</NextPartNumberMarker><MaxParts>1000</MaxParts>'
+            '<IsTruncated>false</IsTruncated>{items}</ListPartsResult>').format(
+                ns=NAMESPACE, count=count, items=''.join(items)).encode('utf-8')
+
+
+def bench(name, data, format_keys, decode_keys, number):
+    def run(parser):
+        result = parser(data)
+        format_dict(result, format_keys)
+        decode_result(result, decode_keys[0], decode_keys[1])
+        return result
+
+    assert run(legacy_xml_to_dict) == run(xml_to_dict)
+    legacy = min(timeit.repeat(lambda: run(legacy_xml_to_dict), number=number, repeat=3)) / number
+    current = min(timeit.repeat(lambda: run(xml_to_dict), number=number, repeat=3)) / number
+    print('{name:<24} legacy: {legacy:8.2f} ms/page  current: {current:8.2f} ms/page  speedup: {speedup:.2f}x'.format(
+        name=name, legacy=legacy * 1000, current=current * 1000, speedup=legacy / current))
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    bench('list_objects', gen_list_objects_page(), ['Contents', 'CommonPrefixes'],
+          (['Prefix', 'Marker', 'NextMarker'], [['Contents', 'Key'], ['CommonPrefixes', 'Prefix']]), number)
+    bench('list_objects_versions', gen_list_versions_page(), ['Version', 'DeleteMarker', 'CommonPrefixes'],
+          (['Prefix', 'KeyMarker', 'NextKeyMarker'], [['Version', 'Key'], ['DeleteMarker', 'Key']]), number)
+    bench('list_parts', gen_list_parts_page(), ['Part'], (['Key'], []), number)
@@ -5,7 +5,8 @@
 1. 删除cos目录
 2. 多线程上传本地目录下的文件
 3. 批量删除cos对象
-4. 移动对象
+4. 批量查询对象元数据
+5. 移动对象
 '''
 
 from qcloud_cos import CosConfig
@@ -13,7 +14,6 @@ from qcloud_cos import CosS3Client
 from qcloud_cos import CosServiceError
 from qcloud_cos import CosClientError
 from qcloud_cos.cos_exception import CosException
-from qcloud_cos.cos_threadpool import SimpleThreadPool
 
 import sys
 import os
@@ -53,30 +53,17 @@ except CosServiceError as e:
 
 uploadDir = '/root/logs'
 
-g = os.walk(uploadDir)
-# 创建上传的线程池
-pool = SimpleThreadPool()
-for path, dir_list, file_list in g:
-    for file_name in file_list:
-        srcKey = os.path.join(path, file_name)
-        cosObjectKey = srcKey.strip('/')
-        # 判断COS上文件是否存在
-        exists = False
-        try:
-            response = client.head_object(Bucket=bucket, Key=cosObjectKey)
-            exists = True
-        except CosServiceError as e:
-            if e.get_status_code() == 404:
-                exists = False
-            else:
-                print("Error happened, reupload it.")
-        if not exists:
-            print("File %s not exists in cos, upload it", srcKey)
-            pool.add_task(client.upload_file, bucket, cosObjectKey, srcKey)
-
-pool.wait_completion()
-result = pool.get_result()
-if not result['success_all']:
+# 上传本地目录, 只列举一次cos上的文件判断是否已经上传, 不需要逐个文件head_object
+# 小文件简单上传, 大文件分块上传, 共用同一组并发
+response = client.upload_directory(
+    Bucket=bucket,
+    LocalDir=uploadDir,
+    Prefix='root/logs/',
+    MAXThread=10,
+    SkipUnchanged=True
+)
+print("upload files: %d, skipped: %d, %.2f files/s" % (response['Files'], response['Skipped'], response['FilesPerSecond']))
+if response['Failed']:
     print("Not all files upload sucessed. you should retry")
 
 # 删除指定前缀 (prefix)的文件
@@ -106,6 +93,16 @@ while not is_over:
         print(e.get_request_id())
         break
 
+# 批量查询对象元数据, 并发head_object, 不存在或查询失败的对象不会抛出异常
+keys = ['root/logs/a.log', 'root/logs/b.log', 'root/logs/c.log']
+for result in client.head_objects(Bucket=bucket, Keys=keys, MAXThread=10, Ordered=False):
+    if result['Exists']:
+        print("object: %s, size: %s" % (result['Key'], result['Metadata']['Content-Length']))
+    elif result['Error'] is None:
+        print("object: %s not exists" % result['Key'])
+    else:
+        print("head object %s failed: %s" % (result['Key'], result['Error']))
+
 # 移动对象
 srcKey = 'demo.py'  # 原始的对象路径
 destKey = 'dest_object_key'  # 目的对象路径
@@ -108,4 +108,22 @@ def delete_files(file_infos):
     response = client.delete_objects(Bucket=bucket, Delete={"Object": delete_list})
     print(response)
 
-delete_cos_dir()
\ No newline at end of file
+
+# 使用delete_prefix删除目录, 边列举边按1000个一批并发删除, 只重试删除失败的对象
+def delete_cos_dir_with_delete_prefix():
+    response = client.delete_prefix(Bucket=bucket, Prefix=folder, MAXThread=10)
+    print(response['Deleted'], response['DeletedPerSecond'])
+    for failed in response['Failed']:
+        print(failed['Key'], failed['Code'], failed['Message'])
+
+
+# 开启了版本控制的存储桶, 删除目录下所有历史版本和删除标记, 删除后无法恢复
+def delete_cos_dir_all_versions():
+    response = client.delete_prefix(Bucket=bucket, Prefix=folder, Versions=True)
+    print(response['Deleted'])
+
+
+if __name__ == "__main__":
+    delete_cos_dir()
+    # delete_cos_dir_with_delete_prefix()
+    # delete_cos_dir_all_versions()
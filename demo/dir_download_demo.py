@@ -36,29 +36,20 @@ delimiter = ''
 def listCurrentDir(prefix):
     file_infos = []
     sub_dirs = []
-    marker = ""
-    count = 1
-    while True:
-        response = client.list_objects(test_bucket, prefix, delimiter, marker)
+    # iter_objects自动翻页, 处理当前页的同时在后台预取下一页
+    for page in client.iter_objects(test_bucket, prefix, delimiter).pages():
         # 调试输出
-        # json_object = json.dumps(response, indent=4)
-        # print(count, " =======================================")
+        # json_object = json.dumps(page, indent=4)
         # print(json_object)
-        count += 1
 
-        if "CommonPrefixes" in response:
-            common_prefixes = response.get("CommonPrefixes")
+        if "CommonPrefixes" in page:
+            common_prefixes = page.get("CommonPrefixes")
             sub_dirs.extend(common_prefixes)
 
-        if "Contents" in response:
-            contents = response.get("Contents")
+        if "Contents" in page:
+            contents = page.get("Contents")
             file_infos.extend(contents)
 
-        if "NextMarker" in response.keys():
-            marker = response["NextMarker"]
-        else:
-            break
-
     print("=======================================================")
 
     # 如果 delimiter 设置为 "/"，则需要进行递归处理子目录，
@@ -131,5 +122,21 @@ def downLoadDirFromCos(prefix):
     return None
 
 
+# 使用download_directory下载目录, 边列举边下载, 不需要逐个对象head_object, 大文件分块并发下载
+def downLoadDirFromCosStream(prefix):
+    response = client.download_directory(
+        Bucket=test_bucket,
+        Prefix=prefix,
+        LocalDir="./download/" + prefix,
+        MAXThread=10,
+        SkipUnchanged=True  # 跳过本地已经下载过的文件
+    )
+    print("download files: %d, skipped: %d, %.2f MB/s" % (
+        response['Files'], response['Skipped'], response['BytesPerSecond'] / 1024 / 1024))
+    for failed in response['Failed']:
+        print("download failed: %s, %s" % (failed['Key'], failed['Error']))
+    return None
+
+
 if __name__ == "__main__":
-    downLoadDirFromCos(start_prefix)
+    downLoadDirFromCosStream(start_prefix)
@@ -256,3 +256,25 @@ for i in range(retry + 1):
     # 请求结束, 打印结果并退出循环
     print(response)
     break
+
+# 批量生成下载 URL, 与逐个调用 get_presigned_download_url 的结果一致, 适用于大量 key
+keys = ['exampleobject_%d' % i for i in range(1000)]
+urls = client.generate_presigned_urls(
+    Bucket='examplebucket-1250000000',
+    Keys=keys,
+    Method='GET',
+    Expired=3600
+)
+for key, url in zip(keys, urls):
+    print(key, url)
+
+# 热点对象重复生成 URL 时开启缓存, 剩余有效时间不少于 PresignedUrlMinValidity 秒时直接返回缓存的 URL
+cache_config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token,
+                         PresignedUrlCacheSize=10000, PresignedUrlMinValidity=60)
+cache_client = CosS3Client(cache_config)
+url = cache_client.get_presigned_download_url(
+    Bucket='examplebucket-1250000000',
+    Key='exampleobject',
+    Expired=3600
+)
+print(url)
@@ -0,0 +1,933 @@
+# -*- coding=utf-8
+"""基于asyncio的COS客户端, 仅支持python3.5及以上版本, 依赖aiohttp"""
+
+import asyncio
+import logging
+import os
+import re
+import ssl
+from requests import Request
+from six.moves.urllib.parse import urlparse
+from .cos_auth import CosS3Auth
+from .cos_comm import *
+from .cos_exception import CosClientError
+from .cos_exception import CosServiceError
+from .version import __version__
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+
+def _headers_to_dict(rt):
+    """aiohttp会规范化头部的大小写(如ETag变为Etag), 这里使用原始头部以和同步client的返回保持一致"""
+    return dict([(to_unicode(k), to_unicode(v)) for k, v in rt.raw_headers])
+
+
+if aiohttp is not None:
+    class _FileBodyPayload(aiohttp.payload.Payload):
+        """文件流请求体
+
+        aiohttp自带的文件payload发送后会关闭文件, 并且会附加Content-Disposition头部. 这里每次发送前回到
+        记录的文件位置, 发送size字节后不关闭文件, 与同步client一样由调用方管理文件, 失败后也可以重新发送.
+        """
+
+        def __init__(self, fp, position, size):
+            super(_FileBodyPayload, self).__init__(fp)
+            self._position = position
+            self._size = size
+
+        def decode(self, encoding='utf-8', errors='strict'):
+            raise TypeError('file body can not be decoded')
+
+        async def write(self, writer):
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._value.seek, self._position)
+            remaining = self._size
+            while remaining > 0:
+                chunk = await loop.run_in_executor(None, self._value.read, min(remaining, 64 * 1024))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await writer.write(to_bytes(chunk))
+
+
+class AsyncStreamBody(object):
+    """get_object返回的异步文件流"""
+
+    def __init__(self, rt):
+        self._rt = rt
+        self._read_len = 0
+        self._content_len = 0
+        self._use_chunked = False
+        self._use_encoding = False
+        if 'Content-Length' in self._rt.headers:
+            self._content_len = int(self._rt.headers['Content-Length'])
+        elif 'Transfer-Encoding' in self._rt.headers and self._rt.headers['Transfer-Encoding'] == "chunked":
+            self._use_chunked = True
+        else:
+            raise IOError("create AsyncStreamBody failed without Content-Length header or Transfer-Encoding header")
+
+        if 'Content-Encoding' in self._rt.headers:
+            self._use_encoding = True
+
+    def __len__(self):
+        return self._content_len
+
+    def __aiter__(self):
+        """提供一个默认的异步迭代器"""
+        return self.get_stream(1024).__aiter__()
+
+    def get_raw_stream(self):
+        """提供原始流, 类型为aiohttp.StreamReader"""
+        return self._rt.content
+
+    def get_stream(self, chunk_size=1024):
+        """提供一个chunk可变的异步迭代器"""
+        return self._rt.content.iter_chunked(chunk_size)
+
+    async def read(self, chunk_size=1024):
+        """读取最多chunk_size字节, 读到结尾时返回b''"""
+        chunk = await self._rt.content.read(chunk_size)
+        self._read_len += len(chunk)
+        return chunk
+
+    async def get_stream_to_file(self, file_name, disable_tmp_file=False):
+        """保存流到本地文件"""
+        self._read_len = 0
+        tmp_file_name = "{file_name}_{uuid}".format(file_name=file_name, uuid=os.urandom(16).hex())
+        if disable_tmp_file:
+            tmp_file_name = file_name
+        chunk_size = 1024 * 1024
+        try:
+            with open(tmp_file_name, 'wb') as fp:
+                async for chunk in self._rt.content.iter_chunked(chunk_size):
+                    self._read_len += len(chunk)
+                    fp.write(chunk)
+        finally:
+            self.close()
+
+        if not self._use_chunked and self._read_len != self._content_len:
+            if os.path.exists(tmp_file_name):
+                os.remove(tmp_file_name)
+            raise IOError("download failed with incomplete file")
+        if file_name != tmp_file_name:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+            os.rename(tmp_file_name, file_name)
+
+    def close(self):
+        """释放连接, 未读完的数据会被丢弃"""
+        self._rt.release()
+
+
+class AsyncCosS3Client(object):
+    """asyncio版本的cos客户端, 签名/重试/域名切换的行为与CosS3Client保持一致
+
+    .. code-block:: python
+
+        config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+        async with AsyncCosS3Client(config, max_connections=1000) as client:
+            response = await client.put_object(Bucket='bucket', Body=b'content', Key='test.txt')
+            response = await client.get_object(Bucket='bucket', Key='test.txt')
+            async for chunk in response['Body']:
+                pass
+    """
+
+    def __init__(self, conf, retry=3, session=None, max_connections=None):
+        """初始化client对象
+
+        :param conf(CosConfig): 用户的配置.
+        :param retry(int): 失败重试的次数.
+        :param session(aiohttp.ClientSession): http session, 不传时由client创建并在close时关闭.
+        :param max_connections(int): 连接池的最大连接数, 同时也是最大的并发请求数, 不传时使用CosConfig中的PoolMaxSize.
+        """
+        if aiohttp is None:
+            raise CosClientError('AsyncCosS3Client requires aiohttp, please install it with "pip install aiohttp"')
+        self._conf = conf
+        self._retry = retry
+        self._retry_exe_times = 0
+        self._max_connections = max_connections if max_connections else conf._pool_maxsize
+        self._session = session
+        self._own_session = session is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """关闭client创建的连接池"""
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def get_conf(self):
+        """获取配置"""
+        return self._conf
+
+    def get_retry_exe_times(self):
+        """获取重试已执行次数"""
+        return self._retry_exe_times
+
+    def _get_session(self):
+        """在事件循环中延迟创建连接池"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self._max_connections,
+                force_close=not self._conf._keep_alive,
+                ssl=self._get_ssl_context())
+            # 与requests的默认行为保持一致, 不自动解压Content-Encoding
+            self._session = aiohttp.ClientSession(connector=connector, auto_decompress=False)
+        return self._session
+
+    def _get_ssl_context(self):
+        """根据VerifySSL和SSLCert生成ssl配置"""
+        if self._conf._scheme != 'https':
+            return None
+        verify = self._conf._verify_ssl
+        cert = self._conf._ssl_cert
+        if verify is None and cert is None:
+            return None
+        if verify is False:
+            ctx = ssl.create_default_context()
+            ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE
+        elif isinstance(verify, string_types):
+            ctx = ssl.create_default_context(cafile=verify)
+        else:
+            ctx = ssl.create_default_context()
+        if cert is not None:
+            if isinstance(cert, tuple):
+                ctx.load_cert_chain(cert[0], cert[1])
+            else:
+                ctx.load_cert_chain(cert)
+        return ctx
+
+    def _get_proxy(self, url):
+        proxies = self._conf._proxies
+        if not proxies:
+            return None
+        return proxies.get(urlparse(url).scheme)
+
+    def should_switch_domain(self, url, headers={}):
+        host = urlparse(url).hostname
+        if 'x-cos-request-id' not in headers and \
+                self._conf._auto_switch_domain_on_retry and \
+                re.match(r'^([a-z0-9-]+-[0-9]+\.)(cos\.[a-z]+-[a-z]+(-[a-z]+)?(-1)?)\.(myqcloud\.com)$', host):
+            return True
+        return False
+
+    async def send_request(self, method, url, bucket=None, timeout=30, cos_request=True, ci_request=False, appid=None,
+                           auth=None, headers=None, params=None, data=None, stream=False):
+        """封装aiohttp发起http请求, 重试和错误处理逻辑与CosS3Client.send_request一致"""
+        if self._conf._timeout is not None:  # 用户自定义超时时间
+            timeout = self._conf._timeout
+        headers = dict() if headers is None else headers
+        if self._conf._ua is not None:
+            headers['User-Agent'] = self._conf._ua
+        else:
+            headers['User-Agent'] = 'cos-python-sdk-v' + __version__
+        if self._conf._token is not None:
+            if ci_request:
+                headers['x-ci-security-token'] = self._conf._token
+            else:
+                headers['x-cos-security-token'] = self._conf._token
+        if self._conf._ip is not None:  # 使用IP访问时需要设置请求host
+            if self._conf._domain is not None:
+                headers['Host'] = self._conf._domain
+            elif bucket is not None:
+                headers['Host'] = self._conf.get_host(Bucket=bucket)
+            elif appid is not None:
+                headers['Host'] = self._conf.get_host(Appid=appid)
+        if self._conf._keep_alive is False:
+            headers['Connection'] = 'close'
+        # aiohttp只接受str类型的头部和参数
+        headers = dict([(k, to_unicode(to_str(v))) for k, v in headers.items()])
+        if params:
+            params = dict([(k, to_unicode(to_str(v))) for k, v in params.items()])
+
+        file_position = None
+        file_size = None
+        if data is not None:
+            if hasattr(data, 'tell') and hasattr(data, 'seek') and hasattr(data, 'read'):
+                try:
+                    file_position = data.tell()  # 记录文件当前位置
+                    if 'Content-Length' in headers:
+                        file_size = int(headers['Content-Length'])
+                    else:
+                        data.seek(0, os.SEEK_END)
+                        file_size = data.tell() - file_position
+                        data.seek(file_position)
+                except Exception as ioe:
+                    file_position = None
+            data = to_bytes(data)
+
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        allow_redirects = self._conf._allow_redirects if self._conf._allow_redirects is not None else True
+        session = self._get_session()
+        exception_logbuf = list()  # 记录每次重试的错误日志
+        retry_kwargs = {'data': data} if data is not None else {}
+
+        res = None
+        for j in range(self._retry + 1):
+            try:
+                if j != 0:
+                    if client_can_retry(file_position, **retry_kwargs):
+                        headers['x-cos-sdk-retry'] = 'true'  # SDK重试标记
+                        self._retry_exe_times += 1
+                        await asyncio.sleep(j)
+                    else:
+                        break
+                req_headers = dict(headers)
+                if auth is not None:
+                    # 复用CosS3Auth的签名逻辑, 每次重试重新计算签名
+                    req_headers = dict(auth(Request(method, url, headers=req_headers)).headers)
+                logger.debug("send request: url: {}, headers: {}".format(url, req_headers))
+                body = data
+                if file_position is not None:
+                    # 每次发送使用新的payload, 从记录的位置开始读取, 不关闭调用方的文件
+                    body = _FileBodyPayload(data, file_position, file_size)
+                res = await session.request(
+                    method, url, headers=req_headers, params=params, data=body, timeout=client_timeout,
+                    allow_redirects=allow_redirects, proxy=self._get_proxy(url))
+                logger.debug("recv response: status_code: {}, headers: {}".format(res.status, res.headers))
+                if res.status < 400:  # 2xx和3xx都认为是成功的
+                    if res.status == 301 or res.status == 302 or res.status == 307:
+                        if j < self._retry and self.should_switch_domain(url, res.headers):
+                            res.release()
+                            url = switch_hostname_for_url(url)
+                            continue
+                    if not stream:
+                        await res.read()
+                    return res
+                await res.read()
+                if res.status < 500:  # 4xx 不重试
+                    break
+                else:
+                    if j == (self._retry - 1) and self.should_switch_domain(url, res.headers):
+                        url = switch_hostname_for_url(url)
+                    continue
+            except Exception as e:  # 捕获aiohttp抛出的如timeout等客户端错误,转化为客户端错误
+                logger.debug("recv exception: {}".format(e))
+                exception_log = 'url:%s, retry_time:%d exception:%s' % (url, j, str(e))
+                exception_logbuf.append(exception_log)
+                if j < self._retry and isinstance(e, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):  # 只重试网络错误
+                    if j == (self._retry - 1) and self.should_switch_domain(url):
+                        url = switch_hostname_for_url(url)
+                    continue
+                logger.exception(exception_logbuf)  # 最终重试失败, 输出前几次重试失败的exception
+                raise CosClientError(str(e))
+
+        if not cos_request:
+            return res
+        if res.status >= 400:  # 所有的4XX,5XX都认为是COSServiceError
+            if method == 'HEAD' and res.status == 404:  # Head 需要处理
+                info = dict()
+                info['code'] = 'NoSuchResource'
+                info['message'] = 'The Resource You Head Not Exist'
+                info['resource'] = url
+                if 'x-cos-request-id' in res.headers:
+                    info['requestid'] = res.headers['x-cos-request-id']
+                if 'x-cos-trace-id' in res.headers:
+                    info['traceid'] = res.headers['x-cos-trace-id']
+                logger.warning(info)
+                if len(exception_logbuf) > 0:
+                    logger.exception(exception_logbuf)
+                raise CosServiceError(method, info, res.status)
+            elif 'x-cos-error-code' in res.headers:
+                info = dict()
+                info['code'] = res.headers['x-cos-error-code']
+                if 'x-cos-request-id' in res.headers:
+                    info['requestid'] = res.headers['x-cos-request-id']
+                info['message'] = await res.text()
+                logger.error(info)
+                raise CosServiceError(method, info, res.status)
+            else:
+                msg = await res.text()
+                if msg == u'':  # 服务器没有返回Error Body时 给出头部的信息
+                    msg = _headers_to_dict(res)
+                logger.error(msg)
+                if len(exception_logbuf) > 0:
+                    logger.exception(exception_logbuf)
+                raise CosServiceError(method, msg, res.status)
+
+        return None
+
+    # object interface
+    async def put_object(self, Bucket, Body, Key, EnableMD5=False, **kwargs):
+        """单文件上传接口，适用于小文件，最大不得超过5GB
+
+        :param Bucket(string): 存储桶名称.
+        :param Body(file|string): 上传的文件内容，类型为文件流或字节流.
+        :param Key(string): COS路径.
+        :param EnableMD5(bool): 是否需要SDK计算Content-MD5，打开此开关会增加上传耗时.
+        :kwargs(dict): 设置上传的headers.
+        :return(dict): 上传成功返回的结果，包含ETag等信息.
+        """
+        check_object_content_length(Body)
+        headers = mapped(kwargs)
+        url = self._conf.uri(bucket=Bucket, path=Key)
+        logger.info("put object, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        if EnableMD5:
+            md5_str = get_content_md5(Body)
+            if md5_str:
+                headers['Content-MD5'] = md5_str
+        rt = await self.send_request(
+            method='PUT',
+            url=url,
+            bucket=Bucket,
+            auth=CosS3Auth(self._conf, Key),
+            data=Body,
+            headers=headers)
+        return _headers_to_dict(rt)
+
+    async def get_object(self, Bucket, Key, KeySimplifyCheck=True, **kwargs):
+        """单文件下载接口
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): COS路径.
+        :param KeySimplifyCheck(bool): 是否对Key进行posix路径语义归并检查
+        :param kwargs(dict): 设置下载的headers.
+        :return(dict): 下载成功返回的结果,包含Body对应的AsyncStreamBody,可以异步读取文件流或下载文件到本地.
+        """
+        headers = mapped(kwargs)
+        final_headers = {}
+        params = {}
+        for key in headers:
+            if key.startswith("response"):
+                params[key] = headers[key]
+            else:
+                final_headers[key] = headers[key]
+        headers = final_headers
+
+        if 'versionId' in headers:
+            params['versionId'] = headers['versionId']
+            del headers['versionId']
+
+        if KeySimplifyCheck:
+            path_simplify_check(path=Key)
+
+        url = self._conf.uri(bucket=Bucket, path=Key)
+        logger.info("get object, url=:{url} ,headers=:{headers}, params=:{params}".format(
+            url=url,
+            headers=headers,
+            params=params))
+        rt = await self.send_request(
+            method='GET',
+            url=url,
+            bucket=Bucket,
+            stream=True,
+            auth=CosS3Auth(self._conf, Key, params=params),
+            params=params,
+            headers=headers)
+
+        response = _headers_to_dict(rt)
+        response['Body'] = AsyncStreamBody(rt)
+        return response
+
+    async def head_object(self, Bucket, Key, **kwargs):
+        """获取文件信息
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): COS路径.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 文件的metadata信息.
+        """
+        headers = mapped(kwargs)
+        params = {}
+        if 'versionId' in headers:
+            params['versionId'] = headers['versionId']
+            del headers['versionId']
+        url = self._conf.uri(bucket=Bucket, path=Key)
+        logger.info("head object, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        rt = await self.send_request(
+            method='HEAD',
+            url=url,
+            bucket=Bucket,
+            auth=CosS3Auth(self._conf, Key, params=params),
+            headers=headers,
+            params=params)
+        return _headers_to_dict(rt)
+
+    async def object_exists(self, Bucket, Key):
+        """判断一个文件是否存在
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): COS路径.
+        :return(bool): 文件是否存在,返回True为存在,返回False为不存在
+        """
+        try:
+            await self.head_object(Bucket, Key)
+            return True
+        except CosServiceError as e:
+            if e.get_status_code() == 404:
+                return False
+            raise e
+
+    async def delete_object(self, Bucket, Key, **kwargs):
+        """单文件删除接口
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): COS路径.
+        :param kwargs(dict): 设置请求headers.
+        :return: dict.
+        """
+        headers = mapped(kwargs)
+        params = {}
+        if 'versionId' in headers:
+            params['versionId'] = headers['versionId']
+            del headers['versionId']
+        url = self._conf.uri(bucket=Bucket, path=Key)
+        logger.info("delete object, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        rt = await self.send_request(
+            method='DELETE',
+            url=url,
+            bucket=Bucket,
+            auth=CosS3Auth(self._conf, Key, params),
+            headers=headers,
+            params=params)
+        return _headers_to_dict(rt)
+
+    async def delete_objects(self, Bucket, Delete={}, **kwargs):
+        """文件批量删除接口,单次最多支持1000个object
+
+        :param Bucket(string): 存储桶名称.
+        :param Delete(dict): 批量删除的object信息.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 批量删除的结果.
+        """
+        xml_config = format_xml(data=Delete, root='Delete')
+        headers = mapped(kwargs)
+        headers['Content-MD5'] = get_md5(xml_config)
+        headers['Content-Type'] = 'application/xml'
+        params = {'delete': ''}
+        url = self._conf.uri(bucket=Bucket)
+        logger.info("delete objects, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        rt = await self.send_request(
+            method='POST',
+            url=url,
+            bucket=Bucket,
+            data=xml_config,
+            auth=CosS3Auth(self._conf, params=params),
+            headers=headers,
+            params=params)
+        data = xml_to_dict(await rt.read())
+        format_dict(data, ['Deleted', 'Error'])
+        return data
+
+    async def copy_object(self, Bucket, Key, CopySource, CopyStatus='Copy', **kwargs):
+        """文件拷贝，文件信息修改
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): 上传COS路径.
+        :param CopySource(dict): 拷贝源,包含Appid,Bucket,Region,Key.
+        :param CopyStatus(string): 拷贝状态,可选值'Copy'|'Replaced'.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 拷贝成功的结果.
+        """
+        headers = mapped(kwargs)
+        headers['x-cos-copy-source'] = gen_copy_source_url(CopySource, self._conf._enable_old_domain, self._conf._enable_internal_domain)
+        if CopyStatus != 'Copy' and CopyStatus != 'Replaced':
+            raise CosClientError('CopyStatus must be Copy or Replaced')
+        headers['x-cos-metadata-directive'] = CopyStatus
+        url = self._conf.uri(bucket=Bucket, path=Key)
+        logger.info("copy object, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        rt = await self.send_request(
+            method='PUT',
+            url=url,
+            bucket=Bucket,
+            auth=CosS3Auth(self._conf, Key),
+            headers=headers)
+        content = await rt.read()
+        body = xml_to_dict(content)
+        if 'ETag' not in body:
+            logger.error(content)
+            raise CosServiceError('PUT', content, 200)
+        data = _headers_to_dict(rt)
+        data.update(body)
+        return data
+
+    # multipart interface
+    async def create_multipart_upload(self, Bucket, Key, **kwargs):
+        """创建分块上传，适用于大文件上传
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): COS路径.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 初始化分块上传返回的结果，包含UploadId等信息.
+        """
+        headers = mapped(kwargs)
+        params = {'uploads': ''}
+        url = self._conf.uri(bucket=Bucket, path=Key)
+        logger.info("create multipart upload, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        rt = await self.send_request(
+            method='POST',
+            url=url,
+            bucket=Bucket,
+            auth=CosS3Auth(self._conf, Key, params=params),
+            headers=headers,
+            params=params)
+        return xml_to_dict(await rt.read())
+
+    async def upload_part(self, Bucket, Key, Body, PartNumber, UploadId, EnableMD5=False, **kwargs):
+        """上传分块，单个大小不得超过5GB
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): COS路径.
+        :param Body(file|string): 上传分块的内容,可以为文件流或者字节流.
+        :param PartNumber(int): 上传分块的编号.
+        :param UploadId(string): 分块上传创建的UploadId.
+        :param EnableMD5(bool): 是否需要SDK计算Content-MD5，打开此开关会增加上传耗时.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 上传成功返回的结果，包含单个分块ETag等信息.
+        """
+        check_object_content_length(Body)
+        headers = mapped(kwargs)
+        params = {'partNumber': PartNumber, 'uploadId': UploadId}
+        url = self._conf.uri(bucket=Bucket, path=Key)
+        logger.debug("upload part, url=:{url} ,headers=:{headers}, params=:{params}".format(
+            url=url,
+            headers=headers,
+            params=params))
+        if EnableMD5:
+            md5_str = get_content_md5(Body)
+            if md5_str:
+                headers['Content-MD5'] = md5_str
+        rt = await self.send_request(
+            method='PUT',
+            url=url,
+            bucket=Bucket,
+            headers=headers,
+            params=params,
+            auth=CosS3Auth(self._conf, Key, params=params),
+            data=Body)
+        return _headers_to_dict(rt)
+
+    async def upload_part_copy(self, Bucket, Key, PartNumber, UploadId, CopySource, CopySourceRange='', **kwargs):
+        """拷贝指定文件至分块上传
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): 上传COS路径.
+        :param PartNumber(int): 上传分块的编号.
+        :param UploadId(string): 分块上传创建的UploadId.
+        :param CopySource(dict): 拷贝源,包含Appid,Bucket,Region,Key.
+        :param CopySourceRange(string): 拷贝源的字节范围,bytes=first-last。
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 拷贝成功的结果.
+        """
+        headers = mapped(kwargs)
+        headers['x-cos-copy-source'] = gen_copy_source_url(CopySource, self._conf._enable_old_domain, self._conf._enable_internal_domain)
+        headers['x-cos-copy-source-range'] = CopySourceRange
+        params = {'partNumber': PartNumber, 'uploadId': UploadId}
+        url = self._conf.uri(bucket=Bucket, path=Key)
+        logger.debug("upload part copy, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        rt = await self.send_request(
+            method='PUT',
+            url=url,
+            bucket=Bucket,
+            headers=headers,
+            params=params,
+            auth=CosS3Auth(self._conf, Key, params=params))
+        body = xml_to_dict(await rt.read())
+        data = _headers_to_dict(rt)
+        data.update(body)
+        return data
+
+    async def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload={}, **kwargs):
+        """完成分片上传,除最后一块分块块大小必须大于等于1MB,否则会返回错误.
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): COS路径.
+        :param UploadId(string): 分块上传创建的UploadId.
+        :param MultipartUpload(dict): 所有分块的信息,包含Etag和PartNumber.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 上传成功返回的结果，包含整个文件的ETag等信息.
+        """
+        headers = mapped(kwargs)
+        params = {'uploadId': UploadId}
+        url = self._conf.uri(bucket=Bucket, path=Key)
+        logger.info("complete multipart upload, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        rt = await self.send_request(
+            method='POST',
+            url=url,
+            bucket=Bucket,
+            auth=CosS3Auth(self._conf, Key, params=params),
+            data=dict_to_xml(MultipartUpload),
+            timeout=1200,  # 分片上传大文件的时间比较长，设置为20min
+            headers=headers,
+            params=params)
+        content = await rt.read()
+        body = xml_to_dict(content)
+        # 分块上传文件返回200OK并不能代表文件上传成功,返回的body里面如果没有ETag则认为上传失败
+        if 'ETag' not in body:
+            logger.error(content)
+            raise CosServiceError('POST', content, 200)
+        data = _headers_to_dict(rt)
+        data.update(body)
+        return data
+
+    async def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        """放弃一个已经存在的分片上传任务，删除所有已经存在的分片.
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): COS路径.
+        :param UploadId(string): 分块上传创建的UploadId.
+        :param kwargs(dict): 设置请求headers.
+        :return: None.
+        """
+        headers = mapped(kwargs)
+        params = {'uploadId': UploadId}
+        url = self._conf.uri(bucket=Bucket, path=Key)
+        logger.info("abort multipart upload, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        await self.send_request(
+            method='DELETE',
+            url=url,
+            bucket=Bucket,
+            auth=CosS3Auth(self._conf, Key, params=params),
+            headers=headers,
+            params=params)
+        return None
+
+    async def list_parts(self, Bucket, Key, UploadId, EncodingType='', MaxParts=1000, PartNumberMarker=0, **kwargs):
+        """列出已上传的分片.
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): COS路径.
+        :param UploadId(string): 分块上传创建的UploadId.
+        :param EncodingType(string): 设置返回结果编码方式,只能设置为url.
+        :param MaxParts(int): 设置单次返回最大的分块数量,最大为1000.
+        :param PartNumberMarker(int): 设置返回的开始处,从PartNumberMarker下一个分块开始列出.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 分块的相关信息，包括Etag和PartNumber等信息.
+        """
+        headers = mapped(kwargs)
+        decodeflag = True
+        params = {
+            'uploadId': UploadId,
+            'part-number-marker': PartNumberMarker,
+            'max-parts': MaxParts}
+        if EncodingType:
+            if EncodingType != 'url':
+                raise CosClientError('EncodingType must be url')
+            params['encoding-type'] = EncodingType
+            decodeflag = False
+        else:
+            params['encoding-type'] = 'url'
+        url = self._conf.uri(bucket=Bucket, path=Key)
+        logger.info("list multipart upload parts, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        rt = await self.send_request(
+            method='GET',
+            url=url,
+            bucket=Bucket,
+            auth=CosS3Auth(self._conf, Key, params=params),
+            headers=headers,
+            params=params)
+        data = xml_to_dict(await rt.read())
+        format_dict(data, ['Part'])
+        if decodeflag:
+            decode_result(data, ['Key'], [])
+        return data
+
+    # listing interface
+    async def list_objects(self, Bucket, Prefix="", Delimiter="", Marker="", MaxKeys=1000, EncodingType="", **kwargs):
+        """获取文件列表
+
+        :param Bucket(string): 存储桶名称.
+        :param Prefix(string): 设置匹配文件的前缀.
+        :param Delimiter(string): 分隔符.
+        :param Marker(string): 从marker开始列出条目.
+        :param MaxKeys(int): 设置单次返回最大的数量,最大为1000.
+        :param EncodingType(string): 设置返回结果编码方式,只能设置为url.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 文件的相关信息，包括Etag等信息.
+        """
+        decodeflag = True  # 是否需要对结果进行decode
+        headers = mapped(kwargs)
+        url = self._conf.uri(bucket=Bucket)
+        logger.info("list objects, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        params = {
+            'prefix': Prefix,
+            'delimiter': Delimiter,
+            'marker': Marker,
+            'max-keys': MaxKeys
+        }
+        if EncodingType:
+            if EncodingType != 'url':
+                raise CosClientError('EncodingType must be url')
+            decodeflag = False  # 用户自己设置了EncodingType不需要去decode
+            params['encoding-type'] = EncodingType
+        else:
+            params['encoding-type'] = 'url'
+        rt = await self.send_request(
+            method='GET',
+            url=url,
+            bucket=Bucket,
+            params=params,
+            headers=headers,
+            auth=CosS3Auth(self._conf, params=params))
+        data = xml_to_dict(await rt.read())
+        format_dict(data, ['Contents', 'CommonPrefixes'])
+        if decodeflag:
+            decode_result(
+                data,
+                [
+                    'Prefix',
+                    'Marker',
+                    'NextMarker'
+                ],
+                [
+                    ['Contents', 'Key'],
+                    ['CommonPrefixes', 'Prefix']
+                ]
+            )
+        return data
+
+    async def list_objects_versions(self, Bucket, Prefix="", Delimiter="", KeyMarker="", VersionIdMarker="", MaxKeys=1000,
+                                    EncodingType="", **kwargs):
+        """获取文件列表
+
+        :param Bucket(string): 存储桶名称.
+        :param Prefix(string): 设置匹配文件的前缀.
+        :param Delimiter(string): 分隔符.
+        :param KeyMarker(string): 从KeyMarker指定的Key开始列出条目.
+        :param VersionIdMarker(string): 从VersionIdMarker指定的版本开始列出条目.
+        :param MaxKeys(int): 设置单次返回最大的数量,最大为1000.
+        :param EncodingType(string): 设置返回结果编码方式,只能设置为url.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 文件的相关信息，包括Etag等信息.
+        """
+        headers = mapped(kwargs)
+        decodeflag = True
+        url = self._conf.uri(bucket=Bucket)
+        logger.info("list objects versions, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        params = {
+            'versions': '',
+            'prefix': Prefix,
+            'delimiter': Delimiter,
+            'key-marker': KeyMarker,
+            'version-id-marker': VersionIdMarker,
+            'max-keys': MaxKeys
+        }
+        if EncodingType:
+            if EncodingType != 'url':
+                raise CosClientError('EncodingType must be url')
+            decodeflag = False
+            params['encoding-type'] = EncodingType
+        else:
+            params['encoding-type'] = 'url'
+        rt = await self.send_request(
+            method='GET',
+            url=url,
+            bucket=Bucket,
+            params=params,
+            headers=headers,
+            auth=CosS3Auth(self._conf, params=params))
+        data = xml_to_dict(await rt.read())
+        format_dict(data, ['Version', 'DeleteMarker', 'CommonPrefixes'])
+        if decodeflag:
+            decode_result(
+                data,
+                [
+                    'Prefix',
+                    'KeyMarker',
+                    'NextKeyMarker',
+                    'VersionIdMarker',
+                    'NextVersionIdMarker'
+                ],
+                [
+                    ['Version', 'Key'],
+                    ['CommonPrefixes', 'Prefix'],
+                    ['DeleteMarker', 'Key']
+                ]
+            )
+        return data
+
+    async def list_multipart_uploads(self, Bucket, Prefix="", Delimiter="", KeyMarker="", UploadIdMarker="", MaxUploads=1000,
+                                     EncodingType="", **kwargs):
+        """获取Bucket中正在进行的分块上传
+
+        :param Bucket(string): 存储桶名称.
+        :param Prefix(string): 设置匹配文件的前缀.
+        :param Delimiter(string): 分隔符.
+        :param KeyMarker(string): 从KeyMarker指定的Key开始列出条目.
+        :param UploadIdMarker(string): 从UploadIdMarker指定的UploadID开始列出条目.
+        :param MaxUploads(int): 设置单次返回最大的数量,最大为1000.
+        :param EncodingType(string): 设置返回结果编码方式,只能设置为url.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 文件的相关信息，包括Etag等信息.
+        """
+        headers = mapped(kwargs)
+        decodeflag = True
+        url = self._conf.uri(bucket=Bucket)
+        logger.info("get multipart uploads, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        params = {
+            'uploads': '',
+            'prefix': Prefix,
+            'delimiter': Delimiter,
+            'key-marker': KeyMarker,
+            'upload-id-marker': UploadIdMarker,
+            'max-uploads': MaxUploads
+        }
+        if EncodingType:
+            if EncodingType != 'url':
+                raise CosClientError('EncodingType must be url')
+            decodeflag = False
+            params['encoding-type'] = EncodingType
+        else:
+            params['encoding-type'] = 'url'
+        rt = await self.send_request(
+            method='GET',
+            url=url,
+            bucket=Bucket,
+            params=params,
+            headers=headers,
+            auth=CosS3Auth(self._conf, params=params))
+        data = xml_to_dict(await rt.read())
+        format_dict(data, ['Upload', 'CommonPrefixes'])
+        if decodeflag:
+            decode_result(
+                data,
+                [
+                    'Prefix',
+                    'KeyMarker',
+                    'NextKeyMarker',
+                    'UploadIdMarker',
+                    'NextUploadIdMarker'
+                ],
+                [
+                    ['Upload', 'Key'],
+                    ['CommonPrefixes', 'Prefix']
+                ]
+            )
+        return data
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from six.moves.urllib.parse import quote, unquote, urlparse, urlencode
+import re
 import hmac
 import time
 import hashlib
@@ -11,38 +12,85 @@ from .cos_comm import to_unicode, to_bytes, to_str
 logger = logging.getLogger(__name__)
 
 
+# 计算进签名的头部, 模块加载时构造一次
+SIGN_HEADERS = frozenset([
+    "cache-control",
+    "content-disposition",
+    "content-encoding",
+    "content-type",
+    "content-md5",
+    "content-length",
+    "expect",
+    "expires",
+    "host",
+    "if-match",
+    "if-modified-since",
+    "if-none-match",
+    "if-unmodified-since",
+    "origin",
+    "range",
+    "transfer-encoding",
+    "pic-operations",
+])
+
+# 只包含这些字符的值encode后不变
+_SAFE_VALUE = re.compile(r'[A-Za-z0-9_.~-]*\Z')
+
+_CACHE_MAX_SIZE = 1024
+# (secret_key, key_time) -> sign_key, sign_key只与密钥和签名的有效时间段有关, 同一秒内的请求可以复用
+_sign_key_cache = {}
+# 头部和参数名 -> encode并转换为小写后的名称, 名称的种类很少, 不需要每次请求重新encode
+_quoted_name_cache = {}
+
+
 def filter_headers(data):
     """只设置host content-type 还有x开头的头部.
 
     :param data(dict): 所有的头部信息.
     :return(dict): 计算进签名的头部.
     """
-    valid_headers = [
-        "cache-control",
-        "content-disposition",
-        "content-encoding",
-        "content-type",
-        "content-md5",
-        "content-length",
-        "expect",
-        "expires",
-        "host",
-        "if-match",
-        "if-modified-since",
-        "if-none-match",
-        "if-unmodified-since",
-        "origin",
-        "range",
-        "transfer-encoding",
-        "pic-operations",
-    ]
     headers = {}
     for i in data:
-        if str.lower(i) in valid_headers or str.lower(i).startswith("x-cos-") or str.lower(i).startswith("x-ci-"):
+        name = i.lower()
+        if name in SIGN_HEADERS or name.startswith("x-cos-") or name.startswith("x-ci-"):
             headers[i] = data[i]
     return headers
 
 
+def _quote(value):
+    # reserved keywords in headers urlencode are -_.~, notice that / should be encoded and space should not be encoded to plus sign(+)
+    if isinstance(value, str) and _SAFE_VALUE.match(value):
+        return value
+    return quote(to_bytes(to_str(value)), '-_.~')
+
+
+def _quote_name(name):
+    quoted = _quoted_name_cache.get(name)
+    if quoted is None:
+        quoted = _quote(name).lower()
+        if len(_quoted_name_cache) >= _CACHE_MAX_SIZE:
+            _quoted_name_cache.clear()
+        _quoted_name_cache[name] = quoted
+    return quoted
+
+
+def get_sign_key(secret_key, key_time):
+    """计算签名密钥 HMAC-SHA1(SecretKey, KeyTime), 结果按(secret_key, key_time)缓存
+
+    :param secret_key(string): 密钥.
+    :param key_time(string): 签名的有效时间段, 格式为"开始时间;结束时间".
+    :return(string): 签名密钥.
+    """
+    cache_key = (secret_key, key_time)
+    sign_key = _sign_key_cache.get(cache_key)
+    if sign_key is None:
+        sign_key = hmac.new(to_bytes(secret_key), to_bytes(key_time), hashlib.sha1).hexdigest()
+        if len(_sign_key_cache) >= _CACHE_MAX_SIZE:
+            _sign_key_cache.clear()
+        _sign_key_cache[cache_key] = sign_key
+    return sign_key
+
+
 class CosS3Auth(AuthBase):
 
     def __init__(self, conf, key=None, params={}, expire=10000, sign_host=None):
@@ -78,6 +126,8 @@ class CosS3Auth(AuthBase):
             logger.debug("anonymous reqeust")
             return r
 
+        # 调试日志的字符串只在开启debug时构造
+        debug = logger.isEnabledFor(logging.DEBUG)
         path = self._path
         uri_params = {}
         if self._sign_params:
@@ -90,7 +140,7 @@ class CosS3Auth(AuthBase):
             # 判断headers中是否包含host头域
             contain_host = False
             for i in headers:
-                if str.lower(i) == "host":  # 兼容host/Host/HOST等
+                if i.lower() == "host":  # 兼容host/Host/HOST等
                     contain_host = True
                     break
 
@@ -100,20 +150,19 @@ class CosS3Auth(AuthBase):
                 if url_parsed.hostname is not None:
                     headers["host"] = url_parsed.hostname
 
-        # reserved keywords in headers urlencode are -_.~, notice that / should be encoded and space should not be encoded to plus sign(+)
-        headers = dict([(quote(to_bytes(to_str(k)), '-_.~').lower(), quote(to_bytes(to_str(v)), '-_.~')) for k, v in
-                        headers.items()])  # headers中的key转换为小写，value进行encode
-        uri_params = dict([(quote(to_bytes(to_str(k)), '-_.~').lower(), quote(to_bytes(to_str(v)), '-_.~')) for k, v in
-                           uri_params.items()])
+        # headers中的key转换为小写，value进行encode
+        headers = dict([(_quote_name(k), _quote(v)) for k, v in headers.items()])
+        uri_params = dict([(_quote_name(k), _quote(v)) for k, v in uri_params.items()])
+        sorted_headers = sorted(headers.items())
+        sorted_params = sorted(uri_params.items())
         format_str = u"{method}\n{host}\n{params}\n{headers}\n".format(
             method=r.method.lower(),
             host=path,
-            params='&'.join(map(lambda tupl: "%s=%s" %
-                            (tupl[0], tupl[1]), sorted(uri_params.items()))),
-            headers='&'.join(map(lambda tupl: "%s=%s" %
-                             (tupl[0], tupl[1]), sorted(headers.items())))
+            params='&'.join(["%s=%s" % item for item in sorted_params]),
+            headers='&'.join(["%s=%s" % item for item in sorted_headers])
         )
-        logger.debug("format str: " + format_str)
+        if debug:
+            logger.debug("format str: " + format_str)
 
         start_sign_time = int(time.time())
         sign_time = "{bg_time};{ed_time}".format(
@@ -123,26 +172,26 @@ class CosS3Auth(AuthBase):
 
         str_to_sign = "sha1\n{time}\n{sha1}\n".format(
             time=sign_time, sha1=sha1.hexdigest())
-        logger.debug('str_to_sign: ' + str(str_to_sign))
-        sign_key = hmac.new(to_bytes(self._secret_key), to_bytes(
-            sign_time), hashlib.sha1).hexdigest()
+        sign_key = get_sign_key(self._secret_key, sign_time)
         sign = hmac.new(to_bytes(sign_key), to_bytes(
             str_to_sign), hashlib.sha1).hexdigest()
-        logger.debug('sign_key: ' + str(sign_key))
-        logger.debug('sign: ' + str(sign))
+        if debug:
+            logger.debug('str_to_sign: ' + str(str_to_sign))
+            logger.debug('sign_key: ' + str(sign_key))
+            logger.debug('sign: ' + str(sign))
         sign_tpl = "q-sign-algorithm=sha1&q-ak={ak}&q-sign-time={sign_time}&q-key-time={key_time}&q-header-list={headers}&q-url-param-list={params}&q-signature={sign}"
 
         r.headers['Authorization'] = sign_tpl.format(
             ak=self._secret_id,
             sign_time=sign_time,
             key_time=sign_time,
-            params=';'.join(sorted(uri_params.keys())),
-            headers=';'.join(sorted(headers.keys())),
+            params=';'.join([k for k, v in sorted_params]),
+            headers=';'.join([k for k, v in sorted_headers]),
             sign=sign
         )
-        logger.debug("sign_key" + str(sign_key))
-        logger.debug(r.headers['Authorization'])
-        logger.debug("request headers: " + str(r.headers))
+        if debug:
+            logger.debug(r.headers['Authorization'])
+            logger.debug("request headers: " + str(r.headers))
         return r
 
 
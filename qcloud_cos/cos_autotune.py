@@ -0,0 +1,196 @@
+# -*- coding=utf-8
+"""分块传输的自适应并发调节, 由upload_file, download_file, copy的AutoTune参数开启"""
+
+import math
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 每个线程收到的503(SlowDown)次数, send_request在重试前记录, 分块任务执行前后对比即可知道该分块是否被限流
+_throttle_local = threading.local()
+
+AUTO_TUNE_MIN_PART_SIZE = 4  # MB
+AUTO_TUNE_MAX_PART_SIZE = 64  # MB
+AUTO_TUNE_PARTS_PER_THREAD = 4  # 每个并发至少分到的分块数, 保证调节有足够的样本
+AUTO_TUNE_GAIN = 0.05  # 吞吐变化超过5%才认为有提升或下降
+AUTO_TUNE_PROBE_WINDOWS = 4  # 吞吐稳定的窗口数达到该值后尝试增加一个并发
+
+
+def record_throttle():
+    """记录当前线程收到一次503(SlowDown)"""
+    _throttle_local.count = getattr(_throttle_local, 'count', 0) + 1
+
+
+def get_throttle_count():
+    """获取当前线程累计收到的503(SlowDown)次数"""
+    return getattr(_throttle_local, 'count', 0)
+
+
+def choose_part_size(file_size, max_concurrency, max_part_count=10000):
+    """开启AutoTune时根据文件大小和最大并发数选择分块大小
+
+    分块协议要求一次传输的分块大小一致(续传时也要按同样的大小校验已完成的分块), 因此分块大小在开始前确定,
+    传输过程中只调节并发数. 结果只取决于文件大小和最大并发数, 相同参数再次调用时可以续传.
+
+    :param file_size(int): 文件大小, 单位为字节.
+    :param max_concurrency(int): 最大并发数.
+    :param max_part_count(int): 最大分块数.
+    :return(int): 分块大小, 单位为MB.
+    """
+    mb = 1024 * 1024
+    part_size = int(math.ceil(float(file_size) / (max(1, max_concurrency) * AUTO_TUNE_PARTS_PER_THREAD) / mb))
+    part_size = max(AUTO_TUNE_MIN_PART_SIZE, min(AUTO_TUNE_MAX_PART_SIZE, part_size))
+    # 超大文件按最大分块数放大分块
+    return max(part_size, int(math.ceil(float(file_size) / max_part_count / mb)))
+
+
+class TransferTuner(object):
+    """根据已完成分块的聚合吞吐调节任务组的并发数
+
+    从较低的并发开始, 每完成一轮(与当前并发数相同个数)分块计算一次聚合吞吐:
+    吞吐有提升时加倍增加并发(慢启动), 提升不明显后保持并定期逐个增加并发探测, 增加并发后吞吐下降则退回;
+    分块请求收到503(SlowDown)时并发减半, 之后不再超过触发限流时的并发数.
+
+    :param task_group(TaskGroup): 被调节的任务组.
+    :param max_concurrency(int): 并发数上限, 即传输接口的MAXThread.
+    :param part_size(int): 分块大小, 单位为字节, 只用于结果报告.
+    :param initial_concurrency(int): 初始并发数.
+
+    .. code-block:: python
+
+        pool = client._new_task_group(MAXThread)
+        tuner = TransferTuner(pool, MAXThread, part_size)
+        pool.submit(tuner.run, part_size, upload_part, *args)
+        pool.wait()
+        print(tuner.get_result())
+    """
+
+    def __init__(self, task_group, max_concurrency, part_size, initial_concurrency=2):
+        self._task_group = task_group
+        self._part_size = part_size
+        self._lock = threading.Lock()
+        self._ceiling = max(1, max_concurrency)
+        self._concurrency = max(1, min(initial_concurrency, self._ceiling))
+        self._peak = self._concurrency
+        self._slow_start = True
+        self._stable_windows = 0
+        self._last_throughput = None  # 上一个窗口的吞吐
+        self._prev = None  # 增加并发前的(并发数, 吞吐), 用于吞吐下降时退回
+        self._start_time = time.time()
+        self._window_start = self._start_time
+        self._window_bytes = 0
+        self._window_parts = 0
+        self._total_bytes = 0
+        self._total_latency = 0.0
+        self._parts = 0
+        self._slowdowns = 0
+        self._epoch = 0  # 每次调整并发后加一, 调整前开始的分块不影响新的并发
+        self._history = [{'Concurrency': self._concurrency, 'Throughput': 0, 'Reason': 'init'}]
+        task_group.set_max_concurrency(self._concurrency)
+
+    def run(self, size, func, *args, **kwargs):
+        """执行一个分块任务并记录耗时和是否被限流
+
+        :param size(int): 分块的字节数.
+        :param func(function): 分块任务.
+        :return: func的返回值.
+        """
+        throttled = get_throttle_count()
+        epoch = self._epoch
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._report(size, time.time() - start, get_throttle_count() - throttled, epoch)
+
+    def _report(self, size, elapsed, throttled, epoch):
+        with self._lock:
+            self._parts += 1
+            self._total_bytes += size
+            self._total_latency += elapsed
+            if throttled > 0:
+                self._slowdowns += throttled
+                if epoch != self._epoch:
+                    # 减半之前已经在执行的分块也会被限流, 同一次限流只减半一次
+                    return
+                self._slow_start = False
+                self._ceiling = max(1, self._concurrency - 1)
+                self._prev = None
+                self._set_concurrency(max(1, self._concurrency // 2), 0, 'slowdown')
+                return
+            if epoch != self._epoch:
+                return  # 调整并发前开始的分块不计入新并发的吞吐
+            self._window_bytes += size
+            self._window_parts += 1
+            if self._window_parts < self._concurrency:
+                return
+            throughput = self._window_bytes / max(time.time() - self._window_start, 1e-6)
+            self._adjust(throughput)
+
+    def _adjust(self, throughput):
+        """在持有锁的情况下根据一个窗口的吞吐调整并发"""
+        last = self._last_throughput
+        concurrency = self._concurrency
+        if last is None or throughput > last * (1 + AUTO_TUNE_GAIN):
+            self._stable_windows = 0
+            if concurrency < self._ceiling:
+                step = concurrency if self._slow_start else 1
+                self._prev = (concurrency, throughput)
+                self._set_concurrency(min(self._ceiling, concurrency + step), throughput, 'increase')
+                return
+        elif throughput < last * (1 - AUTO_TUNE_GAIN) and self._prev is not None and self._prev[0] < concurrency:
+            # 增加并发后吞吐反而下降, 退回到之前的并发
+            prev_concurrency, prev_throughput = self._prev
+            self._slow_start = False
+            self._ceiling = concurrency - 1
+            self._prev = None
+            self._set_concurrency(prev_concurrency, throughput, 'revert')
+            self._last_throughput = prev_throughput
+            return
+        else:
+            self._slow_start = False
+            self._stable_windows += 1
+            if self._stable_windows >= AUTO_TUNE_PROBE_WINDOWS and concurrency < self._ceiling:
+                self._stable_windows = 0
+                self._prev = (concurrency, throughput)
+                self._set_concurrency(concurrency + 1, throughput, 'probe')
+                return
+        self._reset_window(throughput)
+
+    def _reset_window(self, throughput):
+        self._last_throughput = throughput
+        self._window_start = time.time()
+        self._window_bytes = 0
+        self._window_parts = 0
+
+    def _set_concurrency(self, concurrency, throughput, reason):
+        logger.debug('auto tune concurrency {0} -> {1}, reason: {2}, throughput: {3:.0f} B/s'.format(
+            self._concurrency, concurrency, reason, throughput))
+        self._concurrency = concurrency
+        self._epoch += 1
+        self._peak = max(self._peak, concurrency)
+        self._history.append({'Concurrency': concurrency, 'Throughput': int(throughput), 'Reason': reason})
+        self._reset_window(throughput if reason != 'slowdown' else None)
+        self._task_group.set_max_concurrency(concurrency)
+
+    def get_result(self):
+        """获取调节的结果
+
+        :return(dict): PartSize为分块大小(字节), Concurrency为结束时的并发数, MaxConcurrency为达到过的最大并发数,
+            Throughput为整体吞吐(字节/秒), AvgPartLatency为分块平均耗时(秒), Parts为分块数, SlowDowns为收到503的次数,
+            History为每次调整的并发数, 调整时的吞吐和原因(increase, probe, revert, slowdown).
+        """
+        with self._lock:
+            elapsed = max(time.time() - self._start_time, 1e-6)
+            return {
+                'PartSize': self._part_size,
+                'Concurrency': self._concurrency,
+                'MaxConcurrency': self._peak,
+                'Throughput': int(self._total_bytes / elapsed),
+                'AvgPartLatency': self._total_latency / self._parts if self._parts else 0.0,
+                'Parts': self._parts,
+                'SlowDowns': self._slowdowns,
+                'History': list(self._history),
+            }
@@ -0,0 +1,62 @@
+# -*- coding=utf-8
+"""并发查询多个对象的元数据, 由CosS3Client.head_objects创建"""
+
+import logging
+from collections import deque
+from six.moves.queue import Queue
+from .cos_exception import CosServiceError
+
+logger = logging.getLogger(__name__)
+
+
+def _head(client, bucket, key, kwargs):
+    """查询一个对象, 不抛出异常, 结果中记录对象是否存在或失败原因"""
+    try:
+        response = client.head_object(Bucket=bucket, Key=key, **kwargs)
+    except CosServiceError as e:
+        if e.get_status_code() == 404:
+            return {'Key': key, 'Exists': False, 'Metadata': None, 'Error': None}
+        return {'Key': key, 'Exists': None, 'Metadata': None, 'Error': e}
+    except Exception as e:
+        return {'Key': key, 'Exists': None, 'Metadata': None, 'Error': e}
+    return {'Key': key, 'Exists': True, 'Metadata': response, 'Error': None}
+
+
+def iter_head_objects(client, bucket, keys, max_thread=10, ordered=True, **kwargs):
+    """并发head_object, 边读取keys边提交, 进行中的请求不超过max_thread的两倍, 已经产出的结果不会被保留
+
+    :param client(CosS3Client): 用于发送请求的client.
+    :param bucket(string): 存储桶名称.
+    :param keys(iterable): 待查询的key.
+    :param max_thread(int): 同时进行的head_object请求数.
+    :param ordered(bool): 为True时按keys的顺序产出结果, 为False时按完成的顺序产出.
+    :param kwargs(dict): 设置head_object的headers.
+    :return(generator): 每个key产出一个dict, Exists为对象是否存在(查询失败时为None), Metadata为head_object的结果,
+        Error为404以外的异常.
+    """
+    pool = client._new_task_group(max_thread, fail_fast=False)
+    max_inflight = max(1, max_thread) * 2
+    inflight = deque()  # ordered时按提交顺序保存的Future
+    done = Queue()  # 非ordered时按完成顺序放入的Future
+    outstanding = 0
+    try:
+        for key in keys:
+            future = pool.submit(_head, client, bucket, key, kwargs)
+            if ordered:
+                inflight.append(future)
+                if len(inflight) >= max_inflight:
+                    yield inflight.popleft().result()
+            else:
+                future.add_done_callback(done.put)
+                outstanding += 1
+                if outstanding >= max_inflight:
+                    outstanding -= 1
+                    yield done.get().result()
+        while inflight:
+            yield inflight.popleft().result()
+        while outstanding > 0:
+            outstanding -= 1
+            yield done.get().result()
+    finally:
+        # 调用方提前结束迭代时取消尚未开始的请求
+        pool.cancel()
@@ -0,0 +1,139 @@
+# -*- coding=utf-8
+"""批量删除, 由CosS3Client.bulk_delete和delete_prefix创建"""
+
+import time
+import threading
+import logging
+from six import string_types
+from .cos_exception import CosServiceError
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 1000  # delete_objects单次最多删除的对象数
+
+
+class BulkDeleter(object):
+    """把key按1000个一批调用delete_objects, 多批并发执行
+
+    边读取key边提交, 排队的批数不超过max_thread, 不需要先把所有key读到内存.
+    每批使用Quiet模式, 响应中只返回删除失败的Error, 之后只重试失败的key; 整个请求失败时重试整批.
+
+    :param client(CosS3Client): 用于发送请求的client.
+    :param bucket(string): 存储桶名称.
+    :param max_thread(int): 同时执行的delete_objects请求数.
+    :param max_retry(int): 失败的key的最大重试次数.
+    :param kwargs(dict): 设置delete_objects的headers.
+
+    .. code-block:: python
+
+        deleter = BulkDeleter(client, 'bucket', max_thread=10)
+        result = deleter.start(key for key in open('keys.txt').read().splitlines())
+        print(result['Deleted'], result['DeletedPerSecond'])
+    """
+
+    def __init__(self, client, bucket, max_thread=10, max_retry=3, **kwargs):
+        self._client = client
+        self._bucket = bucket
+        self._max_thread = max_thread
+        self._max_retry = max_retry
+        self._headers = kwargs
+        self._lock = threading.Lock()
+        self._start_time = time.time()
+        self._deleted = 0
+        self._requests = 0
+        self._retried = 0
+        self._failed = list()
+
+    def start(self, keys):
+        """删除keys中的所有对象
+
+        :param keys(iterable): key字符串, 或者包含Key和VersionId的dict(如iter_object_versions的结果).
+        :return(dict): Deleted为删除成功的数量, Failed为删除失败的对象(Key, VersionId, Code, Message),
+            Requests为delete_objects请求数, Retried为重试的key数, Elapsed为耗时(秒), DeletedPerSecond为平均速率.
+        """
+        pool = self._client._new_task_group(self._max_thread, max_pending=self._max_thread, fail_fast=False)
+        batch = list()
+        for key in keys:
+            batch.append(self._to_object(key))
+            if len(batch) >= DELETE_BATCH_SIZE:
+                pool.submit(self.delete_batch, batch)
+                batch = list()
+        if batch:
+            pool.submit(self.delete_batch, batch)
+        pool.wait(raise_error=False)
+        return self.get_result()
+
+    def delete_batch(self, objects):
+        """删除一批对象, 失败的对象重试max_retry次
+
+        :param objects(list): 不超过1000个{'Key': key, 'VersionId': 版本(可选)}.
+        :return(list): 重试后仍然失败的对象, 包括Key, VersionId(删除指定版本时), Code和Message.
+        """
+        errors = list()
+        for i in range(self._max_retry + 1):
+            if i > 0:
+                time.sleep(i)
+                with self._lock:
+                    self._retried += len(objects)
+            errors = self._delete_once(objects)
+            if not errors:
+                break
+            objects = [o for o, code, message in errors]
+            logger.debug('delete objects: {0} keys failed, retry times: {1}'.format(len(objects), i))
+        failed = list()
+        for o, code, message in errors:
+            error = dict(o)
+            error.update({'Code': code, 'Message': message})
+            failed.append(error)
+        if failed:
+            logger.warning('delete objects: {0} keys failed after {1} retries'.format(len(failed), self._max_retry))
+            with self._lock:
+                self._failed.extend(failed)
+        return failed
+
+    def _delete_once(self, objects):
+        """发送一次delete_objects, 返回失败的(对象, 错误码, 错误信息)"""
+        delete = {'Quiet': 'true', 'Object': objects}
+        try:
+            response = self._client.delete_objects(Bucket=self._bucket, Delete=delete, **self._headers)
+        except Exception as e:
+            logger.warning('delete objects failed: {0}'.format(e))
+            with self._lock:
+                self._requests += 1
+            if isinstance(e, CosServiceError):
+                return [(o, e.get_error_code(), e.get_error_msg()) for o in objects]
+            return [(o, 'ClientError', str(e)) for o in objects]
+        # 响应中的Error可能不带VersionId, 此时按Key匹配
+        error_map = dict()
+        for e in response.get('Error', []):
+            error_map[(e['Key'], e.get('VersionId'))] = (e.get('Code'), e.get('Message'))
+        errors = list()
+        for o in objects:
+            error = error_map.get((o['Key'], o.get('VersionId'))) or error_map.get((o['Key'], None))
+            if error is not None:
+                errors.append((o, error[0], error[1]))
+        with self._lock:
+            self._requests += 1
+            self._deleted += len(objects) - len(errors)
+        return errors
+
+    @staticmethod
+    def _to_object(key):
+        if isinstance(key, string_types):
+            return {'Key': key}
+        obj = {'Key': key['Key']}
+        if key.get('VersionId'):
+            obj['VersionId'] = key['VersionId']
+        return obj
+
+    def get_result(self):
+        with self._lock:
+            elapsed = max(time.time() - self._start_time, 1e-6)
+            return {
+                'Deleted': self._deleted,
+                'Failed': list(self._failed),
+                'Requests': self._requests,
+                'Retried': self._retried,
+                'Elapsed': elapsed,
+                'DeletedPerSecond': self._deleted / elapsed,
+            }
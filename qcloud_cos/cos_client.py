@@ -10,6 +10,7 @@ import time
 import copy
 import json
 import threading
+from functools import partial
 import xml.dom.minidom
 import xml.etree.ElementTree
 from requests import Request, Session, ConnectionError, Timeout
@@ -22,12 +23,23 @@ from .xml2dict import Xml2Dict
 from .cos_auth import CosS3Auth
 from .cos_auth import CosRtmpAuth
 from .cos_comm import *
-from .cos_threadpool import SimpleThreadPool
+from .cos_threadpool import SimpleThreadPool, TaskGroup, get_shared_executor, DEFAULT_THREAD_POOL_MAX_SIZE
 from .cos_exception import CosClientError
 from .cos_exception import CosServiceError
 from .version import __version__
 from .select_event_stream import EventStream
 from .resumable_downloader import ResumableDownLoader
+from .cos_list_stream import ObjectListStream, ObjectVersionListStream
+from .cos_object_io import CosObjectReader, CosObjectWriter
+from .cos_paginator import Paginator, get_list_items
+from .cos_parallel_lister import ParallelLister
+from .cos_autotune import TransferTuner, choose_part_size, record_throttle
+from .upload_checkpoint import UploadCheckpoint
+from .cos_directory import DirectoryUploader, DirectoryDownloader
+from .cos_sync import SyncEngine
+from .cos_bulk_delete import BulkDeleter
+from .cos_batch_head import iter_head_objects
+from .cos_presign import PresignedUrlGenerator, PresignedUrlCache
 
 # python 3.10报错"module 'collections' has no attribute 'Iterable'"，这里先规避
 if sys.version_info.major >= 3 and sys.version_info.minor >= 10:
@@ -44,7 +56,8 @@ class CosConfig(object):
                  Access_id=None, Access_key=None, Secret_id=None, Secret_key=None, Endpoint=None, IP=None, Port=None,
                  Anonymous=None, UA=None, Proxies=None, Domain=None, ServiceDomain=None, KeepAlive=True, PoolConnections=10,
                  PoolMaxSize=10, AllowRedirects=False, SignHost=True, EndpointCi=None, EndpointPic=None, EnableOldDomain=True, EnableInternalDomain=True, SignParams=True,
-                 AutoSwitchDomainOnRetry=False, VerifySSL=None, SSLCert=None):
+                 AutoSwitchDomainOnRetry=False, VerifySSL=None, SSLCert=None, ThreadPoolMaxSize=DEFAULT_THREAD_POOL_MAX_SIZE,
+                 PresignedUrlCacheSize=0, PresignedUrlMinValidity=60):
         """初始化，保存用户的信息
 
         :param Appid(string): 用户APPID.
@@ -78,6 +91,10 @@ class CosConfig(object):
         :param AutoSwitchDomainOnRetry(bool): 重试请求时是否将myqcloud.com域名切换为tencentcos.cn
         :param VerifySSL(bool or string): 是否开启SSL证书校验, 或客户端CA bundle证书文件路径. 示例: True/False 或 '/path/certfile'
         :param SSLCert(string or tuple): 客户端SSL证书路径. 示例: '/path/client.pem' 或 ('/path/client.cert', '/path/client.key')
+        :param ThreadPoolMaxSize(int): 进程内共享线程池的最大线程数, upload_file/download_file/copy等接口的并发任务都在该线程池中执行, 以第一次创建线程池的配置为准
+        :param PresignedUrlCacheSize(int): get_presigned_url缓存的url数, 0表示不缓存. 开启后相同的存储桶, key, 方法, 过期时间,
+            参数和头部重复调用时直接返回之前生成的url, 按最近最少使用淘汰
+        :param PresignedUrlMinValidity(int): 返回缓存的url时要求的最短剩余有效时间(秒), 不足时重新签名
         """
         self._appid = to_unicode(Appid)
         self._token = to_unicode(Token)
@@ -105,6 +122,9 @@ class CosConfig(object):
         self._auto_switch_domain_on_retry = AutoSwitchDomainOnRetry
         self._verify_ssl = VerifySSL
         self._ssl_cert = SSLCert
+        self._thread_pool_max_size = ThreadPoolMaxSize
+        self._presigned_url_cache_size = PresignedUrlCacheSize
+        self._presigned_url_min_validity = PresignedUrlMinValidity
 
         if self._domain is None:
             self._endpoint = format_endpoint(Endpoint, Region, u'cos.', EnableOldDomain, EnableInternalDomain)
@@ -251,6 +271,10 @@ class CosS3Client(object):
         self._conf = conf
         self._retry = retry  # 重试的次数，分片上传时可适当增大
         self._retry_exe_times = 0 # 重试已执行次数
+        self._presigned_url_cache = None
+        if self._conf._presigned_url_cache_size > 0:
+            self._presigned_url_cache = PresignedUrlCache(self._conf._presigned_url_cache_size,
+                                                          self._conf._presigned_url_min_validity)
 
         if session is None:
             if not CosS3Client.__built_in_sessions:
@@ -304,6 +328,11 @@ class CosS3Client(object):
     def get_retry_exe_times(self):
         """获取重试已执行次数"""
         return self._retry_exe_times
+
+    def _new_task_group(self, max_concurrency, max_pending=0, fail_fast=True):
+        """创建一组在进程内共享线程池中执行的任务, 同时执行的任务数不超过max_concurrency"""
+        executor = get_shared_executor(self._conf._thread_pool_max_size)
+        return TaskGroup(executor, max_concurrency, max_pending, fail_fast)
     
     def inc_retry_exe_times(self):
         """重试执行次数递增"""
@@ -435,6 +464,8 @@ class CosS3Client(object):
                 elif res.status_code < 500:  # 4xx 不重试
                     break
                 else:
+                    if res.status_code == 503:  # 服务端限流(SlowDown), 通知正在调节并发的分块任务
+                        record_throttle()
                     if j == (self._retry - 1) and self.should_switch_domain(url, res.headers):
                         url = switch_hostname_for_url(url)
                     continue
@@ -486,13 +517,14 @@ class CosS3Client(object):
         return None
 
     #  s3 object interface begin
-    def put_object(self, Bucket, Body, Key, EnableMD5=False, **kwargs):
+    def put_object(self, Bucket, Body, Key, EnableMD5=False, EnableCRC=False, **kwargs):
         """单文件上传接口，适用于小文件，最大不得超过5GB
 
         :param Bucket(string): 存储桶名称.
         :param Body(file|string): 上传的文件内容，类型为文件流或字节流.
         :param Key(string): COS路径.
         :param EnableMD5(bool): 是否需要SDK计算Content-MD5，打开此开关会增加上传耗时.
+        :param EnableCRC(bool): 是否在发送数据的同时计算crc64和md5, 上传完成后与服务端返回的值校验, 不需要额外读取数据.
         :kwargs(dict): 设置上传的headers.
         :return(dict): 上传成功返回的结果，包含ETag等信息.
 
@@ -519,6 +551,9 @@ class CosS3Client(object):
             md5_str = get_content_md5(Body)
             if md5_str:
                 headers['Content-MD5'] = md5_str
+        hasher = None
+        if EnableCRC:
+            Body, hasher = wrap_hashing_body(Body)
         rt = self.send_request(
             method='PUT',
             url=url,
@@ -528,6 +563,8 @@ class CosS3Client(object):
             headers=headers)
 
         response = dict(**rt.headers)
+        if hasher is not None:
+            hasher.check(response)
         return response
 
     def get_object(self, Bucket, Key, KeySimplifyCheck=True, **kwargs):
@@ -713,6 +750,8 @@ class CosS3Client(object):
     def get_presigned_url(self, Bucket, Key, Method, Expired=300, Params={}, Headers={}, UseCiEndPoint=False, SignHost=None):
         """生成预签名的url
 
+        CosConfig设置了PresignedUrlCacheSize时, 相同参数的调用在url剩余有效时间不少于PresignedUrlMinValidity秒时返回缓存的url.
+
         :param Bucket(string): 存储桶名称.
         :param Key(string): COS路径.
         :param Method(string): HTTP请求的方法, 'PUT'|'POST'|'GET'|'DELETE'|'HEAD'
@@ -733,6 +772,16 @@ class CosS3Client(object):
                 Method='PUT'
             )
         """
+        if self._presigned_url_cache is not None:
+            secret_id = self._conf._secret_id if self._conf._secret_id else \
+                (self._conf._credential_inst.secret_id if self._conf._credential_inst else None)
+            cache_key = (secret_id, Bucket, Key, Method, Expired, tuple(sorted(Params.items())), tuple(sorted(Headers.items())),
+                         UseCiEndPoint, SignHost)
+            return self._presigned_url_cache.get_or_sign(cache_key, Expired, partial(
+                self._get_presigned_url, Bucket, Key, Method, Expired, Params, Headers, UseCiEndPoint, SignHost))
+        return self._get_presigned_url(Bucket, Key, Method, Expired, Params, Headers, UseCiEndPoint, SignHost)
+
+    def _get_presigned_url(self, Bucket, Key, Method, Expired, Params, Headers, UseCiEndPoint, SignHost):
         endpoint = None
         if UseCiEndPoint:
             endpoint = self._conf._endpoint_ci
@@ -767,6 +816,43 @@ class CosS3Client(object):
         """
         return self.get_presigned_url(Bucket, Key, 'GET', Expired, Params, Headers, UseCiEndPoint, SignHost)
 
+    def generate_presigned_urls(self, Bucket, Keys, Method='GET', Expired=300, Params={}, Headers={}, UseCiEndPoint=False,
+                                SignHost=None, Processes=0):
+        """为大量key批量生成预签名的url
+
+        结果与逐个调用get_presigned_url一致. 与key无关的签名部分只计算一次, 每1000个key共用一个签名时间段和签名密钥,
+        不需要为每个key构造Request. 边读取Keys边生成, 返回生成器, 可以用于百万级的key.
+
+        :param Bucket(string): 存储桶名称.
+        :param Keys(iterable): COS路径.
+        :param Method(string): HTTP请求的方法, 'PUT'|'POST'|'GET'|'DELETE'|'HEAD'
+        :param Expired(int): 签名过期时间.
+        :param Params(dict): 签入签名的参数, 所有key相同.
+        :param Headers(dict): 签入签名的头部, 所有key相同.
+        :param UseCiEndPoint(bool): 是否使用数据万象的域名.
+        :param SignHost(bool): 是否将host算入签名.
+        :param Processes(int): 大于1时在这么多个子进程中计算签名, 用于CPU成为瓶颈的场景.
+        :return(generator): 按Keys的顺序产出预签名的URL.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 为清单中的所有文件生成下载链接
+            with open('manifest.txt') as f:
+                keys = [line.strip() for line in f]
+            urls = client.generate_presigned_urls(
+                Bucket='bucket',
+                Keys=keys,
+                Expired=3600,
+                Processes=4
+            )
+            for key, url in zip(keys, urls):
+                print(key, url)
+        """
+        generator = PresignedUrlGenerator(self._conf, Bucket, Method, Expired, Params, Headers, SignHost, UseCiEndPoint)
+        return generator.iter_urls(Keys, Processes)
+
     def get_object_url(self, Bucket, Key):
         """生成对象访问的url
 
@@ -875,6 +961,68 @@ class CosS3Client(object):
         format_dict(data, ['Deleted', 'Error'])
         return data
 
+    def bulk_delete(self, Bucket, Keys, MAXThread=10, MaxRetry=3, **kwargs):
+        """批量删除大量对象
+
+        按1000个一批调用delete_objects, 多批并发执行, 边读取Keys边提交, Keys可以是列举结果或者从文件读取的生成器.
+        每批只重试响应中删除失败的key.
+
+        :param Bucket(string): 存储桶名称.
+        :param Keys(iterable): 待删除的key字符串, 或者包含Key和VersionId的dict.
+        :param MAXThread(int): 同时执行的delete_objects请求数.
+        :param MaxRetry(int): 删除失败的key的最大重试次数.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): Deleted为删除成功的数量, Failed为删除失败的对象(Key, VersionId, Code, Message),
+            Requests为delete_objects请求数, Retried为重试的key数, Elapsed为耗时(秒), DeletedPerSecond为平均速率.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 删除文件中列出的所有key
+            with open('keys.txt') as f:
+                response = client.bulk_delete(
+                    Bucket='bucket',
+                    Keys=(line.strip() for line in f)
+                )
+            print(response['Deleted'], response['Failed'])
+        """
+        deleter = BulkDeleter(self, Bucket, MAXThread, MaxRetry, **kwargs)
+        return deleter.start(Keys)
+
+    def delete_prefix(self, Bucket, Prefix, Versions=False, MAXThread=10, MaxRetry=3, **kwargs):
+        """删除一个前缀下的所有对象
+
+        边列举边删除, 列举结果按1000个一批并发调用delete_objects. Versions为True时列举所有版本,
+        删除所有历史版本和删除标记.
+
+        :param Bucket(string): 存储桶名称.
+        :param Prefix(string): 删除的前缀, 为空时删除存储桶中的所有对象.
+        :param Versions(bool): 是否删除所有版本和删除标记, 用于开启了版本控制的存储桶.
+        :param MAXThread(int): 同时执行的delete_objects请求数.
+        :param MaxRetry(int): 删除失败的key的最大重试次数.
+        :param kwargs(dict): 设置请求headers.
+        :return(dict): 与bulk_delete相同.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 清空版本控制存储桶中dir/下的所有版本
+            response = client.delete_prefix(
+                Bucket='bucket',
+                Prefix='dir/',
+                Versions=True
+            )
+            print(response['Deleted'], response['DeletedPerSecond'])
+        """
+        if Versions:
+            keys = self.iter_object_versions(Bucket=Bucket, Prefix=Prefix)
+        else:
+            keys = self.iter_objects(Bucket=Bucket, Prefix=Prefix)
+        deleter = BulkDeleter(self, Bucket, MAXThread, MaxRetry, **kwargs)
+        return deleter.start(keys)
+
     def head_object(self, Bucket, Key, **kwargs):
         """获取文件信息
 
@@ -1039,7 +1187,7 @@ class CosS3Client(object):
         data = xml_to_dict(rt.content)
         return data
 
-    def upload_part(self, Bucket, Key, Body, PartNumber, UploadId, EnableMD5=False, **kwargs):
+    def upload_part(self, Bucket, Key, Body, PartNumber, UploadId, EnableMD5=False, EnableCRC=False, **kwargs):
         """上传分块，单个大小不得超过5GB
 
         :param Bucket(string): 存储桶名称.
@@ -1049,6 +1197,7 @@ class CosS3Client(object):
         :param UploadId(string): 分块上传创建的UploadId.
         :param kwargs(dict): 设置请求headers.
         :param EnableMD5(bool): 是否需要SDK计算Content-MD5，打开此开关会增加上传耗时.
+        :param EnableCRC(bool): 是否在发送数据的同时计算crc64和md5, 上传完成后与服务端返回的值校验, 不需要额外读取数据.
         :return(dict): 上传成功返回的结果，包含单个分块ETag等信息.
 
         .. code-block:: python
@@ -1077,6 +1226,9 @@ class CosS3Client(object):
             md5_str = get_content_md5(Body)
             if md5_str:
                 headers['Content-MD5'] = md5_str
+        hasher = None
+        if EnableCRC:
+            Body, hasher = wrap_hashing_body(Body)
         rt = self.send_request(
             method='PUT',
             url=url,
@@ -1086,6 +1238,8 @@ class CosS3Client(object):
             auth=CosS3Auth(self._conf, Key, params=params),
             data=Body)
         response = dict(**rt.headers)
+        if hasher is not None:
+            hasher.check(response)
         return response
 
     def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload={}, **kwargs):
@@ -1225,6 +1379,38 @@ class CosS3Client(object):
             decode_result(data, ['Key'], [])
         return data
 
+    def iter_parts(self, Bucket, Key, UploadId, MaxParts=1000, PartNumberMarker=0, Prefetch=True, **kwargs):
+        """遍历分块上传中所有已上传的分片, 自动翻页
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): COS路径.
+        :param UploadId(string): 分块上传创建的UploadId.
+        :param MaxParts(int): 设置单次请求返回最大的分块数量,最大为1000.
+        :param PartNumberMarker(int): 从PartNumberMarker下一个分块开始列出.
+        :param Prefetch(bool): 是否在处理当前页时在后台预取下一页.
+        :param kwargs(dict): 设置请求headers.
+        :return(Paginator): 迭代产出每个分块的信息, pages()逐页产出list_parts的结果.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 遍历已上传的分块
+            for part in client.iter_parts(Bucket='bucket', Key='multipartfile.txt', UploadId='uploadid'):
+                print(part['PartNumber'], part['ETag'])
+        """
+        def fetch_page(marker):
+            return self.list_parts(Bucket=Bucket, Key=Key, UploadId=UploadId, MaxParts=MaxParts,
+                                   PartNumberMarker=marker, **kwargs)
+
+        def get_next_token(page):
+            if page.get('IsTruncated') == 'true':
+                return int(page['NextPartNumberMarker'])
+            return None
+
+        return Paginator(fetch_page, get_next_token, lambda page: get_list_items(page, 'Part'),
+                         start_token=PartNumberMarker, prefetch=Prefetch)
+
     def put_object_acl(self, Bucket, Key, AccessControlPolicy={}, **kwargs):
         """设置object ACL
 
@@ -1519,6 +1705,79 @@ class CosS3Client(object):
             )
         return data
 
+    def iter_objects(self, Bucket, Prefix="", Delimiter="", Marker="", MaxKeys=1000, EncodingType="", Prefetch=True, **kwargs):
+        """遍历文件列表, 自动翻页
+
+        :param Bucket(string): 存储桶名称.
+        :param Prefix(string): 设置匹配文件的前缀.
+        :param Delimiter(string): 分隔符.
+        :param Marker(string): 从marker开始列出条目.
+        :param MaxKeys(int): 设置单次请求返回最大的数量,最大为1000.
+        :param EncodingType(string): 设置返回结果编码方式,只能设置为url.
+        :param Prefetch(bool): 是否在处理当前页时在后台预取下一页.
+        :param kwargs(dict): 设置请求headers.
+        :return(Paginator): 迭代产出Contents中的每个文件, pages()逐页产出list_objects的结果(包含CommonPrefixes).
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 遍历目录下所有的文件
+            for obj in client.iter_objects(Bucket='bucket', Prefix='dir/'):
+                print(obj['Key'], obj['Size'])
+            # 逐页获取子目录
+            for page in client.iter_objects(Bucket='bucket', Prefix='dir/', Delimiter='/').pages():
+                print(page.get('CommonPrefixes'))
+        """
+        def fetch_page(marker):
+            return self.list_objects(Bucket=Bucket, Prefix=Prefix, Delimiter=Delimiter, Marker=marker,
+                                     MaxKeys=MaxKeys, EncodingType=EncodingType, **kwargs)
+
+        def get_next_token(page):
+            if page.get('IsTruncated') != 'true':
+                return None
+            marker = page.get('NextMarker')
+            if not marker:  # 没有返回NextMarker时使用本页最后一个条目
+                items = get_list_items(page, 'Contents') + get_list_items(page, 'CommonPrefixes')
+                if not items:
+                    return None
+                marker = max([item.get('Key', item.get('Prefix')) for item in items])
+            if EncodingType:  # 用户设置了EncodingType时返回的marker未decode
+                marker = unquote(marker)
+            return marker
+
+        return Paginator(fetch_page, get_next_token, lambda page: get_list_items(page, 'Contents'),
+                         start_token=Marker, prefetch=Prefetch)
+
+    def iter_objects_parallel(self, Bucket, Prefix="", Marker="", MaxThread=10, Ordered=True, MaxKeys=1000,
+                              MaxBufferedKeys=100000, **kwargs):
+        """多线程并发遍历文件列表, 适用于文件数量很多的存储桶
+
+        通过CommonPrefixes和列举过程中的采样切分key空间, 多个区间并发列举后合并为一个结果流.
+
+        :param Bucket(string): 存储桶名称.
+        :param Prefix(string): 设置匹配文件的前缀.
+        :param Marker(string): 从marker之后开始列出条目.
+        :param MaxThread(int): 并发列举的线程数.
+        :param Ordered(bool): 为True时按key的字典序产出, 为False时按完成顺序产出.
+        :param MaxKeys(int): 单次请求返回最大的数量,最大为1000.
+        :param MaxBufferedKeys(int): 已列举但尚未被消费的最大条目数, 消费较慢时暂停列举以限制内存.
+        :param kwargs(dict): 设置请求headers.
+        :return(ParallelLister): 迭代产出Contents中的每个文件, get_metrics()获取列举速度等统计信息.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 并发遍历存储桶中的所有文件
+            lister = client.iter_objects_parallel(Bucket='bucket', MaxThread=16, Ordered=False)
+            for obj in lister:
+                print(obj['Key'])
+            print(lister.get_metrics())
+        """
+        return ParallelLister(self, Bucket=Bucket, Prefix=Prefix, Marker=Marker, MaxThread=MaxThread, Ordered=Ordered,
+                              MaxKeys=MaxKeys, MaxBufferedKeys=MaxBufferedKeys, **kwargs)
+
     def list_objects_versions(self, Bucket, Prefix="", Delimiter="", KeyMarker="", VersionIdMarker="", MaxKeys=1000,
                               EncodingType="", **kwargs):
         """获取文件列表
@@ -1594,6 +1853,193 @@ class CosS3Client(object):
             )
         return data
 
+    def iter_object_versions(self, Bucket, Prefix="", Delimiter="", KeyMarker="", VersionIdMarker="", MaxKeys=1000,
+                             EncodingType="", Prefetch=True, **kwargs):
+        """遍历多版本文件列表, 自动翻页
+
+        每页中的Version和DeleteMarker按响应中的顺序合并产出(同一个Key的版本和删除标记按修改时间从新到旧),
+        删除标记的IsDeleteMarker为'true', 其它为'false'. 产出的是副本, 不会修改pages()返回的结果.
+
+        :param Bucket(string): 存储桶名称.
+        :param Prefix(string): 设置匹配文件的前缀.
+        :param Delimiter(string): 分隔符.
+        :param KeyMarker(string): 从KeyMarker指定的Key开始列出条目.
+        :param VersionIdMarker(string): 从VersionIdMarker指定的版本开始列出条目.
+        :param MaxKeys(int): 设置单次请求返回最大的数量,最大为1000.
+        :param EncodingType(string): 设置返回结果编码方式,只能设置为url.
+        :param Prefetch(bool): 是否在处理当前页时在后台预取下一页.
+        :param kwargs(dict): 设置请求headers.
+        :return(Paginator): 迭代产出每个版本, pages()逐页产出list_objects_versions的结果.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 遍历所有的版本
+            for version in client.iter_object_versions(Bucket='bucket', Prefix='dir/'):
+                print(version['Key'], version['VersionId'], version['IsDeleteMarker'])
+        """
+        def fetch_page(marker):
+            return self.list_objects_versions(Bucket=Bucket, Prefix=Prefix, Delimiter=Delimiter, KeyMarker=marker[0],
+                                              VersionIdMarker=marker[1], MaxKeys=MaxKeys, EncodingType=EncodingType, **kwargs)
+
+        def get_next_token(page):
+            if page.get('IsTruncated') != 'true':
+                return None
+            key_marker = page.get('NextKeyMarker') or ''
+            version_id_marker = page.get('NextVersionIdMarker') or ''
+            if EncodingType:  # 用户设置了EncodingType时返回的marker未decode
+                key_marker = unquote(key_marker)
+            return (key_marker, version_id_marker)
+
+        def is_before(delete_marker, version):
+            """删除标记是否排在版本之前, 同一个Key内较新的在前, 时间相同时最新版本在前"""
+            if delete_marker['Key'] != version['Key']:
+                return delete_marker['Key'] < version['Key']
+            marker_time = delete_marker.get('LastModified', '')
+            version_time = version.get('LastModified', '')
+            if marker_time != version_time:
+                return marker_time > version_time
+            return delete_marker.get('IsLatest') == 'true'
+
+        def get_items(page):
+            versions = [dict(item, IsDeleteMarker='false') for item in get_list_items(page, 'Version')]
+            delete_markers = [dict(item, IsDeleteMarker='true') for item in get_list_items(page, 'DeleteMarker')]
+            if not delete_markers:
+                return versions
+            # 两个列表各自保持响应中的顺序, 归并后与响应中的顺序一致
+            items = list()
+            i = j = 0
+            while i < len(versions) and j < len(delete_markers):
+                if is_before(delete_markers[j], versions[i]):
+                    items.append(delete_markers[j])
+                    j += 1
+                else:
+                    items.append(versions[i])
+                    i += 1
+            items.extend(versions[i:])
+            items.extend(delete_markers[j:])
+            return items
+
+        return Paginator(fetch_page, get_next_token, get_items, start_token=(KeyMarker, VersionIdMarker), prefetch=Prefetch)
+
+    def list_objects_stream(self, Bucket, Prefix="", Delimiter="", Marker="", MaxKeys=1000, EncodingType="", **kwargs):
+        """流式获取文件列表, 适用于大量文件的扫描
+
+        与list_objects的参数相同, 但不会一次性读取并解析整页响应, 而是在迭代时边接收边解析,
+        每个文件产出一个只包含Key, Size, ETag, LastModified, StorageClass的ObjectSummary.
+        CommonPrefixes, IsTruncated, NextMarker在迭代结束后可以通过返回对象获取.
+
+        :param Bucket(string): 存储桶名称.
+        :param Prefix(string): 设置匹配文件的前缀.
+        :param Delimiter(string): 分隔符.
+        :param Marker(string): 从marker开始列出条目.
+        :param MaxKeys(int): 设置单次返回最大的数量,最大为1000.
+        :param EncodingType(string): 设置返回结果编码方式,只能设置为url.
+        :param kwargs(dict): 设置请求headers.
+        :return(ObjectListStream): 只能迭代一次的单页结果.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            marker = ''
+            while True:
+                result = client.list_objects_stream(Bucket='bucket', Prefix='dir/', Marker=marker)
+                for obj in result:
+                    print(obj.Key, obj.Size)
+                if not result.is_truncated:
+                    break
+                marker = result.next_marker
+        """
+        decodeflag = True  # 是否需要对结果进行decode
+        headers = mapped(kwargs)
+        url = self._conf.uri(bucket=Bucket)
+        logger.info("list objects stream, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        params = {
+            'prefix': Prefix,
+            'delimiter': Delimiter,
+            'marker': Marker,
+            'max-keys': MaxKeys
+        }
+        if EncodingType:
+            if EncodingType != 'url':
+                raise CosClientError('EncodingType must be url')
+            decodeflag = False  # 用户自己设置了EncodingType不需要去decode
+            params['encoding-type'] = EncodingType
+        else:
+            params['encoding-type'] = 'url'
+        params = format_values(params)
+        rt = self.send_request(
+            method='GET',
+            url=url,
+            bucket=Bucket,
+            stream=True,
+            params=params,
+            headers=headers,
+            auth=CosS3Auth(self._conf, params=params))
+        return ObjectListStream(rt, decodeflag)
+
+    def list_objects_versions_stream(self, Bucket, Prefix="", Delimiter="", KeyMarker="", VersionIdMarker="", MaxKeys=1000,
+                                     EncodingType="", **kwargs):
+        """流式获取多版本文件列表, 适用于大量文件的扫描
+
+        与list_objects_versions的参数相同, 迭代时边接收边解析, Version和DeleteMarker都产出为
+        ObjectVersionSummary, 通过IsDeleteMarker区分. CommonPrefixes, IsTruncated, NextKeyMarker,
+        NextVersionIdMarker在迭代结束后可以通过返回对象获取.
+
+        :param Bucket(string): 存储桶名称.
+        :param Prefix(string): 设置匹配文件的前缀.
+        :param Delimiter(string): 分隔符.
+        :param KeyMarker(string): 从KeyMarker指定的Key开始列出条目.
+        :param VersionIdMarker(string): 从VersionIdMarker指定的版本开始列出条目.
+        :param MaxKeys(int): 设置单次返回最大的数量,最大为1000.
+        :param EncodingType(string): 设置返回结果编码方式,只能设置为url.
+        :param kwargs(dict): 设置请求headers.
+        :return(ObjectVersionListStream): 只能迭代一次的单页结果.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            result = client.list_objects_versions_stream(Bucket='bucket', Prefix='dir/')
+            for version in result:
+                print(version.Key, version.VersionId, version.IsDeleteMarker)
+        """
+        headers = mapped(kwargs)
+        decodeflag = True
+        url = self._conf.uri(bucket=Bucket)
+        logger.info("list objects versions stream, url=:{url} ,headers=:{headers}".format(
+            url=url,
+            headers=headers))
+        params = {
+            'versions': '',
+            'prefix': Prefix,
+            'delimiter': Delimiter,
+            'key-marker': KeyMarker,
+            'version-id-marker': VersionIdMarker,
+            'max-keys': MaxKeys
+        }
+        if EncodingType:
+            if EncodingType != 'url':
+                raise CosClientError('EncodingType must be url')
+            decodeflag = False
+            params['encoding-type'] = EncodingType
+        else:
+            params['encoding-type'] = 'url'
+        params = format_values(params)
+        rt = self.send_request(
+            method='GET',
+            url=url,
+            bucket=Bucket,
+            stream=True,
+            params=params,
+            headers=headers,
+            auth=CosS3Auth(self._conf, params=params))
+        return ObjectVersionListStream(rt, decodeflag)
+
     def list_multipart_uploads(self, Bucket, Prefix="", Delimiter="", KeyMarker="", UploadIdMarker="", MaxUploads=1000,
                                EncodingType="", **kwargs):
         """获取Bucket中正在进行的分块上传
@@ -1669,6 +2115,45 @@ class CosS3Client(object):
             )
         return data
 
+    def iter_multipart_uploads(self, Bucket, Prefix="", Delimiter="", KeyMarker="", UploadIdMarker="", MaxUploads=1000,
+                               EncodingType="", Prefetch=True, **kwargs):
+        """遍历Bucket中正在进行的分块上传, 自动翻页
+
+        :param Bucket(string): 存储桶名称.
+        :param Prefix(string): 设置匹配文件的前缀.
+        :param Delimiter(string): 分隔符.
+        :param KeyMarker(string): 从KeyMarker指定的Key开始列出条目.
+        :param UploadIdMarker(string): 从UploadIdMarker指定的UploadID开始列出条目.
+        :param MaxUploads(int): 设置单次请求返回最大的数量,最大为1000.
+        :param EncodingType(string): 设置返回结果编码方式,只能设置为url.
+        :param Prefetch(bool): 是否在处理当前页时在后台预取下一页.
+        :param kwargs(dict): 设置请求headers.
+        :return(Paginator): 迭代产出每个分块上传, pages()逐页产出list_multipart_uploads的结果.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 遍历未完成的分块上传
+            for upload in client.iter_multipart_uploads(Bucket='bucket', Prefix='dir/'):
+                print(upload['Key'], upload['UploadId'])
+        """
+        def fetch_page(marker):
+            return self.list_multipart_uploads(Bucket=Bucket, Prefix=Prefix, Delimiter=Delimiter, KeyMarker=marker[0],
+                                               UploadIdMarker=marker[1], MaxUploads=MaxUploads, EncodingType=EncodingType, **kwargs)
+
+        def get_next_token(page):
+            if page.get('IsTruncated') != 'true':
+                return None
+            key_marker = page.get('NextKeyMarker') or ''
+            upload_id_marker = page.get('NextUploadIdMarker') or ''
+            if EncodingType:  # 用户设置了EncodingType时返回的marker未decode
+                key_marker = unquote(key_marker)
+            return (key_marker, upload_id_marker)
+
+        return Paginator(fetch_page, get_next_token, lambda page: get_list_items(page, 'Upload'),
+                         start_token=(KeyMarker, UploadIdMarker), prefetch=Prefetch)
+
     def head_bucket(self, Bucket, **kwargs):
         """确认bucket是否存在
 
@@ -3056,6 +3541,34 @@ class CosS3Client(object):
         data = xml_to_dict(rt.content)
         return data
 
+    def iter_bucket_inventory_configurations(self, Bucket, ContinuationToken=None, Prefetch=True, **kwargs):
+        """遍历存储桶清单规则, 自动翻页
+
+        :param Bucket(string): 存储桶名称
+        :param ContinuationToken(string): 分页参数, 从该位置开始列出
+        :param Prefetch(bool): 是否在处理当前页时在后台预取下一页.
+        :param kwargs(dict): 设置请求headers.
+        :return(Paginator): 迭代产出每个清单规则, pages()逐页产出list_bucket_inventory_configurations的结果.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 遍历bucket清单规则
+            for conf in client.iter_bucket_inventory_configurations(Bucket=bucket):
+                print(conf['Id'])
+        """
+        def fetch_page(token):
+            return self.list_bucket_inventory_configurations(Bucket=Bucket, ContinuationToken=token, **kwargs)
+
+        def get_next_token(page):
+            if page.get('IsTruncated') == 'true' and page.get('NextContinuationToken'):
+                return page['NextContinuationToken']
+            return None
+
+        return Paginator(fetch_page, get_next_token, lambda page: get_list_items(page, 'InventoryConfiguration'),
+                         start_token=ContinuationToken, prefetch=Prefetch)
+
     def post_bucket_inventory(self, Bucket, Id, InventoryConfiguration={}, **kwargs):
         """设置bucket的清单规则(一次性清单/即时清单)
 
@@ -3743,7 +4256,7 @@ class CosS3Client(object):
             'ObjectLock': None,
             'Replication': None,
         }
-        pool = SimpleThreadPool(num_threads=10)
+        pool = self._new_task_group(10, fail_fast=False)
 
         # HeadBucket
         def _head_bucket_wrapper(Bucket, **kwargs):
@@ -3762,7 +4275,7 @@ class CosS3Client(object):
             data.update({"Location": resp['x-cos-bucket-region']})
             url = self._conf.uri(bucket=Bucket).strip('/')
             data.update({'BucketUrl': url})
-        pool.add_task(_head_bucket_wrapper, Bucket, **kwargs)
+        pool.submit(_head_bucket_wrapper, Bucket, **kwargs)
 
         # Website
         def _get_bucket_website_wrapper(Bucket, **kwargs):
@@ -3771,7 +4284,7 @@ class CosS3Client(object):
                 data.update({'Website': resp})
             except CosServiceError as e:
                 logger.debug("get_bucket_meta failed to get website conf:{}".format(e))
-        pool.add_task(_get_bucket_website_wrapper, Bucket, **kwargs)
+        pool.submit(_get_bucket_website_wrapper, Bucket, **kwargs)
 
         # ObjectLock
         def _get_bucket_object_lock_wrapper(Bucket, **kwargs):
@@ -3780,7 +4293,7 @@ class CosS3Client(object):
                 data.update({'ObjectLock': resp})
             except CosServiceError as e:
                 logger.debug("get_bucket_meta failed to get object_lock conf:{}".format(e))
-        pool.add_task(_get_bucket_object_lock_wrapper, Bucket, **kwargs)
+        pool.submit(_get_bucket_object_lock_wrapper, Bucket, **kwargs)
 
         # ACL
         def _get_bucket_acl_wrapper(Bucket, **kwargs):
@@ -3789,7 +4302,7 @@ class CosS3Client(object):
                 data.update({'ACL': resp})
             except CosServiceError as e:
                 logger.debug("get_bucket_meta failed to get acl conf:{}".format(e))
-        pool.add_task(_get_bucket_acl_wrapper, Bucket, **kwargs)
+        pool.submit(_get_bucket_acl_wrapper, Bucket, **kwargs)
 
         # Logging
         def _get_bucket_logging_wrapper(Bucket, **kwargs):
@@ -3798,7 +4311,7 @@ class CosS3Client(object):
                 data.update({'Logging': resp})
             except CosServiceError as e:
                 logger.debug("get_bucket_meta failed to get logging conf:{}".format(e))
-        pool.add_task(_get_bucket_logging_wrapper, Bucket, **kwargs)
+        pool.submit(_get_bucket_logging_wrapper, Bucket, **kwargs)
 
         # Lifecycle
         def _get_bucket_lifecycle_wrapper(Bucket, **kwargs):
@@ -3807,7 +4320,7 @@ class CosS3Client(object):
                 data.update({'Lifecycle': resp})
             except CosServiceError as e:
                 logger.debug("get_bucket_meta failed to get lifecycle conf:{}".format(e))
-        pool.add_task(_get_bucket_lifecycle_wrapper, Bucket, **kwargs)
+        pool.submit(_get_bucket_lifecycle_wrapper, Bucket, **kwargs)
 
         # Replication
         def _get_bucket_replication_wrapper(Bucket, **kwargs):
@@ -3816,7 +4329,7 @@ class CosS3Client(object):
                 data.update({'Replication': resp})
             except CosServiceError as e:
                 logger.debug("get_bucket_meta failed to get replication conf:{}".format(e))
-        pool.add_task(_get_bucket_replication_wrapper, Bucket, **kwargs)
+        pool.submit(_get_bucket_replication_wrapper, Bucket, **kwargs)
 
         # Encryption
         def _get_bucket_encryption_wrapper(Bucket, **kwargs):
@@ -3825,7 +4338,7 @@ class CosS3Client(object):
                 data.update({'Encryption': resp})
             except CosServiceError as e:
                 logger.debug("get_bucket_meta failed to get encryption conf:{}".format(e))
-        pool.add_task(_get_bucket_encryption_wrapper, Bucket, **kwargs)
+        pool.submit(_get_bucket_encryption_wrapper, Bucket, **kwargs)
 
         # CORS
         def _get_bucket_cors_wrapper(Bucket, **kwargs):
@@ -3834,7 +4347,7 @@ class CosS3Client(object):
                 data.update({'CORS': resp})
             except CosServiceError as e:
                 logger.debug("get_bucket_meta failed to get cors conf:{}".format(e))
-        pool.add_task(_get_bucket_cors_wrapper, Bucket, **kwargs)
+        pool.submit(_get_bucket_cors_wrapper, Bucket, **kwargs)
 
         # Versioning
         def _get_bucket_versioning_wrapper(Bucket, **kwargs):
@@ -3843,7 +4356,7 @@ class CosS3Client(object):
                 data.update({'Versioning': resp})
             except CosServiceError as e:
                 logger.debug("get_bucket_meta failed to get versioning conf:{}".format(e))
-        pool.add_task(_get_bucket_versioning_wrapper, Bucket, **kwargs)
+        pool.submit(_get_bucket_versioning_wrapper, Bucket, **kwargs)
 
         # IntelligentTiering
         def _list_bucket_intelligenttiering_conf_wrapper(Bucket, **kwargs):
@@ -3852,7 +4365,7 @@ class CosS3Client(object):
                 data.update({'IntelligentTiering': resp})
             except CosServiceError as e:
                 logger.debug("get_bucket_meta failed to get intelligenttiering conf:{}".format(e))
-        pool.add_task(_list_bucket_intelligenttiering_conf_wrapper, Bucket, **kwargs)
+        pool.submit(_list_bucket_intelligenttiering_conf_wrapper, Bucket, **kwargs)
 
         # Tagging
         def _get_bucket_tagging_wrapper(Bucket, **kwargs):
@@ -3861,9 +4374,10 @@ class CosS3Client(object):
                 data.update({'Tagging': resp})
             except CosServiceError as e:
                 logger.debug("get_bucket_meta failed to get tagging conf:{}".format(e))
-        pool.add_task(_get_bucket_tagging_wrapper, Bucket, **kwargs)
+        pool.submit(_get_bucket_tagging_wrapper, Bucket, **kwargs)
 
-        pool.wait_completion()
+        # 与之前一致, 单项配置获取失败只记录日志
+        pool.wait(raise_error=False)
         return data
 
     # service interface begin
@@ -3926,8 +4440,42 @@ class CosS3Client(object):
         return data
 
     # Advanced interface
+    def iter_buckets(self, TagKey=None, TagValue=None, Region=None, CreateTime=None, Range=None, Marker="", MaxKeys=2000,
+                     Prefetch=True, **kwargs):
+        """遍历符合条件的bucket, 自动翻页
+
+        :param TagKey(string): 标签键
+        :param TagValue(string): 标签值
+        :param Region(string): 地域名称
+        :param CreateTime(Timestamp): GMT时间戳, 和 Range 参数一起使用, 支持根据创建时间过滤存储桶
+        :param Range(string): 和 CreateTime 参数一起使用, 支持根据创建时间过滤存储桶
+        :param Marker(string): 起始标记, 从该标记之后（不含）按照 UTF-8 字典序返回存储桶条目
+        :param MaxKeys(int): 单次请求返回最大的条目数量，默认值为2000，最大为2000
+        :param Prefetch(bool): 是否在处理当前页时在后台预取下一页.
+        :return(Paginator): 迭代产出每个bucket的信息, pages()逐页产出list_buckets的结果.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 遍历账户下所有存储桶
+            for bucket in client.iter_buckets():
+                print(bucket['Name'])
+        """
+        def fetch_page(marker):
+            return self.list_buckets(TagKey=TagKey, TagValue=TagValue, Region=Region, CreateTime=CreateTime, Range=Range,
+                                     Marker=marker, MaxKeys=MaxKeys, **kwargs)
+
+        def get_next_token(page):
+            if page.get('IsTruncated') == 'true' and page.get('NextMarker'):
+                return page['NextMarker']
+            return None
+
+        return Paginator(fetch_page, get_next_token, lambda page: get_list_items(page, 'Buckets', 'Bucket'),
+                         start_token=Marker, prefetch=Prefetch)
+
     def _upload_part(self, bucket, key, local_path, offset, size, part_num, uploadid, md5_lst, resumable_flag,
-                     already_exist_parts, enable_md5, progress_callback=None, **kwargs):
+                     already_exist_parts, enable_md5, progress_callback=None, enable_crc=False, checkpoint=None, **kwargs):
         """从本地文件中读取分块, 上传单个分块,将结果记录在md5——list中
 
         :param bucket(string): 存储桶名称.
@@ -3941,6 +4489,8 @@ class CosS3Client(object):
         :param resumable_flag(bool): 是否为断点续传.
         :param already_exist_parts(dict): 断点续传情况下,保存已经上传的块的序号和Etag.
         :param enable_md5(bool): 是否开启md5校验.
+        :param enable_crc(bool): 是否在发送的同时计算crc64并与服务端校验.
+        :param checkpoint(UploadCheckpoint): 断点续传的本地记录, 上传成功的分块追加到记录中.
         :param kwargs(dict): 设置请求headers.
         :return: None.
         """
@@ -3948,16 +4498,45 @@ class CosS3Client(object):
         if resumable_flag and part_num in already_exist_parts:
             md5_lst.append({'PartNumber': part_num, 'ETag': already_exist_parts[part_num]})
         else:
-            with open(local_path, 'rb') as fp:
-                fp.seek(offset, 0)
-                data = fp.read(size)
-            rt = self.upload_part(bucket, key, data, part_num, uploadid, enable_md5, **kwargs)
+            # 直接从文件区间流式发送分块, 不把整个分块读入内存
+            with FileRangeReader(local_path, offset, size) as data:
+                rt = self.upload_part(bucket, key, data, part_num, uploadid, enable_md5, enable_crc, **kwargs)
             lower_rt = dict([(k.lower(), v) for k, v in rt.items()])
             md5_lst.append({'PartNumber': part_num, 'ETag': lower_rt['etag']})
+            if checkpoint is not None:
+                checkpoint.finish_part(part_num, lower_rt['etag'])
         if progress_callback:
             progress_callback.report(size)
         return None
 
+    def _get_part_headers(self, kwargs):
+        """从上传的headers中取出上传分块时也需要携带的headers"""
+        # 增加限速功能
+        part_headers = dict()
+        if 'TrafficLimit' in kwargs:
+            part_headers['TrafficLimit'] = kwargs['TrafficLimit']
+        # SSE-C对象在上传段时也要求传入加密头域
+        if 'SSECustomerAlgorithm' in kwargs:
+            part_headers['SSECustomerAlgorithm'] = kwargs['SSECustomerAlgorithm']
+            part_headers['SSECustomerKey'] = kwargs['SSECustomerKey']
+            part_headers['SSECustomerKeyMD5'] = kwargs['SSECustomerKeyMD5']
+        return part_headers
+
+    def _get_copy_part_headers(self, kwargs):
+        """从拷贝的headers中取出分块拷贝时也需要携带的headers"""
+        part_headers = dict()
+        # 目标对象是SSE-C需要增加加密头域
+        if 'SSECustomerAlgorithm' in kwargs:
+            part_headers['SSECustomerAlgorithm'] = kwargs['SSECustomerAlgorithm']
+            part_headers['SSECustomerKey'] = kwargs['SSECustomerKey']
+            part_headers['SSECustomerKeyMD5'] = kwargs['SSECustomerKeyMD5']
+        # 源对象是SSE-C需要增加加密头域
+        if 'CopySourceSSECustomerAlgorithm' in kwargs:
+            part_headers['CopySourceSSECustomerAlgorithm'] = kwargs['CopySourceSSECustomerAlgorithm']
+            part_headers['CopySourceSSECustomerKey'] = kwargs['CopySourceSSECustomerKey']
+            part_headers['CopySourceSSECustomerKeyMD5'] = kwargs['CopySourceSSECustomerKeyMD5']
+        return part_headers
+
     def _get_resumable_uploadid(self, bucket, key):
         """从服务端获取未完成的分块上传任务,获取断点续传的uploadid
 
@@ -3992,12 +4571,14 @@ class CosS3Client(object):
         """
         if local_part_size != remote_part_size:
             return False
-        with open(local_path, 'rb') as fp:
-            fp.seek(offset, 0)
-            local_etag = get_raw_md5(fp.read(local_part_size))
-            if local_etag == remote_etag:
-                return True
-        return False
+        md5 = hashlib.md5()
+        with FileRangeReader(local_path, offset, local_part_size) as fp:
+            chunk = fp.read(DEFAULT_CHUNK_SIZE)
+            while chunk:
+                md5.update(chunk)
+                chunk = fp.read(DEFAULT_CHUNK_SIZE)
+        local_etag = '"' + md5.hexdigest() + '"'
+        return local_etag == remote_etag
 
     def _check_all_upload_parts(self, bucket, key, uploadid, local_path, parts_num, part_size, last_size,
                                 already_exist_parts):
@@ -4013,24 +4594,8 @@ class CosS3Client(object):
         :param already_exist_parts(dict): 保存已经上传的分块的part_num和Etag
         :return(bool): 本地文件是否通过校验,True为可以进行断点续传,False为不能进行断点续传
         """
-        parts_info = []
-        part_number_marker = 0
-        list_over_status = False
-        while list_over_status is False:
-            response = self.list_parts(
-                Bucket=bucket,
-                Key=key,
-                UploadId=uploadid,
-                PartNumberMarker=part_number_marker
-            )
-            # 已经存在的分块上传,有可能一个分块都没有上传,判断一下
-            if 'Part' in response:
-                parts_info.extend(response['Part'])
-            if response['IsTruncated'] == 'false':
-                list_over_status = True
-            else:
-                part_number_marker = int(response['NextPartNumberMarker'])
-        for part in parts_info:
+        # 已经存在的分块上传,有可能一个分块都没有上传; 校验当前页的同时预取下一页
+        for part in self.iter_parts(Bucket=bucket, Key=key, UploadId=uploadid):
             part_num = int(part['PartNumber'])
             # 如果分块数量大于本地计算出的最大数量,校验失败
             if part_num > parts_num:
@@ -4045,8 +4610,36 @@ class CosS3Client(object):
             already_exist_parts[part_num] = part['ETag']
         return True
 
+    def _load_upload_checkpoint(self, bucket, key, checkpoint, verify):
+        """从本地记录中获取断点续传的uploadid和已上传的分块
+
+        :param bucket(string): 存储桶名称.
+        :param key(string): 分块上传路径名.
+        :param checkpoint(UploadCheckpoint): 断点续传的本地记录.
+        :param verify(bool): 是否列出服务端的分块, 只保留ETag与记录一致的分块, 不读取本地文件.
+        :return(string): 可以续传的uploadid, 没有有效的记录时返回None.
+        """
+        uploadid = checkpoint.load()
+        if uploadid is None or not verify:
+            return uploadid
+        verified_parts = dict()
+        try:
+            for part in self.iter_parts(Bucket=bucket, Key=key, UploadId=uploadid):
+                part_num = int(part['PartNumber'])
+                if checkpoint.parts.get(part_num) == part['ETag']:
+                    verified_parts[part_num] = part['ETag']
+        except CosServiceError as e:
+            if e.get_error_code() != 'NoSuchUpload':
+                raise
+            logger.info("uploadid in upload record no longer exists, uploadid={uploadid}".format(uploadid=uploadid))
+            checkpoint.delete()
+            return None
+        checkpoint.reset_parts(verified_parts)
+        return uploadid
+
     def download_file(self, Bucket, Key, DestFilePath, PartSize=20, MAXThread=5, EnableCRC=False, progress_callback=None,
-                      DumpRecordDir=None, KeySimplifyCheck=True, DisableTempDestFilePath=False, MaxPartCount=10000, **Kwargs):
+                      DumpRecordDir=None, KeySimplifyCheck=True, DisableTempDestFilePath=False, MaxPartCount=10000, AutoTune=False,
+                      **Kwargs):
         """小于等于20MB的文件简单下载，大于20MB的文件使用续传下载
 
         :param Bucket(string): 存储桶名称.
@@ -4059,7 +4652,10 @@ class CosS3Client(object):
         :param KeySimplifyCheck(bool): 是否对Key进行posix路径语义归并检查
         :param DisableTempDestFilePath(bool): 简单下载写入目标文件时,不使用临时文件
         :param MaxPartCount(int): 分块下载的最大分块数
+        :param AutoTune(bool): 是否自适应调节并发, 开启后根据文件大小选择分块大小(忽略PartSize), MAXThread作为并发上限,
+            传输过程中根据吞吐和服务端限流(503 SlowDown)调整同时下载的分块数.
         :param kwargs(dict): 设置请求headers.
+        :return(dict): 开启AutoTune并使用分块下载时返回{'AutoTune': 调节结果}, 见TransferTuner.get_result, 否则返回None.
         """
         logger.debug("Start to download file, bucket: {0}, key: {1}, dest_filename: {2}, part_size: {3}MB,\
                      max_thread: {4}, max_part_count: {5}".format(Bucket, Key, DestFilePath, PartSize, MAXThread, MaxPartCount))
@@ -4075,6 +4671,8 @@ class CosS3Client(object):
             head_headers['VersionId'] = Kwargs['VersionId']
         object_info = self.head_object(Bucket, Key, **head_headers)
         file_size = int(object_info['Content-Length'])
+        if AutoTune:
+            PartSize = choose_part_size(file_size, MAXThread, MaxPartCount)
         if file_size <= 1024 * 1024 * PartSize:
             response = self.get_object(Bucket, Key, KeySimplifyCheck, **Kwargs)
             response['Body'].get_stream_to_file(DestFilePath, DisableTempDestFilePath)
@@ -4086,10 +4684,13 @@ class CosS3Client(object):
             callback = ProgressCallback(file_size, progress_callback)
 
         downloader = ResumableDownLoader(self, Bucket, Key, DestFilePath, object_info, PartSize, MAXThread, MaxPartCount, EnableCRC,
-                                         callback, DumpRecordDir, KeySimplifyCheck, **Kwargs)
-        downloader.start()
+                                         callback, DumpRecordDir, KeySimplifyCheck, auto_tune=AutoTune, **Kwargs)
+        result = downloader.start()
+        if AutoTune:
+            return {'AutoTune': result}
 
     def upload_file(self, Bucket, Key, LocalFilePath, PartSize=1, MAXThread=5, EnableMD5=False, progress_callback=None,
+                    EnableCRC=False, AutoTune=False, EnableCheckpoint=False, DumpRecordDir=None, VerifyCheckpoint=False,
                     **kwargs):
 
         """
@@ -4099,8 +4700,15 @@ class CosS3Client(object):
         :param PartSize(int): 分块的大小设置,单位为MB.
         :param MAXThread(int): 并发上传的最大线程数.
         :param EnableMD5(bool): 是否打开MD5校验.
+        :param EnableCRC(bool): 是否在发送的同时计算每个分块的crc64和md5并与服务端返回的值校验.
+        :param AutoTune(bool): 是否自适应调节并发, 开启后根据文件大小选择分块大小(忽略PartSize), MAXThread作为并发上限,
+            传输过程中根据吞吐和服务端限流(503 SlowDown)调整同时上传的分块数.
+        :param EnableCheckpoint(bool): 是否使用本地记录文件断点续传, 记录uploadid和已上传分块的ETag,
+            续传时不需要列出服务端的分块上传, 也不需要重新读取本地文件计算已上传分块的MD5. 本地文件变化时记录失效.
+        :param DumpRecordDir(string): 开启EnableCheckpoint时保存记录文件的目录, 默认为~/.cos_upload_record.
+        :param VerifyCheckpoint(bool): 续传前是否列出服务端已上传的分块, 与记录中的ETag对比, 不一致的分块重新上传.
         :param kwargs(dict): 设置请求headers.
-        :return(dict): 成功上传文件的元信息.
+        :return(dict): 成功上传文件的元信息, 开启AutoTune并使用分块上传时AutoTune字段为调节结果, 见TransferTuner.get_result.
 
         .. code-block:: python
 
@@ -4117,9 +4725,11 @@ class CosS3Client(object):
             )
         """
         file_size = os.path.getsize(LocalFilePath)
+        if AutoTune:
+            PartSize = choose_part_size(file_size, MAXThread)
         if file_size <= 1024 * 1024 * PartSize:
             with open(LocalFilePath, 'rb') as fp:
-                rt = self.put_object(Bucket=Bucket, Key=Key, Body=fp, EnableMD5=EnableMD5, **kwargs)
+                rt = self.put_object(Bucket=Bucket, Key=Key, Body=fp, EnableMD5=EnableMD5, EnableCRC=EnableCRC, **kwargs)
             return rt
         else:
             part_size = 1024 * 1024 * PartSize  # 默认按照1MB分块,最大支持10G的文件，超过10G的分块数固定为10000
@@ -4141,54 +4751,245 @@ class CosS3Client(object):
             # 判断是否可以断点续传
             resumable_flag = False
             already_exist_parts = {}
-            uploadid = self._get_resumable_uploadid(Bucket, Key)
-            if uploadid is not None:
-                logger.info("fetch an existed uploadid in remote cos, uploadid={uploadid}".format(uploadid=uploadid))
-                # 校验服务端返回的每个块的信息是否和本地的每个块的信息相同,只有校验通过的情况下才可以进行断点续传
-                resumable_flag = self._check_all_upload_parts(Bucket, Key, uploadid, LocalFilePath, parts_num,
-                                                              part_size, last_size, already_exist_parts)
+            checkpoint = None
+            if EnableCheckpoint:
+                # 使用本地记录续传, 不列出服务端的分块上传, 也不重新计算已上传分块的MD5
+                checkpoint = UploadCheckpoint(DumpRecordDir, Bucket, Key, LocalFilePath, part_size)
+                uploadid = self._load_upload_checkpoint(Bucket, Key, checkpoint, VerifyCheckpoint)
+                if uploadid is not None:
+                    logger.info("fetch an existed uploadid in upload record, uploadid={uploadid}".format(uploadid=uploadid))
+                    resumable_flag = True
+                    already_exist_parts = dict(checkpoint.parts)
+            else:
+                uploadid = self._get_resumable_uploadid(Bucket, Key)
+                if uploadid is not None:
+                    logger.info("fetch an existed uploadid in remote cos, uploadid={uploadid}".format(uploadid=uploadid))
+                    # 校验服务端返回的每个块的信息是否和本地的每个块的信息相同,只有校验通过的情况下才可以进行断点续传
+                    resumable_flag = self._check_all_upload_parts(Bucket, Key, uploadid, LocalFilePath, parts_num,
+                                                                  part_size, last_size, already_exist_parts)
             # 如果不能断点续传,则创建一个新的分块上传
             if not resumable_flag:
                 rt = self.create_multipart_upload(Bucket=Bucket, Key=Key, **kwargs)
                 uploadid = rt['UploadId']
                 logger.info("create a new uploadid in upload_file, uploadid={uploadid}".format(uploadid=uploadid))
+                if checkpoint is not None:
+                    checkpoint.create(uploadid)
 
-            # 增加限速功能
-            part_headers = dict()
-            if 'TrafficLimit' in kwargs:
-                part_headers['TrafficLimit'] = kwargs['TrafficLimit']
-            # SSE-C对象在上传段时也要求传入加密头域
-            if 'SSECustomerAlgorithm' in kwargs:
-                part_headers['SSECustomerAlgorithm'] = kwargs['SSECustomerAlgorithm']
-                part_headers['SSECustomerKey'] = kwargs['SSECustomerKey']
-                part_headers['SSECustomerKeyMD5'] = kwargs['SSECustomerKeyMD5']
+            part_headers = self._get_part_headers(kwargs)
 
             offset = 0  # 记录文件偏移量
             lst = list()  # 记录分块信息
-            pool = SimpleThreadPool(MAXThread)
+            pool = self._new_task_group(MAXThread)
+            tuner = TransferTuner(pool, MAXThread, part_size) if AutoTune else None
             callback = None
             if progress_callback:
                 callback = ProgressCallback(file_size, progress_callback)
-            for i in range(1, parts_num + 1):
-                if i == parts_num:  # 最后一块
-                    pool.add_task(self._upload_part, Bucket, Key, LocalFilePath, offset, file_size - offset, i,
-                                  uploadid, lst, resumable_flag, already_exist_parts, EnableMD5, callback, **part_headers)
-                else:
-                    pool.add_task(self._upload_part, Bucket, Key, LocalFilePath, offset, part_size, i, uploadid, lst,
-                                  resumable_flag, already_exist_parts, EnableMD5, callback, **part_headers)
+            if checkpoint is not None:
+                checkpoint.open()
+            try:
+                for i in range(1, parts_num + 1):
+                    size = file_size - offset if i == parts_num else part_size  # 最后一块取剩余的大小
+                    args = (Bucket, Key, LocalFilePath, offset, size, i, uploadid, lst, resumable_flag, already_exist_parts,
+                            EnableMD5, callback, EnableCRC, checkpoint)
+                    # 续传时已经上传的分块不发送请求, 不参与吞吐统计
+                    if tuner is not None and not (resumable_flag and i in already_exist_parts):
+                        pool.submit(tuner.run, size, self._upload_part, *args, **part_headers)
+                    else:
+                        pool.submit(self._upload_part, *args, **part_headers)
                     offset += part_size
 
-            pool.wait_completion()
-            result = pool.get_result()
-            if not result['success_all'] or len(lst) != parts_num:
+                # 任意分块失败后取消剩余的分块, 抛出失败分块的异常, 已上传的分块可以通过再次调用upload_file续传
+                pool.wait()
+            except CosServiceError as e:
+                # 记录中的uploadid已经被删除, 删除记录, 再次调用时重新上传
+                if checkpoint is not None and e.get_error_code() == 'NoSuchUpload':
+                    checkpoint.delete()
+                raise
+            finally:
+                if checkpoint is not None:
+                    checkpoint.close()
+            if len(lst) != parts_num:
                 raise CosClientError('some upload_part fail after max_retry, please upload_file again')
             lst = sorted(lst, key=lambda x: x['PartNumber'])  # 按PartNumber升序排列
 
             # 完成分块上传
-            rt = self.complete_multipart_upload(Bucket=Bucket, Key=Key, UploadId=uploadid,
-                                                MultipartUpload={'Part': lst})
+            try:
+                rt = self.complete_multipart_upload(Bucket=Bucket, Key=Key, UploadId=uploadid,
+                                                    MultipartUpload={'Part': lst})
+            except CosServiceError as e:
+                if checkpoint is None or e.get_error_code() != 'NoSuchUpload':
+                    raise
+                # 记录中的uploadid已经过期, 或者上次完成后没来得及删除记录, 删除记录后重新上传
+                checkpoint.delete()
+                if not resumable_flag:
+                    raise
+                logger.info("uploadid in upload record no longer exists, upload again, uploadid={uploadid}".format(uploadid=uploadid))
+                return self.upload_file(Bucket, Key, LocalFilePath, PartSize, MAXThread, EnableMD5, progress_callback, EnableCRC,
+                                        AutoTune, EnableCheckpoint, DumpRecordDir, VerifyCheckpoint, **kwargs)
+            if checkpoint is not None:
+                checkpoint.delete()
+            if tuner is not None:
+                rt['AutoTune'] = tuner.get_result()
             return rt
 
+    def open(self, Bucket, Key, Mode='rb', BlockSize=1024 * 1024, CacheBlocks=32, ReadAhead=4, MAXThread=4,
+             PartSize=10, MaxBufferSize=100, **kwargs):
+        """以文件对象的方式打开COS上的对象
+
+        读模式返回可seek的只读文件对象, 按块发送Range请求, 读取过的块保存在LRU缓存中, 顺序读取时并发预取后续的块,
+        适用于zip, parquet, tar等需要随机读取的场景, 不需要先下载整个文件.
+        写模式返回只写的文件对象, 写入的数据按分块在后台上传, close时完成上传, 不超过一个分块时使用简单上传,
+        可以直接作为gzip.GzipFile, csv.writer(需要io.TextIOWrapper包装)等的输出.
+
+        :param Bucket(string): 存储桶名称.
+        :param Key(string): COS路径.
+        :param Mode(string): 打开方式, 支持'rb'('r')和'wb'.
+        :param BlockSize(int): 读模式每次Range请求读取的块大小, 单位为字节.
+        :param CacheBlocks(int): 读模式最多缓存的块数.
+        :param ReadAhead(int): 读模式顺序读取时预取的块数, 为0时不预取.
+        :param MAXThread(int): 预取或分块上传的最大并发数.
+        :param PartSize(int): 写模式分块的大小, 单位为MB.
+        :param MaxBufferSize(int): 写模式排队等待上传的数据大小, 单位为MB, 超出时write阻塞.
+        :param kwargs(dict): 设置请求headers, 如读模式的VersionId, 写模式的ContentType.
+        :return(CosObjectReader|CosObjectWriter): 文件对象, 读模式通过get_stats()获取缓存命中的统计信息,
+            写模式close后通过response获取上传的结果.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 直接读取COS上zip文件中的单个文件
+            import zipfile
+            with client.open(Bucket='bucket', Key='test.zip') as fp:
+                with zipfile.ZipFile(fp) as zf:
+                    data = zf.read('test.txt')
+                print(fp.get_stats())
+            # 压缩后流式上传, 不需要先写入本地文件
+            import gzip
+            with client.open(Bucket='bucket', Key='test.log.gz', Mode='wb') as fp:
+                with gzip.GzipFile(fileobj=fp, mode='wb') as gz:
+                    gz.write(b'hello cos')
+        """
+        if Mode in ('r', 'rb'):
+            return CosObjectReader(self, Bucket, Key, BlockSize=BlockSize, CacheBlocks=CacheBlocks, ReadAhead=ReadAhead,
+                                   MAXThread=MAXThread, **kwargs)
+        if Mode == 'wb':
+            return CosObjectWriter(self, Bucket, Key, PartSize=PartSize, MAXThread=MAXThread, MaxBufferSize=MaxBufferSize,
+                                   **kwargs)
+        raise CosClientError("unsupported open mode: {0}, only 'rb' and 'wb' are supported".format(Mode))
+
+    def upload_directory(self, Bucket, LocalDir, Prefix='', PartSize=10, MAXThread=10, SkipUnchanged=False, EnableMD5=False,
+                         **kwargs):
+        """上传本地目录
+
+        边遍历目录边上传, 不超过PartSize的文件简单上传, 大文件分块上传, 所有文件和分块共用MAXThread个并发,
+        单个文件失败不影响其他文件, 失败的文件在返回结果的Failed中.
+
+        :param Bucket(string): 存储桶名称.
+        :param LocalDir(string): 本地目录.
+        :param Prefix(string): COS上的目标前缀, 如'dir/', 文件的key为Prefix加上相对LocalDir的路径.
+        :param PartSize(int): 分块的大小设置, 单位为MB, 不超过该大小的文件简单上传.
+        :param MAXThread(int): 同时上传的文件和分块数.
+        :param SkipUnchanged(bool): 是否跳过未变化的文件, 开始前列举一次Prefix(不需要逐个文件head_object),
+            大小相同并且COS上的修改时间不早于本地修改时间的文件跳过.
+        :param EnableMD5(bool): 是否计算Content-MD5.
+        :param kwargs(dict): 设置上传的headers, 如StorageClass.
+        :return(dict): Files为上传成功的文件数, Bytes为上传的字节数, Skipped为跳过的文件数, Failed为失败的文件列表,
+            Elapsed为耗时(秒), FilesPerSecond和BytesPerSecond为平均速率.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 上传本地目录, 跳过已经上传的文件
+            response = client.upload_directory(
+                Bucket='bucket',
+                LocalDir='/root/logs',
+                Prefix='logs/',
+                SkipUnchanged=True
+            )
+            for failed in response['Failed']:
+                print(failed['LocalPath'], failed['Error'])
+        """
+        uploader = DirectoryUploader(self, Bucket, LocalDir, Prefix, PartSize, MAXThread, SkipUnchanged, EnableMD5, **kwargs)
+        return uploader.start()
+
+    def download_directory(self, Bucket, Prefix, LocalDir, PartSize=20, MAXThread=10, SkipUnchanged=False, **kwargs):
+        """下载COS上一个前缀下的所有对象到本地目录
+
+        边列举边下载, 直接使用列举结果中的大小和ETag, 不需要逐个对象head_object. 不超过PartSize的对象一次GET下载,
+        大对象按Range分块并发下载, 所有对象和分块共用MAXThread个并发. 单个对象失败不影响其他对象.
+        下载的文件的修改时间设置为对象的LastModified.
+
+        :param Bucket(string): 存储桶名称.
+        :param Prefix(string): 下载的前缀, 如'dir/', 本地文件的路径为LocalDir加上key去掉Prefix的部分.
+        :param LocalDir(string): 本地目录.
+        :param PartSize(int): 分块的大小设置, 单位为MB, 不超过该大小的对象一次GET下载.
+        :param MAXThread(int): 同时下载的对象和分块数.
+        :param SkipUnchanged(bool): 是否跳过本地已经存在并且大小和修改时间都与对象一致的文件.
+        :param kwargs(dict): 设置下载的headers, 如TrafficLimit.
+        :return(dict): Files为下载成功的文件数, Bytes为下载的字节数, Skipped为跳过的文件数, Failed为失败的对象列表,
+            Elapsed为耗时(秒), FilesPerSecond和BytesPerSecond为平均速率.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 下载目录, 跳过本地已经下载过的文件
+            response = client.download_directory(
+                Bucket='bucket',
+                Prefix='data/',
+                LocalDir='./download',
+                SkipUnchanged=True
+            )
+            print(response['Files'], response['BytesPerSecond'])
+        """
+        downloader = DirectoryDownloader(self, Bucket, Prefix, LocalDir, PartSize, MAXThread, SkipUnchanged, **kwargs)
+        return downloader.start()
+
+    def sync(self, Source, Destination, Delete=False, DryRun=False, Checksum=False, PartSize=10, MAXThread=10,
+             ActionLog=None, **kwargs):
+        """同步本地目录与COS前缀, 或者两个COS前缀
+
+        源端和目标端按key有序列举后逐个比较, 不需要逐个对象head_object: 大小不同或ETag(MD5)不同的文件重新传输,
+        无法比较ETag时(如本地文件或分块上传的对象)比较修改时间, 开启Checksum时改为比较MD5或CRC64.
+        本地到COS为上传, COS到本地为下载, COS到COS为服务端拷贝, 所有操作共用MAXThread个并发, 单个文件失败不影响其他文件.
+
+        :param Source(string|dict): 源端, 本地目录或{'Bucket': 存储桶, 'Prefix': 前缀}, 跨地域或账号时可以加上'Client'.
+        :param Destination(string|dict): 目标端, 格式与Source相同, 源端和目标端不能都是本地目录.
+        :param Delete(bool): 是否删除只在目标端存在的文件.
+        :param DryRun(bool): 只计算差异并在ActionLog中记录计划的操作, 不执行.
+        :param Checksum(bool): 无法比较ETag时是否比较MD5或CRC64代替修改时间, 分块上传的对象需要head_object获取CRC64.
+        :param PartSize(int): 分块的大小设置, 单位为MB.
+        :param MAXThread(int): 同时执行的操作数.
+        :param ActionLog(string|file): 操作记录的文件路径或可写的文件对象, 每个操作一行JSON, 包括Action, Key,
+            Source, Destination, Size, Reason和Status(planned, done, failed).
+        :param kwargs(dict): 设置上传, 下载或拷贝的headers, 如StorageClass.
+        :return(dict): Planned为各类操作(upload, download, copy, delete)的数量, Unchanged为无需同步的文件数,
+            Done为成功的操作数, Failed为失败的操作列表, Bytes为传输的字节数, Elapsed为耗时(秒), DryRun为是否只计算差异.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 先查看需要执行的操作
+            response = client.sync(
+                Source='/root/logs',
+                Destination={'Bucket': 'bucket', 'Prefix': 'logs/'},
+                Delete=True,
+                DryRun=True,
+                ActionLog='/tmp/sync_plan.jsonl'
+            )
+            print(response['Planned'])
+            # 同步到另一个存储桶
+            response = client.sync(
+                Source={'Bucket': 'bucket', 'Prefix': 'logs/'},
+                Destination={'Bucket': 'backup-bucket', 'Prefix': 'logs/'}
+            )
+        """
+        engine = SyncEngine(self, Source, Destination, Delete, DryRun, Checksum, PartSize, MAXThread, ActionLog, **kwargs)
+        return engine.start()
+
     def _head_object_when_copy(self, CopySource, **kwargs):
         """查询源文件的长度"""
         bucket, path, endpoint, versionid = get_copy_source_info(CopySource, self._conf._enable_old_domain, self._conf._enable_internal_domain)
@@ -4241,7 +5042,7 @@ class CosS3Client(object):
             return True
         return False
 
-    def copy(self, Bucket, Key, CopySource, CopyStatus='Copy', PartSize=10, MAXThread=5, **kwargs):
+    def copy(self, Bucket, Key, CopySource, CopyStatus='Copy', PartSize=10, MAXThread=5, AutoTune=False, **kwargs):
         """文件拷贝，小于5G的文件调用copy_object，大于等于5G的文件调用分块上传的upload_part_copy
 
         :param Bucket(string): 存储桶名称.
@@ -4250,8 +5051,10 @@ class CosS3Client(object):
         :param CopyStatus(string): 拷贝状态,可选值'Copy'|'Replaced'.
         :param PartSize(int): 分块的大小设置.
         :param MAXThread(int): 并发上传的最大线程数.
+        :param AutoTune(bool): 分块拷贝时是否自适应调节并发, 开启后根据文件大小选择分块大小(忽略PartSize),
+            MAXThread作为并发上限, 传输过程中根据吞吐和服务端限流(503 SlowDown)调整同时拷贝的分块数.
         :param kwargs(dict): 设置请求headers.
-        :return(dict): 拷贝成功的结果.
+        :return(dict): 拷贝成功的结果, 开启AutoTune并使用分块拷贝时AutoTune字段为调节结果, 见TransferTuner.get_result.
 
         .. code-block:: python
 
@@ -4284,6 +5087,8 @@ class CosS3Client(object):
             return response
 
         # 如果源文件大小大于等于5G，则先创建分块上传，在调用upload_part
+        if AutoTune:
+            PartSize = choose_part_size(file_size, MAXThread)
         part_size = 1024 * 1024 * PartSize  # 默认按照10MB分块
         last_size = 0  # 最后一块可以小于1MB
         parts_num = file_size // part_size
@@ -4302,33 +5107,22 @@ class CosS3Client(object):
         # 上传分块拷贝
         offset = 0  # 记录文件偏移量
         lst = list()  # 记录分块信息
-        pool = SimpleThreadPool(MAXThread)
-
-        part_headers = dict()
-        # 目标对象是SSE-C需要增加加密头域
-        if 'SSECustomerAlgorithm' in kwargs:
-            part_headers['SSECustomerAlgorithm'] = kwargs['SSECustomerAlgorithm']
-            part_headers['SSECustomerKey'] = kwargs['SSECustomerKey']
-            part_headers['SSECustomerKeyMD5'] = kwargs['SSECustomerKeyMD5']
-        # 源对象是SSE-C需要增加加密头域
-        if 'CopySourceSSECustomerAlgorithm' in kwargs:
-            part_headers['CopySourceSSECustomerAlgorithm'] = kwargs['CopySourceSSECustomerAlgorithm']
-            part_headers['CopySourceSSECustomerKey'] = kwargs['CopySourceSSECustomerKey']
-            part_headers['CopySourceSSECustomerKeyMD5'] = kwargs['CopySourceSSECustomerKeyMD5']
+        pool = self._new_task_group(MAXThread)
+        tuner = TransferTuner(pool, MAXThread, part_size) if AutoTune else None
 
+        part_headers = self._get_copy_part_headers(kwargs)
         for i in range(1, parts_num + 1):
-            if i == parts_num:  # 最后一块
-                copy_range = gen_copy_source_range(offset, file_size - 1)
-                pool.add_task(self._upload_part_copy, Bucket, Key, i, uploadid, CopySource, copy_range, lst, **part_headers)
+            size = file_size - offset if i == parts_num else part_size  # 最后一块取剩余的大小
+            copy_range = gen_copy_source_range(offset, offset + size - 1)
+            if tuner is not None:
+                pool.submit(tuner.run, size, self._upload_part_copy, Bucket, Key, i, uploadid, CopySource, copy_range, lst,
+                            **part_headers)
             else:
-                copy_range = gen_copy_source_range(offset, offset + part_size - 1)
-                pool.add_task(self._upload_part_copy, Bucket, Key, i, uploadid, CopySource, copy_range, lst, **part_headers)
-                offset += part_size
+                pool.submit(self._upload_part_copy, Bucket, Key, i, uploadid, CopySource, copy_range, lst, **part_headers)
+            offset += part_size
 
-        pool.wait_completion()
-        result = pool.get_result()
-        if not result['success_all']:
-            raise CosClientError('some upload_part_copy fail after max_retry')
+        # 任意分块失败后取消剩余的分块, 抛出失败分块的异常
+        pool.wait()
 
         lst = sorted(lst, key=lambda x: x['PartNumber'])  # 按PartNumber升序排列
         # 完成分片上传
@@ -4338,9 +5132,11 @@ class CosS3Client(object):
         except Exception as e:
             abort_response = self.abort_multipart_upload(Bucket=Bucket, Key=Key, UploadId=uploadid)
             raise e
+        if tuner is not None:
+            rt['AutoTune'] = tuner.get_result()
         return rt
 
-    def _upload_part_from_buffer(self, bucket, key, data, part_num, uploadid, md5_lst):
+    def _upload_part_from_buffer(self, bucket, key, data, part_num, uploadid, md5_lst, **kwargs):
         """从内存中读取分块, 上传单个分块,将结果记录在md5——list中
 
         :param bucket(string): 存储桶名称.
@@ -4349,13 +5145,21 @@ class CosS3Client(object):
         :param part_num(int): 上传分块的序号.
         :param uploadid(string): 分块上传的uploadid.
         :param md5_lst(list): 保存上传成功分块的MD5和序号.
+        :param kwargs(dict): 设置请求headers.
         :return: None.
         """
 
-        rt = self.upload_part(bucket, key, data, part_num, uploadid)
+        rt = self.upload_part(bucket, key, data, part_num, uploadid, **kwargs)
         md5_lst.append({'PartNumber': part_num, 'ETag': rt['ETag']})
         return None
 
+    def _upload_part_from_pool_buffer(self, bucket, key, buffer_pool, buf, size, part_num, uploadid, md5_lst, **kwargs):
+        """上传缓冲池中的分块, 上传结束(包括失败)后把缓冲区归还到缓冲池"""
+        try:
+            self._upload_part_from_buffer(bucket, key, memoryview(buf)[:size], part_num, uploadid, md5_lst, **kwargs)
+        finally:
+            buffer_pool.release(buf)
+
     def upload_file_from_buffer(self, Bucket, Key, Body, MaxBufferSize=100, PartSize=10, MAXThread=5, **kwargs):
         """小于分块大小的的文件简单上传，大于等于分块大小的文件使用分块上传
 
@@ -4372,13 +5176,19 @@ class CosS3Client(object):
             raise CosClientError("Body must have attr read")
 
         part_size = 1024 * 1024 * PartSize
+        MAXQueue = MaxBufferSize // PartSize
+        if MAXQueue == 0:
+            MAXQueue = 1
+        # 排队和正在上传的分块, 以及正在读取的分块各占用一个缓冲区, 内存占用不超过(MAXQueue+MAXThread+1)*PartSize
+        buffer_pool = BufferPool(part_size, MAXQueue + MAXThread + 1)
 
         # 先读一个块,如果直接EOF了就调用简单文件上传
         part_num = 1
-        data = Body.read(part_size)
+        buf = buffer_pool.acquire()
+        size = readinto_full(Body, buf)
 
-        if len(data) < part_size:
-            rt = self.put_object(Bucket=Bucket, Key=Key, Body=data, **kwargs)
+        if size < part_size:
+            rt = self.put_object(Bucket=Bucket, Key=Key, Body=memoryview(buf)[:size], **kwargs)
             return rt
 
         # 创建分块上传
@@ -4386,21 +5196,27 @@ class CosS3Client(object):
         uploadid = rt['UploadId']
 
         lst = list()  # 记录分块信息
-        MAXQueue = MaxBufferSize // PartSize
-        if MAXQueue == 0:
-            MAXQueue = 1
-        pool = SimpleThreadPool(MAXThread, MAXQueue)
+        # 最多MAXQueue个分块排队等待上传, 控制内存占用
+        pool = self._new_task_group(MAXThread, MAXQueue)
         while True:
-            if not data:
+            if not size:
+                buffer_pool.release(buf)
+                break
+            future = pool.submit(self._upload_part_from_pool_buffer, Bucket, Key, buffer_pool, buf, size, part_num,
+                                 uploadid, lst)
+            # 有分块上传失败时排队的分块被取消, 不会执行上传, 需要在这里归还缓冲区
+            future.add_done_callback(partial(buffer_pool.release_if_cancelled, buf))
+            if future.cancelled():  # 有分块上传失败, 不再继续读取
                 break
-            pool.add_task(self._upload_part_from_buffer, Bucket, Key, data, part_num, uploadid, lst)
             part_num += 1
-            data = Body.read(part_size)
+            buf = buffer_pool.acquire()
+            size = readinto_full(Body, buf)
 
-        pool.wait_completion()
-        result = pool.get_result()
-        if not result['success_all']:
-            raise CosClientError('some upload_part fail after max_retry')
+        try:
+            pool.wait()
+        except Exception as e:
+            self.abort_multipart_upload(Bucket=Bucket, Key=Key, UploadId=uploadid)
+            raise e
         lst = sorted(lst, key=lambda x: x['PartNumber'])  # 按PartNumber升序排列
 
         # 完成分片上传
@@ -4491,6 +5307,33 @@ class CosS3Client(object):
             else:
                 raise e
 
+    def head_objects(self, Bucket, Keys, MAXThread=10, Ordered=True, **kwargs):
+        """并发查询多个对象的元数据
+
+        边读取Keys边在共享线程池中并发head_object, 返回迭代器, 不需要等待所有请求完成.
+        对象不存在或者查询失败时不抛出异常, 结果记录在对应key的Exists和Error中.
+
+        :param Bucket(string): 存储桶名称.
+        :param Keys(iterable): 待查询的key.
+        :param MAXThread(int): 同时进行的head_object请求数.
+        :param Ordered(bool): 为True时按Keys的顺序产出结果, 为False时按完成的顺序产出.
+        :param kwargs(dict): 设置请求headers.
+        :return(generator): 每个key产出一个dict, Key为对象的key, Exists为对象是否存在(查询失败时为None),
+            Metadata为head_object的结果(对象不存在时为None), Error为404以外的异常.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 查询多个文件的大小
+            for result in client.head_objects(Bucket='bucket', Keys=['a.txt', 'b.txt'], MAXThread=20):
+                if result['Exists']:
+                    print(result['Key'], result['Metadata']['Content-Length'])
+                elif result['Error'] is not None:
+                    print(result['Key'], result['Error'])
+        """
+        return iter_head_objects(self, Bucket, Keys, MAXThread, Ordered, **kwargs)
+
     def bucket_exists(self, Bucket):
         """判断一个存储桶是否存在
 
@@ -7943,6 +8786,44 @@ class CosS3Client(object):
         format_dict(data, ['JobsDetail'])
         return data
 
+    def ci_iter_media_jobs(self, Bucket, Tag, QueueId=None, StartCreationTime=None, EndCreationTime=None, OrderByTime='Desc', States='All',
+                           Size=10, NextToken='', Path='/jobs', Prefetch=True, **kwargs):
+        """ 遍历查询到的任务, 自动翻页 https://cloud.tencent.com/document/product/436/54011
+
+        :param Bucket(string): 存储桶名称.
+        :param QueueId(string): 队列ID.
+        :param Tag(string): 任务类型.
+        :param StartCreationTime(string): 开始时间.
+        :param EndCreationTime(string): 结束时间.
+        :param OrderByTime(string): 排序方式.
+        :param States(string): 任务状态.
+        :param Size(string): 单次请求的任务个数.
+        :param NextToken(string): 请求的上下文，从该位置开始翻页.
+        :param Prefetch(bool): 是否在处理当前页时在后台预取下一页.
+        :param kwargs(dict): 设置请求的headers.
+        :return(Paginator): 迭代产出每个任务的详情, pages()逐页产出ci_list_media_jobs的结果.
+
+        .. code-block:: python
+
+            config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token)  # 获取配置对象
+            client = CosS3Client(config)
+            # 遍历转码任务
+            for job in client.ci_iter_media_jobs(Bucket='bucket', QueueId='', Tag='Transcode'):
+                print(job['JobId'])
+        """
+        def fetch_page(token):
+            return self.ci_list_media_jobs(Bucket=Bucket, Tag=Tag, QueueId=QueueId, StartCreationTime=StartCreationTime,
+                                           EndCreationTime=EndCreationTime, OrderByTime=OrderByTime, States=States,
+                                           Size=Size, NextToken=token, Path=Path, **kwargs)
+
+        def get_next_token(page):
+            if page.get('NextToken') and get_list_items(page, 'JobsDetail'):
+                return page['NextToken']
+            return None
+
+        return Paginator(fetch_page, get_next_token, lambda page: get_list_items(page, 'JobsDetail'),
+                         start_token=NextToken, prefetch=Prefetch)
+
     def ci_create_workflow(self, Bucket, Body, **kwargs):
         """ 创建工作流接口 https://cloud.tencent.com/document/product/460/76856
 
@@ -4,6 +4,9 @@ from six import text_type, binary_type, string_types
 from six.moves.urllib.parse import quote, unquote, urlparse
 import hashlib
 import base64
+import crcmod
+import json
+import logging
 import os
 import io
 import re
@@ -17,8 +20,11 @@ from .xml2dict import Xml2Dict
 from .cos_exception import CosClientError
 from .cos_exception import CosServiceError
 
+logger = logging.getLogger(__name__)
+
 SINGLE_UPLOAD_LENGTH = 5 * 1024 * 1024 * 1024  # 单次上传文件最大为5GB
 DEFAULT_CHUNK_SIZE = 1024 * 1024  # 计算MD5值时,文件单次读取的块大小为1MB
+crc64_ecma = crcmod.mkCrcFun(0x142F0E1EBA9EA3693, initCrc=0, xorOut=0xffffffffffffffff, rev=True)  # 与COS的x-cos-hash-crc64ecma一致
 # kwargs中params到http headers的映射
 maplist = {
     'ContentLength': 'Content-Length',
@@ -114,7 +120,7 @@ def get_md5(data):
 
 def get_content_md5(body):
     """计算任何输入流的md5值"""
-    if isinstance(body, text_type) or isinstance(body, binary_type):
+    if isinstance(body, (text_type, binary_type, bytearray, memoryview)):
         return get_md5(body)
     elif hasattr(body, 'tell') and hasattr(body, 'seek') and hasattr(body, 'read'):
         file_position = body.tell()  # 记录文件当前位置
@@ -165,20 +171,75 @@ def dict_to_xml(data):
     return doc.toxml('utf-8')
 
 
+# xml_to_dict需要去掉的命名空间
+XML_NAMESPACES = frozenset([
+    "{http://www.qcloud.com/document/product/436/7751}",
+    "{https://cloud.tencent.com/document/product/436}",
+    "{http://doc.s3.amazonaws.com/2006-03-01}",
+    "{http://s3.amazonaws.com/doc/2006-03-01/}",
+    "{http://www.w3.org/2001/XMLSchema-instance}",
+])
+
+
+def _xml_dict_update(result, key, value):
+    """与Xml2Dict.updateDict一致, 重复的key合并为list并移动到末尾"""
+    if key in result:
+        old_value = result.pop(key)
+        if type(old_value) is not list:
+            result[key] = [old_value, value]
+        else:
+            old_value.append(value)
+            result[key] = old_value
+    else:
+        result[key] = value
+
+
+def _xml_node_to_dict(node, get_key):
+    """遍历ElementTree节点直接生成dict, 结构与Xml2Dict相同"""
+    result = dict()
+    if node.items():
+        for name, value in node.items():
+            _xml_dict_update(result, get_key(name), value)
+    if len(node) == 0:
+        _xml_dict_update(result, get_key(node.tag), node.text)
+    for element in node:
+        if len(element):
+            value = _xml_node_to_dict(element, get_key)
+        elif element.items():
+            value = dict([(get_key(name), attr) for name, attr in element.items()])
+            if element.text:
+                value[get_key(element.tag)] = element.text
+        else:
+            value = element.text
+        _xml_dict_update(result, get_key(element.tag), value)
+    return result
+
+
 def xml_to_dict(data, origin_str="", replace_str=""):
-    """V5使用xml格式，将response中的xml转换为dict"""
+    """V5使用xml格式，将response中的xml转换为dict
+
+    :param data(string): xml内容.
+    :param origin_str(string): 需要在key中替换的字符串.
+    :param replace_str(string): 替换后的字符串.
+    :return(dict): 转换后的dict, 已去掉命名空间.
+    """
     root = xml.etree.ElementTree.fromstring(data)
-    xmldict = Xml2Dict(root)
-    xmlstr = str(xmldict)
-    xmlstr = xmlstr.replace("{http://www.qcloud.com/document/product/436/7751}", "")
-    xmlstr = xmlstr.replace("{https://cloud.tencent.com/document/product/436}", "")
-    xmlstr = xmlstr.replace("{http://doc.s3.amazonaws.com/2006-03-01}", "")
-    xmlstr = xmlstr.replace("{http://s3.amazonaws.com/doc/2006-03-01/}", "")
-    xmlstr = xmlstr.replace("{http://www.w3.org/2001/XMLSchema-instance}", "")
-    if origin_str:
-        xmlstr = xmlstr.replace(origin_str, replace_str)
-    xmldict = eval(xmlstr)
-    return xmldict
+    key_cache = dict()  # 同一个响应中的tag大量重复, 缓存处理后的key
+
+    def get_key(tag):
+        key = key_cache.get(tag)
+        if key is None:
+            key = tag
+            if key[:1] == '{':
+                pos = key.find('}')
+                if pos > 0 and key[:pos + 1] in XML_NAMESPACES:
+                    key = key[pos + 1:]
+            if origin_str:
+                key = key.replace(origin_str, replace_str)
+            key_cache[tag] = key
+        return key
+
+    return _xml_node_to_dict(root, get_key)
 
 
 # def get_id_from_xml(data, name):
@@ -433,6 +494,200 @@ def get_file_like_object_length(data):
     return content_len
 
 
+class FileRangeReader(object):
+    """把本地文件的[offset, offset+size)区间包装为只读的文件流
+
+    作为请求的body时按块读取发送, 内存占用与分块大小无关. 支持tell/seek,
+    请求失败后可以通过client_can_retry回到起始位置重试.
+    """
+
+    def __init__(self, local_path, offset, size):
+        self._fp = open(local_path, 'rb')
+        self._offset = offset
+        self._size = size
+        self._position = 0
+        self._fp.seek(offset, 0)
+
+    def __len__(self):
+        return self._size
+
+    def read(self, size=-1):
+        remain = self._size - self._position
+        if size is None or size < 0 or size > remain:
+            size = remain
+        if size <= 0:
+            return b''
+        data = self._fp.read(size)
+        self._position += len(data)
+        return data
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._position
+        elif whence == 2:
+            offset += self._size
+        if offset < 0:
+            raise CosClientError('negative seek position {0}'.format(offset))
+        self._position = min(offset, self._size)
+        self._fp.seek(self._offset + self._position, 0)
+        return self._position
+
+    def close(self):
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_CRC64_ECMA_POLY = 0xC96C5795D7870F42  # 0x142F0E1EBA9EA3693按位反转后的多项式
+
+
+def _gf2_matrix_times(mat, vec):
+    result = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            result ^= mat[i]
+        vec >>= 1
+        i += 1
+    return result
+
+
+def _gf2_matrix_square(mat):
+    return [_gf2_matrix_times(mat, mat[n]) for n in range(64)]
+
+
+_crc64_zeros_operators = {}  # 追加n个0字节的运算矩阵, 分块大小通常只有一两种, 缓存后合并只需一次矩阵乘向量
+
+
+def _crc64_zeros_operator(length):
+    op = _crc64_zeros_operators.get(length)
+    if op is not None:
+        return op
+    # mat为在crc上追加一个0比特的运算矩阵, 平方三次后为追加一个0字节
+    mat = [_CRC64_ECMA_POLY] + [1 << n for n in range(63)]
+    for i in range(3):
+        mat = _gf2_matrix_square(mat)
+    n = length
+    while n:
+        if n & 1:
+            op = mat if op is None else [_gf2_matrix_times(mat, row) for row in op]
+        n >>= 1
+        if n:
+            mat = _gf2_matrix_square(mat)
+    if len(_crc64_zeros_operators) >= 64:
+        _crc64_zeros_operators.clear()
+    _crc64_zeros_operators[length] = op
+    return op
+
+
+def crc64_combine(crc1, crc2, len2):
+    """根据两段数据各自的crc64计算拼接后数据的crc64, 算法同zlib的crc32_combine
+
+    :param crc1(int): 第一段数据的crc64.
+    :param crc2(int): 第二段数据的crc64.
+    :param len2(int): 第二段数据的长度.
+    :return(int): 拼接后数据的crc64.
+    """
+    if len2 <= 0:
+        return crc1
+    return _gf2_matrix_times(_crc64_zeros_operator(len2), crc1) ^ crc2
+
+
+class DataHasher(object):
+    """增量计算上传数据的md5和crc64, 上传完成后与服务端返回的ETag和x-cos-hash-crc64ecma进行校验"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._md5 = hashlib.md5()
+        self._crc64 = 0
+        self.valid = True  # 数据没有按顺序完整读取时无法校验
+
+    def update(self, data):
+        data = to_bytes(data)
+        self._md5.update(data)
+        self._crc64 = crc64_ecma(data, self._crc64)
+
+    def get_md5(self):
+        return self._md5.hexdigest()
+
+    def get_crc64(self):
+        return str(self._crc64)
+
+    def check(self, response):
+        """校验服务端返回的结果, 不一致时抛出CosClientError
+
+        :param response(dict): 上传接口返回的headers.
+        """
+        if not self.valid:
+            return
+        lower_rt = dict([(k.lower(), v) for k, v in response.items()])
+        remote_crc64 = lower_rt.get('x-cos-hash-crc64ecma')
+        if remote_crc64 is not None and remote_crc64 != self.get_crc64():
+            raise CosClientError('crc of client: {0} is mismatch with cos: {1}'.format(self.get_crc64(), remote_crc64))
+        # 服务端加密的对象ETag不是内容的md5, 不做校验
+        if any(k.startswith('x-cos-server-side-encryption') for k in lower_rt):
+            return
+        remote_etag = lower_rt.get('etag', '').strip('"')
+        if re.match(r'^[0-9a-fA-F]{32}$', remote_etag) and remote_etag.lower() != self.get_md5():
+            raise CosClientError('md5 of client: {0} is mismatch with cos etag: {1}'.format(self.get_md5(), remote_etag))
+
+
+class HashingReader(object):
+    """包装上传的文件流, 在发送数据的同时计算md5和crc64, 不需要额外读取一遍数据
+
+    重试时请求body会seek回起始位置, 此时重新开始计算.
+    """
+
+    def __init__(self, body, hasher):
+        self._body = body
+        self._hasher = hasher
+        self._start = body.tell()
+        self._position = self._start
+
+    def read(self, size=-1):
+        data = self._body.read(size)
+        if data:
+            self._hasher.update(data)
+            self._position += len(data)
+        return data
+
+    def tell(self):
+        return self._body.tell()
+
+    def seek(self, offset, whence=0):
+        self._body.seek(offset, whence)
+        self._position = self._body.tell()
+        if self._position == self._start:
+            self._hasher.reset()
+        else:
+            self._hasher.valid = False
+        return self._position
+
+
+def wrap_hashing_body(body):
+    """返回用于发送的body和计算哈希的DataHasher
+
+    :param body(file|string): 上传的内容.
+    :return(tuple): (body, hasher).
+    """
+    hasher = DataHasher()
+    if isinstance(body, (text_type, binary_type, bytearray, memoryview)):
+        hasher.update(body)
+        return body, hasher
+    if hasattr(body, 'tell') and hasattr(body, 'seek') and hasattr(body, 'read'):
+        return HashingReader(body, hasher), hasher
+    raise CosClientError('unsupported body type to calculate crc64!')
+
+
 def check_object_content_length(data):
     """put_object接口和upload_part接口的文件大小不允许超过5G"""
     content_len = 0
@@ -528,7 +783,7 @@ def client_can_retry(file_position, **kwargs):
     if 'data' not in kwargs:
         return True
     body = kwargs['data']
-    if isinstance(body, text_type) or isinstance(body, binary_type):
+    if isinstance(body, (text_type, binary_type, bytearray, memoryview)):
         return True
     if file_position is not None and hasattr(body, 'tell') and hasattr(body, 'seek') and hasattr(body, 'read'):
         try:
@@ -583,6 +838,104 @@ class CiDetectType():
         return detect_type
 
 
+class BufferPool(object):
+    """循环复用的固定大小的bytearray, 限制分块上传占用的内存
+
+    缓冲区在第一次使用时才分配, 最多分配count个, 全部被占用时acquire阻塞直到有缓冲区被归还.
+
+    :param buffer_size(int): 单个缓冲区的大小.
+    :param count(int): 最多分配的缓冲区数量.
+    """
+
+    def __init__(self, buffer_size, count):
+        self._buffer_size = buffer_size
+        self._count = max(1, count)
+        self._free = list()
+        self._allocated = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while not self._free and self._allocated >= self._count:
+                self._cond.wait()
+            if self._free:
+                return self._free.pop()
+            self._allocated += 1
+        return bytearray(self._buffer_size)
+
+    def release(self, buf):
+        with self._cond:
+            self._free.append(buf)
+            self._cond.notify()
+
+    def release_if_cancelled(self, buf, future):
+        """作为Future的回调, 使用该缓冲区的任务被取消时归还缓冲区"""
+        if future.cancelled():
+            self.release(buf)
+
+
+def readinto_full(body, buf):
+    """从body中读取数据填满buf, 返回读取的字节数, 小于len(buf)说明已经读到末尾"""
+    view = memoryview(buf)
+    total = 0
+    if hasattr(body, 'readinto'):
+        while total < len(view):
+            n = body.readinto(view[total:])
+            if not n:
+                break
+            total += n
+        return total
+    while total < len(view):
+        data = body.read(len(view) - total)
+        if not data:
+            break
+        data = to_bytes(data)
+        view[total:total + len(data)] = data
+        total += len(data)
+    return total
+
+
+def replace_file(src, dst):
+    """用src替换dst, python3使用原子的os.replace"""
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+        return
+    try:
+        os.rename(src, dst)  # python2在posix上rename会原子地覆盖dst
+    except OSError:
+        # windows上rename不能覆盖已存在的文件
+        os.remove(dst)
+        os.rename(src, dst)
+
+
+def read_record_journal(path):
+    """读取断点续传的记录文件, 第一行为完整的记录, 之后每完成一个分块追加一行, 合并到记录的parts中
+
+    进程异常退出时最后一行可能不完整, 忽略该行, 对应的分块需要重新传输.
+    """
+    with open(path, 'r') as f:
+        record = json.loads(f.readline())
+        for line in f:
+            try:
+                part = json.loads(line)
+            except ValueError:
+                logger.warning('ignore incomplete record line in {0}'.format(path))
+                break
+            record['parts'].append(part)
+    return record
+
+
+def dump_record_journal(path, record):
+    """整体写入断点续传的记录文件, 追加的分块已经合并到record中
+
+    先写临时文件再替换, 写入过程中退出不会破坏原来的记录.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(json.dumps(record) + '\n')
+    replace_file(tmp_path, path)
+
+
 class ProgressCallback():
     def __init__(self, file_size, progress_callback):
         self.__lock = threading.Lock()
@@ -0,0 +1,384 @@
+# -*- coding=utf-8
+"""目录的批量上传和下载, 由CosS3Client.upload_directory和download_directory创建"""
+
+import os
+import errno
+import uuid
+import time
+import calendar
+import threading
+import logging
+from .cos_exception import CosClientError
+
+logger = logging.getLogger(__name__)
+
+
+def parse_last_modified(value):
+    """把列举结果中的LastModified(如2024-01-01T00:00:00.000Z)转换为时间戳, 精确到秒"""
+    return calendar.timegm(time.strptime(value[:19], '%Y-%m-%dT%H:%M:%S'))
+
+
+class TransferStats(object):
+    """批量传输的统计, 可以在多个线程中同时更新"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start_time = time.time()
+        self._files = 0
+        self._bytes = 0
+        self._skipped = 0
+        self._failed = list()
+
+    def add_file(self, key, local_path, size):
+        with self._lock:
+            self._files += 1
+            self._bytes += size
+
+    def add_skipped(self, key, local_path):
+        with self._lock:
+            self._skipped += 1
+
+    def add_failed(self, key, local_path, error):
+        logger.warning('transfer {0} <-> {1} failed: {2}'.format(local_path, key, error))
+        with self._lock:
+            self._failed.append({'Key': key, 'LocalPath': local_path, 'Error': error})
+
+    def get_result(self):
+        """获取统计结果
+
+        :return(dict): Files为传输成功的文件数, Bytes为传输成功的字节数, Skipped为未变化跳过的文件数,
+            Failed为失败的文件及异常, Elapsed为耗时(秒), FilesPerSecond和BytesPerSecond为平均速率.
+        """
+        with self._lock:
+            elapsed = max(time.time() - self._start_time, 1e-6)
+            return {
+                'Files': self._files,
+                'Bytes': self._bytes,
+                'Skipped': self._skipped,
+                'Failed': list(self._failed),
+                'Elapsed': elapsed,
+                'FilesPerSecond': self._files / elapsed,
+                'BytesPerSecond': self._bytes / elapsed,
+            }
+
+
+class _PartedFile(object):
+    """一个按分块传输的大文件, 最后一个结束的分块负责完成传输"""
+
+    def __init__(self, key, local_path, size, parts_num):
+        self.key = key
+        self.local_path = local_path
+        self.size = size
+        self.failed = False
+        self._remaining = parts_num
+        self._lock = threading.Lock()
+
+    def finish_part(self):
+        """记录一个分块结束, 返回是否是最后一个分块"""
+        with self._lock:
+            self._remaining -= 1
+            return self._remaining == 0
+
+    def set_failed(self):
+        """标记传输失败, 返回是否是第一次标记, 只有第一次需要处理失败"""
+        with self._lock:
+            if self.failed:
+                return False
+            self.failed = True
+            return True
+
+
+class DirectoryUploader(object):
+    """把本地目录上传到COS
+
+    边遍历目录边提交任务, 不预先收集整个文件列表. 不超过分块大小的文件直接简单上传, 大文件拆成分块,
+    所有文件和分块在同一个任务组中调度, 不为每个大文件单独创建线程池. 单个文件失败不影响其他文件.
+
+    :param client(CosS3Client): 用于发送请求的client.
+    :param bucket(string): 存储桶名称.
+    :param local_dir(string): 本地目录.
+    :param prefix(string): COS上的目标前缀, 文件的key为prefix加上相对local_dir的路径.
+    :param part_size(int): 分块大小, 单位为MB, 不超过该大小的文件简单上传.
+    :param max_thread(int): 同时上传的文件和分块数.
+    :param skip_unchanged(bool): 是否跳过未变化的文件, 开始前列举一次prefix, 大小相同并且COS上的修改时间不早于本地文件的跳过.
+    :param enable_md5(bool): 是否计算Content-MD5.
+    :param stats(TransferStats): 记录每个文件结果的统计, 为空时新建.
+    :param kwargs(dict): 设置上传的headers.
+    """
+
+    def __init__(self, client, bucket, local_dir, prefix='', part_size=10, max_thread=10, skip_unchanged=False,
+                 enable_md5=False, stats=None, **kwargs):
+        self._client = client
+        self._bucket = bucket
+        self._local_dir = local_dir
+        self._prefix = prefix
+        self._part_size = part_size * 1024 * 1024
+        self._max_thread = max_thread
+        self._skip_unchanged = skip_unchanged
+        self._enable_md5 = enable_md5
+        self._headers = kwargs
+        self._part_headers = client._get_part_headers(kwargs)
+        self._stats = stats if stats is not None else TransferStats()
+
+    def start(self):
+        """上传目录, 返回统计结果, 见TransferStats.get_result"""
+        snapshot = self._list_snapshot() if self._skip_unchanged else None
+        # 限制排队的任务数, 遍历速度不会超过上传速度太多
+        pool = self._client._new_task_group(self._max_thread, max_pending=self._max_thread * 2, fail_fast=False)
+        for local_path, key in self._walk():
+            try:
+                stat = os.stat(local_path)
+            except OSError as e:
+                self._stats.add_failed(key, local_path, e)
+                continue
+            if snapshot is not None and self._is_unchanged(snapshot.get(key), stat):
+                self._stats.add_skipped(key, local_path)
+                continue
+            self.submit_file(pool, key, local_path, stat.st_size)
+        pool.wait(raise_error=False)
+        return self._stats.get_result()
+
+    def submit_file(self, pool, key, local_path, size):
+        """把一个文件的上传任务提交到任务组, 不超过分块大小的文件简单上传, 否则分块上传"""
+        if size <= self._part_size:
+            pool.submit(self._upload_small_file, key, local_path, size)
+        else:
+            self._submit_multipart_file(pool, key, local_path, size)
+
+    def _walk(self):
+        """按目录逐层产出(本地路径, key)"""
+        for root, dirs, files in os.walk(self._local_dir):
+            dirs.sort()
+            rel_dir = os.path.relpath(root, self._local_dir)
+            for name in sorted(files):
+                rel_path = name if rel_dir == os.curdir else os.path.join(rel_dir, name)
+                yield os.path.join(root, name), self._prefix + rel_path.replace(os.sep, '/')
+
+    def _list_snapshot(self):
+        """列举一次prefix, 记录每个对象的大小和修改时间, 代替逐个文件head_object"""
+        snapshot = dict()
+        for obj in self._client.iter_objects(Bucket=self._bucket, Prefix=self._prefix):
+            snapshot[obj['Key']] = (int(obj['Size']), parse_last_modified(obj['LastModified']))
+        return snapshot
+
+    def _is_unchanged(self, remote, stat):
+        if remote is None:
+            return False
+        size, mtime = remote
+        return size == stat.st_size and mtime >= int(stat.st_mtime)
+
+    def _upload_small_file(self, key, local_path, size):
+        try:
+            with open(local_path, 'rb') as fp:
+                self._client.put_object(Bucket=self._bucket, Key=key, Body=fp, EnableMD5=self._enable_md5, **self._headers)
+        except Exception as e:
+            self._stats.add_failed(key, local_path, e)
+            return
+        self._stats.add_file(key, local_path, size)
+
+    def _submit_multipart_file(self, pool, key, local_path, size):
+        part_size = self._part_size
+        if (size + part_size - 1) // part_size > 10000:
+            part_size = (size + 9999) // 10000
+        parts_num = (size + part_size - 1) // part_size
+        try:
+            rt = self._client.create_multipart_upload(Bucket=self._bucket, Key=key, **self._headers)
+        except Exception as e:
+            self._stats.add_failed(key, local_path, e)
+            return
+        multipart_file = _PartedFile(key, local_path, size, parts_num)
+        multipart_file.upload_id = rt['UploadId']
+        multipart_file.parts = list()
+        for i in range(parts_num):
+            offset = i * part_size
+            pool.submit(self._upload_part, multipart_file, i + 1, offset, min(part_size, size - offset))
+
+    def _upload_part(self, multipart_file, part_num, offset, size):
+        if multipart_file.failed:  # 其他分块已经失败, 不再上传
+            return
+        try:
+            self._client._upload_part(self._bucket, multipart_file.key, multipart_file.local_path, offset, size, part_num,
+                                      multipart_file.upload_id, multipart_file.parts, False, None, self._enable_md5,
+                                      **self._part_headers)
+        except Exception as e:
+            self._fail_multipart_file(multipart_file, e)
+            return
+        if multipart_file.finish_part():
+            self._complete_multipart_file(multipart_file)
+
+    def _complete_multipart_file(self, multipart_file):
+        parts = sorted(multipart_file.parts, key=lambda x: x['PartNumber'])
+        try:
+            self._client.complete_multipart_upload(Bucket=self._bucket, Key=multipart_file.key,
+                                                   UploadId=multipart_file.upload_id, MultipartUpload={'Part': parts})
+        except Exception as e:
+            self._fail_multipart_file(multipart_file, e)
+            return
+        self._stats.add_file(multipart_file.key, multipart_file.local_path, multipart_file.size)
+
+    def _fail_multipart_file(self, multipart_file, error):
+        if not multipart_file.set_failed():
+            return
+        self._stats.add_failed(multipart_file.key, multipart_file.local_path, error)
+        try:
+            self._client.abort_multipart_upload(Bucket=self._bucket, Key=multipart_file.key,
+                                                UploadId=multipart_file.upload_id)
+        except Exception as e:
+            logger.warning('abort multipart upload {0} failed: {1}'.format(multipart_file.upload_id, e))
+
+
+class DirectoryDownloader(object):
+    """把COS上一个前缀下的对象下载到本地目录
+
+    边列举边下载, 不预先列出整个前缀. 直接使用列举结果中的Size, ETag和LastModified, 不需要逐个对象head_object.
+    不超过分块大小的对象使用一次GET下载, 大对象按Range拆成分块, 所有对象和分块在同一个任务组中调度.
+    请求都带上If-Match, 对象在列举之后被覆盖时该文件下载失败, 不会写入混合的数据.
+    下载完成的文件的修改时间设置为对象的LastModified, 再次下载时可以跳过大小和修改时间都一致的文件.
+
+    :param client(CosS3Client): 用于发送请求的client.
+    :param bucket(string): 存储桶名称.
+    :param prefix(string): 下载的前缀, 本地文件的路径为local_dir加上key去掉prefix的部分.
+    :param local_dir(string): 本地目录.
+    :param part_size(int): 分块大小, 单位为MB, 不超过该大小的对象使用一次GET下载.
+    :param max_thread(int): 同时下载的对象和分块数.
+    :param skip_unchanged(bool): 是否跳过本地已经存在并且大小和修改时间与对象一致的文件.
+    :param stats(TransferStats): 记录每个文件结果的统计, 为空时新建.
+    :param kwargs(dict): 设置下载的headers, 如TrafficLimit.
+    """
+
+    def __init__(self, client, bucket, prefix, local_dir, part_size=20, max_thread=10, skip_unchanged=False, stats=None,
+                 **kwargs):
+        self._client = client
+        self._bucket = bucket
+        self._prefix = prefix
+        self._local_dir = os.path.abspath(local_dir)
+        self._part_size = part_size * 1024 * 1024
+        self._max_thread = max_thread
+        self._skip_unchanged = skip_unchanged
+        self._headers = kwargs
+        self._stats = stats if stats is not None else TransferStats()
+        self._created_dirs = set()
+
+    def start(self):
+        """下载目录, 返回统计结果, 见TransferStats.get_result"""
+        pool = self._client._new_task_group(self._max_thread, max_pending=self._max_thread * 2, fail_fast=False)
+        for obj in self._client.iter_objects(Bucket=self._bucket, Prefix=self._prefix):
+            key = obj['Key']
+            if key.endswith('/'):  # 目录对象不需要下载
+                continue
+            local_path = self._get_local_path(key)
+            if local_path is None:
+                self._stats.add_failed(key, None, CosClientError('key {0} is outside of the local dir'.format(key)))
+                continue
+            size = int(obj['Size'])
+            mtime = parse_last_modified(obj['LastModified'])
+            if self._skip_unchanged and self._is_unchanged(local_path, size, mtime):
+                self._stats.add_skipped(key, local_path)
+                continue
+            self.submit_object(pool, key, local_path, size, mtime, obj['ETag'])
+        pool.wait(raise_error=False)
+        return self._stats.get_result()
+
+    def submit_object(self, pool, key, local_path, size, mtime, etag):
+        """把一个对象的下载任务提交到任务组, 不超过分块大小的对象一次GET下载, 否则分块下载"""
+        try:
+            self._make_dirs(os.path.dirname(local_path))
+        except OSError as e:
+            self._stats.add_failed(key, local_path, e)
+            return
+        if size <= self._part_size:
+            pool.submit(self._download_small_file, key, local_path, size, mtime, etag)
+        else:
+            self._submit_parted_file(pool, key, local_path, size, mtime, etag)
+
+    def _get_local_path(self, key):
+        """把key转换为本地路径, key中包含..等超出本地目录的路径时返回None"""
+        rel_path = key[len(self._prefix):].lstrip('/')
+        local_path = os.path.normpath(os.path.join(self._local_dir, *rel_path.split('/')))
+        if not local_path.startswith(os.path.join(self._local_dir, '')):
+            return None
+        return local_path
+
+    def _make_dirs(self, path):
+        if path in self._created_dirs:
+            return
+        try:
+            os.makedirs(path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        self._created_dirs.add(path)
+
+    def _is_unchanged(self, local_path, size, mtime):
+        try:
+            stat = os.stat(local_path)
+        except OSError:
+            return False
+        return stat.st_size == size and int(stat.st_mtime) == mtime
+
+    def _download_small_file(self, key, local_path, size, mtime, etag):
+        try:
+            rt = self._client.get_object(Bucket=self._bucket, Key=key, IfMatch=etag, **self._headers)
+            rt['Body'].get_stream_to_file(local_path)
+            os.utime(local_path, (mtime, mtime))
+        except Exception as e:
+            self._stats.add_failed(key, local_path, e)
+            return
+        self._stats.add_file(key, local_path, size)
+
+    def _submit_parted_file(self, pool, key, local_path, size, mtime, etag):
+        parts_num = (size + self._part_size - 1) // self._part_size
+        parted_file = _PartedFile(key, local_path, size, parts_num)
+        parted_file.mtime = mtime
+        parted_file.etag = etag
+        parted_file.error = None
+        parted_file.tmp_path = '{0}_{1}'.format(local_path, uuid.uuid4().hex)
+        parted_file.fd = None
+        try:
+            open(parted_file.tmp_path, 'wb').close()
+            if hasattr(os, 'pwrite'):
+                # 各分块共享同一个fd, 按绝对偏移写入
+                parted_file.fd = os.open(parted_file.tmp_path, os.O_RDWR)
+                os.ftruncate(parted_file.fd, size)
+        except (IOError, OSError) as e:
+            parted_file.error = e
+            self._finish_parted_file(parted_file)
+            return
+        for i in range(parts_num):
+            offset = i * self._part_size
+            pool.submit(self._download_part, parted_file, offset, min(self._part_size, size - offset))
+
+    def _download_part(self, parted_file, offset, size):
+        try:
+            if not parted_file.failed:  # 其他分块已经失败时不再下载
+                rt = self._client.get_object(Bucket=self._bucket, Key=parted_file.key, IfMatch=parted_file.etag,
+                                             Range='bytes={0}-{1}'.format(offset, offset + size - 1), **self._headers)
+                if parted_file.fd is not None:
+                    rt['Body'].pwrite_stream_to_fd(parted_file.fd, offset, size)
+                else:
+                    with open(parted_file.tmp_path, 'rb+') as f:
+                        rt['Body'].pget_stream_to_file(f, offset, size)
+        except Exception as e:
+            if parted_file.set_failed():
+                parted_file.error = e
+        # 所有分块都结束后才关闭fd, 避免其他线程写入已经关闭(可能被复用)的fd
+        if parted_file.finish_part():
+            self._finish_parted_file(parted_file)
+
+    def _finish_parted_file(self, parted_file):
+        try:
+            if parted_file.fd is not None:
+                os.close(parted_file.fd)
+            if parted_file.error is None:
+                if os.path.exists(parted_file.local_path):
+                    os.remove(parted_file.local_path)
+                os.rename(parted_file.tmp_path, parted_file.local_path)
+                os.utime(parted_file.local_path, (parted_file.mtime, parted_file.mtime))
+        except (IOError, OSError) as e:
+            parted_file.error = e
+        if parted_file.error is not None:
+            if os.path.exists(parted_file.tmp_path):
+                os.remove(parted_file.tmp_path)
+            self._stats.add_failed(parted_file.key, parted_file.local_path, parted_file.error)
+            return
+        self._stats.add_file(parted_file.key, parted_file.local_path, parted_file.size)
@@ -0,0 +1,177 @@
+# -*- coding=utf-8
+"""流式解析list_objects/list_objects_versions的响应, 边接收边产出精简的对象记录"""
+
+import xml.etree.ElementTree
+from six.moves.urllib.parse import unquote
+from .cos_exception import CosClientError
+
+
+def _local_tag(tag):
+    """去掉tag中的命名空间"""
+    if tag[:1] == '{':
+        return tag[tag.find('}') + 1:]
+    return tag
+
+
+class ObjectSummary(object):
+    """list_objects_stream返回的单个对象记录"""
+    __slots__ = ('Key', 'Size', 'ETag', 'LastModified', 'StorageClass')
+
+    def __init__(self, Key=None, Size=0, ETag=None, LastModified=None, StorageClass=None):
+        self.Key = Key
+        self.Size = Size
+        self.ETag = ETag
+        self.LastModified = LastModified
+        self.StorageClass = StorageClass
+
+    def __repr__(self):
+        return "ObjectSummary(Key=%r, Size=%r, ETag=%r, LastModified=%r)" % (
+            self.Key, self.Size, self.ETag, self.LastModified)
+
+
+class ObjectVersionSummary(object):
+    """list_objects_versions_stream返回的单个版本记录, 删除标记的IsDeleteMarker为True"""
+    __slots__ = ('Key', 'VersionId', 'IsLatest', 'IsDeleteMarker', 'Size', 'ETag', 'LastModified', 'StorageClass')
+
+    def __init__(self, Key=None, VersionId=None, IsLatest=False, IsDeleteMarker=False, Size=0, ETag=None,
+                 LastModified=None, StorageClass=None):
+        self.Key = Key
+        self.VersionId = VersionId
+        self.IsLatest = IsLatest
+        self.IsDeleteMarker = IsDeleteMarker
+        self.Size = Size
+        self.ETag = ETag
+        self.LastModified = LastModified
+        self.StorageClass = StorageClass
+
+    def __repr__(self):
+        return "ObjectVersionSummary(Key=%r, VersionId=%r, IsLatest=%r, IsDeleteMarker=%r, Size=%r)" % (
+            self.Key, self.VersionId, self.IsLatest, self.IsDeleteMarker, self.Size)
+
+
+class _ListStream(object):
+    """单页列举结果的流式迭代器
+
+    迭代时从连接中增量读取xml, 每解析完一条记录即产出并释放对应的节点,
+    单页占用的内存与条目数无关. 页级别的字段(IsTruncated, NextMarker等)在迭代过程中填充,
+    在迭代结束后读取才是完整的. 每个结果只能迭代一次.
+    """
+    _records = {}  # 记录节点的tag -> 生成记录的方法名
+    _decode_fields = ()  # EncodingType为url时需要decode的页级别字段
+
+    def __init__(self, rt, decode=True):
+        self._rt = rt
+        self._decode = decode
+        self._fields = dict()
+        self._iterated = False
+        self.common_prefixes = list()
+
+    def __iter__(self):
+        if self._iterated:
+            raise CosClientError('stream listing result can only be iterated once')
+        self._iterated = True
+        return self._parse()
+
+    def _parse(self):
+        raw = self._rt.raw
+        raw.decode_content = True
+        depth = 0
+        root = None
+        try:
+            for event, elem in xml.etree.ElementTree.iterparse(raw, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if root is None:
+                        root = elem
+                    continue
+                depth -= 1
+                if depth != 1:  # 只处理根节点的直接子节点, 更深的节点在父节点结束时统一处理
+                    continue
+                tag = _local_tag(elem.tag)
+                if tag in self._records:
+                    record = getattr(self, self._records[tag])(elem)
+                    root.clear()
+                    yield record
+                    continue
+                if tag == 'CommonPrefixes':
+                    for child in elem:
+                        if _local_tag(child.tag) == 'Prefix':
+                            self.common_prefixes.append(self._decode_value(child.text))
+                else:
+                    value = elem.text
+                    if tag in self._decode_fields:
+                        value = self._decode_value(value)
+                    self._fields[tag] = value
+                root.clear()
+        except xml.etree.ElementTree.ParseError as e:
+            raise CosClientError('parse list result failed: ' + str(e))
+        finally:
+            self.close()
+
+    def _decode_value(self, value):
+        if self._decode and value:
+            return unquote(value)
+        return value
+
+    def _children(self, elem):
+        return dict([(_local_tag(child.tag), child.text) for child in elem])
+
+    def close(self):
+        """释放连接, 未迭代完时丢弃剩余的数据"""
+        self._rt.close()
+
+    def get(self, name, default=None):
+        """获取页级别的字段, 如Name, Prefix, MaxKeys等"""
+        return self._fields.get(name, default)
+
+    @property
+    def is_truncated(self):
+        return self._fields.get('IsTruncated') == 'true'
+
+
+class ObjectListStream(_ListStream):
+    """list_objects_stream的返回结果, 迭代产出ObjectSummary"""
+    _records = {'Contents': '_make_object'}
+    _decode_fields = ('Prefix', 'Marker', 'NextMarker')
+
+    def _make_object(self, elem):
+        fields = self._children(elem)
+        return ObjectSummary(
+            Key=self._decode_value(fields.get('Key')),
+            Size=int(fields.get('Size') or 0),
+            ETag=fields.get('ETag'),
+            LastModified=fields.get('LastModified'),
+            StorageClass=fields.get('StorageClass'))
+
+    @property
+    def next_marker(self):
+        return self._fields.get('NextMarker')
+
+
+class ObjectVersionListStream(_ListStream):
+    """list_objects_versions_stream的返回结果, 迭代产出ObjectVersionSummary"""
+    _records = {'Version': '_make_version', 'DeleteMarker': '_make_delete_marker'}
+    _decode_fields = ('Prefix', 'KeyMarker', 'NextKeyMarker', 'VersionIdMarker', 'NextVersionIdMarker')
+
+    def _make_version(self, elem, is_delete_marker=False):
+        fields = self._children(elem)
+        return ObjectVersionSummary(
+            Key=self._decode_value(fields.get('Key')),
+            VersionId=fields.get('VersionId'),
+            IsLatest=fields.get('IsLatest') == 'true',
+            IsDeleteMarker=is_delete_marker,
+            Size=int(fields.get('Size') or 0),
+            ETag=fields.get('ETag'),
+            LastModified=fields.get('LastModified'),
+            StorageClass=fields.get('StorageClass'))
+
+    def _make_delete_marker(self, elem):
+        return self._make_version(elem, is_delete_marker=True)
+
+    @property
+    def next_key_marker(self):
+        return self._fields.get('NextKeyMarker')
+
+    @property
+    def next_version_id_marker(self):
+        return self._fields.get('NextVersionIdMarker')
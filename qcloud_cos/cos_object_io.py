@@ -0,0 +1,319 @@
+# -*- coding=utf-8
+"""把COS对象包装为文件对象, 由CosS3Client.open创建"""
+
+import io
+import threading
+import logging
+from collections import OrderedDict
+from .cos_exception import CosClientError
+
+logger = logging.getLogger(__name__)
+
+
+class CosObjectReader(io.RawIOBase):
+    """可seek的只读文件对象, 按固定大小的块通过Range请求读取对象
+
+    读取过的块保存在LRU缓存中, 检测到顺序读取时在后台并发预取后续的块.
+    打开时记录对象的ETag, 之后的Range请求都带上If-Match, 对象被覆盖时读取会失败而不会读到混合的数据.
+
+    :param client(CosS3Client): 用于发送请求的client.
+    :param Bucket(string): 存储桶名称.
+    :param Key(string): COS路径.
+    :param BlockSize(int): 每次Range请求读取的块大小, 单位为字节.
+    :param CacheBlocks(int): 最多缓存的块数.
+    :param ReadAhead(int): 顺序读取时预取的块数, 为0时不预取.
+    :param MAXThread(int): 预取的最大并发数.
+    :param kwargs(dict): 设置请求headers, 如VersionId, SSE-C相关的头部.
+    """
+
+    def __init__(self, client, Bucket, Key, BlockSize=1024 * 1024, CacheBlocks=32, ReadAhead=4, MAXThread=4, **kwargs):
+        if BlockSize <= 0:
+            raise CosClientError('BlockSize must be positive')
+        self._client = client
+        self._bucket = Bucket
+        self._key = Key
+        self._block_size = BlockSize
+        self._read_ahead = max(0, ReadAhead)
+        self._cache_blocks = max(CacheBlocks, self._read_ahead + 1)
+        self._kwargs = kwargs
+
+        head_kwargs = dict((k, v) for k, v in kwargs.items() if k != 'Range')
+        response = client.head_object(Bucket=Bucket, Key=Key, **head_kwargs)
+        self._size = int(response['Content-Length'])
+        self._etag = response.get('ETag')
+        self._pos = 0
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # 块序号 -> 数据, 按最近使用排序
+        self._inflight = dict()  # 预取中的块序号 -> future
+        self._last_block = None
+        self._pool = client._new_task_group(MAXThread, fail_fast=False) if self._read_ahead else None
+        self._stats = {'hits': 0, 'misses': 0, 'prefetch_hits': 0, 'prefetched': 0, 'requests': 0, 'bytes_fetched': 0}
+
+    @property
+    def size(self):
+        return self._size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError('invalid whence ({0})'.format(whence))
+        if pos < 0:
+            raise ValueError('negative seek position {0}'.format(pos))
+        self._pos = pos
+        return self._pos
+
+    def readinto(self, b):
+        view = memoryview(b)
+        total = 0
+        while total < len(view) and self._pos < self._size:
+            index = self._pos // self._block_size
+            data = self._get_block(index)
+            start = self._pos - index * self._block_size
+            n = min(len(view) - total, len(data) - start)
+            view[total:total + n] = memoryview(data)[start:start + n]
+            total += n
+            self._pos += n
+        return total
+
+    def readall(self):
+        return self.read(max(0, self._size - self._pos))
+
+    def get_stats(self):
+        """获取缓存的统计信息
+
+        :return(dict): hits为命中缓存的块数, misses为需要同步请求的块数, prefetch_hits为命中预取的块数,
+            prefetched为预取请求的块数, requests为发出的Range请求数, bytes_fetched为下载的字节数.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_blocks'] = len(self._cache)
+        return stats
+
+    def close(self):
+        """关闭文件, 取消尚未开始的预取并释放缓存"""
+        if not self.closed:
+            if self._pool is not None:
+                self._pool.cancel()
+            with self._lock:
+                self._cache.clear()
+                self._inflight.clear()
+        super(CosObjectReader, self).close()
+
+    def _block_range(self, index):
+        start = index * self._block_size
+        end = min(start + self._block_size, self._size) - 1
+        return start, end
+
+    def _fetch_block(self, index):
+        start, end = self._block_range(index)
+        kwargs = dict(self._kwargs)
+        kwargs['Range'] = 'bytes={0}-{1}'.format(start, end)
+        if self._etag is not None:
+            kwargs['IfMatch'] = self._etag
+        response = self._client.get_object(Bucket=self._bucket, Key=self._key, **kwargs)
+        data = response['Body'].read(-1)
+        if len(data) != end - start + 1:
+            raise CosClientError('read block of {0} failed, expected {1} bytes, got {2}'.format(
+                self._key, end - start + 1, len(data)))
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['bytes_fetched'] += len(data)
+        return data
+
+    def _put_cache(self, index, data):
+        """调用时需要持有self._lock"""
+        self._cache[index] = data
+        while len(self._cache) > self._cache_blocks:
+            self._cache.popitem(last=False)
+
+    def _prefetch_block(self, index):
+        """预取的块只放入缓存, 不作为future的结果返回, 避免任务组持有已经淘汰的数据"""
+        try:
+            data = self._fetch_block(index)
+        finally:
+            with self._lock:
+                # 失败时读取到该块会重新同步请求; 文件已关闭时丢弃数据
+                inflight = self._inflight.pop(index, False) is not False
+        if inflight:
+            with self._lock:
+                self._put_cache(index, data)
+
+    def _get_block(self, index):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        sequential = self._last_block is not None and index == self._last_block + 1
+        self._last_block = index
+        with self._lock:
+            data = self._cache.pop(index, None)
+            future = self._inflight.get(index)
+            if data is not None:
+                self._cache[index] = data  # 移到最近使用的位置
+                self._stats['hits'] += 1
+        if data is None and future is not None:
+            future.exception()  # 等待预取结束
+            with self._lock:
+                data = self._cache.get(index)
+                if data is not None:
+                    self._stats['prefetch_hits'] += 1
+        if data is None:
+            data = self._fetch_block(index)
+            with self._lock:
+                self._stats['misses'] += 1
+                self._put_cache(index, data)
+        if sequential:
+            self._schedule_read_ahead(index)
+        return data
+
+    def _schedule_read_ahead(self, index):
+        if self._pool is None:
+            return
+        last = (self._size - 1) // self._block_size
+        for i in range(index + 1, min(index + self._read_ahead, last) + 1):
+            with self._lock:
+                if i in self._cache or i in self._inflight:
+                    continue
+                self._stats['prefetched'] += 1
+                self._inflight[i] = None  # 先占位, 避免同一个块被重复预取
+            future = self._pool.submit(self._prefetch_block, i)
+            with self._lock:
+                if self._inflight.get(i, False) is None:  # 在当前线程中执行时已经结束
+                    self._inflight[i] = future
+
+
+class CosObjectWriter(io.RawIOBase):
+    """只写的文件对象, 写入的数据按分块大小缓存后在后台分块上传, close时完成上传
+
+    数据不超过一个分块时close时使用put_object简单上传; 排队等待上传的分块数达到上限时write阻塞, 控制内存占用.
+    在with语句中发生异常时放弃上传, 不会产生不完整的对象. 对象被回收时不会自动完成上传, 需要显式调用close.
+
+    :param client(CosS3Client): 用于发送请求的client.
+    :param Bucket(string): 存储桶名称.
+    :param Key(string): COS路径.
+    :param PartSize(int): 分块的大小设置, 单位为MB.
+    :param MAXThread(int): 并发上传的最大线程数.
+    :param MaxBufferSize(int): 排队等待上传的数据大小, 单位为MB, 超出时write阻塞.
+    :param kwargs(dict): 设置上传的headers.
+    """
+
+    def __init__(self, client, Bucket, Key, PartSize=10, MAXThread=5, MaxBufferSize=100, **kwargs):
+        if PartSize <= 0:
+            raise CosClientError('PartSize must be positive')
+        self._client = client
+        self._bucket = Bucket
+        self._key = Key
+        self._part_size = PartSize * 1024 * 1024
+        self._max_thread = MAXThread
+        self._max_queue = max(1, MaxBufferSize // PartSize)
+        self._kwargs = kwargs
+        self._part_headers = client._get_part_headers(kwargs)
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._pool = None
+        self._parts = list()
+        self._part_num = 0
+        self._size = 0
+        self.response = None  # close之后为上传接口返回的结果
+
+    def __del__(self):
+        # 不在回收时完成上传, 避免把写入了一半的数据作为完整的对象上传
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._size
+
+    def write(self, b):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        view = memoryview(b)
+        if view.itemsize != 1:
+            view = memoryview(view.tobytes())
+        self._buffer += view
+        self._size += len(view)
+        while len(self._buffer) >= self._part_size:
+            data = bytes(self._buffer[:self._part_size])
+            del self._buffer[:self._part_size]
+            self._submit_part(data)
+        return len(view)
+
+    def _submit_part(self, data):
+        if self._upload_id is None:
+            rt = self._client.create_multipart_upload(Bucket=self._bucket, Key=self._key, **self._kwargs)
+            self._upload_id = rt['UploadId']
+            self._pool = self._client._new_task_group(self._max_thread, self._max_queue)
+            logger.info("create a new uploadid in CosObjectWriter, uploadid={uploadid}".format(uploadid=self._upload_id))
+        self._part_num += 1
+        if self._part_num > 10000:
+            self.abort()
+            raise CosClientError('the number of parts exceeds 10000, please use a larger PartSize')
+        future = self._pool.submit(self._client._upload_part_from_buffer, self._bucket, self._key, data, self._part_num,
+                                   self._upload_id, self._parts, **self._part_headers)
+        if future.cancelled():  # 有分块上传失败, 抛出失败分块的异常
+            self._wait_parts()
+
+    def _wait_parts(self):
+        try:
+            self._pool.wait()
+        except Exception:
+            self.abort()
+            raise
+
+    def close(self):
+        """上传剩余的数据并完成上传, 返回的结果保存在response中"""
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self.response = self._client.put_object(Bucket=self._bucket, Key=self._key, Body=bytes(self._buffer),
+                                                        **self._kwargs)
+            else:
+                if self._buffer:
+                    self._submit_part(bytes(self._buffer))
+                self._wait_parts()
+                parts = sorted(self._parts, key=lambda x: x['PartNumber'])
+                try:
+                    self.response = self._client.complete_multipart_upload(
+                        Bucket=self._bucket, Key=self._key, UploadId=self._upload_id, MultipartUpload={'Part': parts})
+                except Exception:
+                    self.abort()
+                    raise
+                self._upload_id = None
+        finally:
+            self._buffer = bytearray()
+            super(CosObjectWriter, self).close()
+
+    def abort(self):
+        """放弃上传, 已经上传的分块被删除"""
+        self._buffer = bytearray()
+        if self._upload_id is not None:
+            upload_id = self._upload_id
+            self._upload_id = None
+            self._pool.cancel()
+            try:
+                self._client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=upload_id)
+            except Exception as e:
+                logger.warning('abort multipart upload {0} failed: {1}'.format(upload_id, e))
+        super(CosObjectWriter, self).close()
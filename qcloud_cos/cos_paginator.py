@@ -0,0 +1,86 @@
+# -*- coding=utf-8
+"""分页列举接口的通用迭代器, 支持在后台线程预取下一页"""
+
+import sys
+import threading
+from six import reraise
+
+
+class _PageFetcher(threading.Thread):
+    """在后台线程中请求一页数据"""
+
+    def __init__(self, fetch_page, token):
+        super(_PageFetcher, self).__init__()
+        self.daemon = True
+        self._fetch_page = fetch_page
+        self._token = token
+        self._page = None
+        self._exc_info = None
+
+    def run(self):
+        try:
+            self._page = self._fetch_page(self._token)
+        except Exception:
+            self._exc_info = sys.exc_info()
+
+    def result(self):
+        if self.ident is not None:  # 未开启预取时在当前线程中执行, 不需要join
+            self.join()
+        if self._exc_info is not None:
+            reraise(*self._exc_info)
+        return self._page
+
+
+class Paginator(object):
+    """分页迭代器, 迭代时逐条产出每页中的条目, pages()逐页产出完整的响应
+
+    开启预取时, 拿到当前页后立即在后台线程请求下一页, 调用方处理当前页的同时下一页已经在传输,
+    同一时刻最多只有一个预取中的请求. 请求出错时在迭代到对应页时抛出原始异常.
+
+    :param fetch_page(function): 根据分页标记请求一页, fetch_page(token) -> page.
+    :param get_next_token(function): 从一页中取出下一页的分页标记, 没有下一页时返回None.
+    :param get_items(function): 从一页中取出条目列表.
+    :param start_token: 第一页的分页标记.
+    :param prefetch(bool): 是否在后台线程预取下一页.
+    """
+
+    def __init__(self, fetch_page, get_next_token, get_items, start_token=None, prefetch=True):
+        self._fetch_page = fetch_page
+        self._get_next_token = get_next_token
+        self._get_items = get_items
+        self._start_token = start_token
+        self._prefetch = prefetch
+
+    def _fetch(self, token):
+        fetcher = _PageFetcher(self._fetch_page, token)
+        if self._prefetch:
+            fetcher.start()
+        else:
+            fetcher.run()
+        return fetcher
+
+    def pages(self):
+        """逐页产出完整的响应"""
+        fetcher = self._fetch(self._start_token)
+        while fetcher is not None:
+            page = fetcher.result()
+            token = self._get_next_token(page)
+            fetcher = self._fetch(token) if token is not None else None
+            yield page
+
+    def __iter__(self):
+        for page in self.pages():
+            for item in self._get_items(page):
+                yield item
+
+
+def get_list_items(page, key, *keys):
+    """取出page[key][keys...]下的条目, 单个条目时转换为list"""
+    value = page.get(key) if page else None
+    for k in keys:
+        value = value.get(k) if value else None
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        return [value]
+    return value
@@ -0,0 +1,410 @@
+# -*- coding=utf-8
+"""并发列举存储桶中的文件
+
+把key空间切分为互不重叠的区间(lo, hi], 每个区间用一条独立的Marker链列举, 多个区间在线程中并发执行.
+初始的切分点来自Delimiter='/'列举得到的CommonPrefixes; 列举过程中如果有空闲线程,
+正在列举的区间会根据刚列出的一页key采样出新的切分点, 把剩余部分交给空闲线程, 从而在没有目录结构的桶中也能并发.
+"""
+
+import sys
+import time
+import logging
+import threading
+from collections import deque
+from six import reraise, unichr, binary_type
+
+logger = logging.getLogger(__name__)
+
+# 区间上界未知时切分点使用的字符上界, 依次尝试
+_CHAR_TIERS = (0x7f, 0xffff, 0x10ffff)
+
+
+def _split_char(low, high, is_bytes):
+    """返回low和high之间的一个字符, 不存在时返回None"""
+    if high - low <= 1:
+        return None
+    mid = (low + high) // 2
+    if is_bytes:
+        return chr(mid)
+    if 0xd800 <= mid <= 0xdfff:  # 跳过代理区, 这些字符无法编码为utf-8
+        mid = 0xe000
+        if mid >= high:
+            return None
+    return unichr(mid)
+
+
+def _split_tail(lo, start, is_bytes):
+    """在lo[:start]为前缀且大于lo的范围内取一个切分点"""
+    for i in range(start, len(lo) + 1):
+        low = ord(lo[i]) if i < len(lo) else -1
+        tiers = (0xff,) if is_bytes else _CHAR_TIERS
+        for high in tiers:
+            if low < high:
+                c = _split_char(low, high, is_bytes)
+                if c is not None:
+                    return lo[:i] + c
+                break
+    return None
+
+
+def split_key_range(lo, hi, prefix=''):
+    """在区间(lo, hi]中取一个切分点s, 满足lo < s < hi, 且s以prefix开头
+
+    :param lo(string): 区间下界(不包含).
+    :param hi(string): 区间上界(包含), None表示不限.
+    :param prefix(string): 列举的前缀.
+    :return(string): 切分点, 区间无法切分时返回None.
+    """
+    is_bytes = isinstance(lo, binary_type)
+    if not lo.startswith(prefix):
+        lo = prefix
+    if hi is None:
+        return _split_tail(lo, len(prefix), is_bytes)
+    i = 0
+    while i < len(lo) and i < len(hi) and lo[i] == hi[i]:
+        i += 1
+    if i == len(hi):  # hi是lo的前缀, 说明hi <= lo
+        return None
+    low = ord(lo[i]) if i < len(lo) else -1
+    high = ord(hi[i])
+    if not is_bytes:  # 优先在较小的字符范围内切分, 大部分key由ascii字符组成
+        high = min([tier for tier in _CHAR_TIERS if tier > low] + [high])
+    c = _split_char(low, high, is_bytes)
+    if c is not None:
+        return hi[:i] + c
+    if i == len(lo):
+        return None
+    # lo[i]和hi[i]相邻, 在lo[:i+1]开头的范围内继续切分
+    return _split_tail(lo, i + 1, is_bytes)
+
+
+def sample_split_points(first_key, last_key, hi, alphabet, count, prefix=''):
+    """根据一页key的分布采样切分点
+
+    一页key在first_key和last_key的公共前缀之后的位置发生变化, 说明更高一位每变化一个字符大约对应一页数据,
+    因此依次把last_key在该位置及更高位置上的字符替换为alphabet中更大的字符作为切分点.
+
+    :param first_key(string): 当前页第一个key.
+    :param last_key(string): 当前页最后一个key.
+    :param hi(string): 区间上界(包含), None表示不限.
+    :param alphabet(list): 已经出现过的字符, 已排序.
+    :param count(int): 最多返回的切分点数量.
+    :param prefix(string): 列举的前缀.
+    :return(list): 递增的切分点, 都大于last_key且小于hi.
+    """
+    pos = 0
+    while pos < len(first_key) and pos < len(last_key) and first_key[pos] == last_key[pos]:
+        pos += 1
+    points = []
+    for i in range(min(pos, len(last_key)) - 1, len(prefix) - 1, -1):
+        base = last_key[:i]
+        for c in alphabet:
+            if c <= last_key[i]:
+                continue
+            point = base + c
+            if hi is not None and point >= hi:
+                break
+            points.append(point)
+            if len(points) >= count:
+                return points
+    return points
+
+
+class _Shard(object):
+    """一个待列举的key区间(lo, hi]"""
+    __slots__ = ('lo', 'hi', 'items', 'started', 'done', 'next')
+
+    def __init__(self, lo, hi):
+        self.lo = lo
+        self.hi = hi
+        self.items = deque()
+        self.started = False
+        self.done = False
+        self.next = None
+
+
+class ParallelLister(object):
+    """并发列举的结果, 迭代产出与list_objects中Contents相同格式的dict
+
+    :param client(CosS3Client): 用于发送list_objects请求的client.
+    :param Bucket(string): 存储桶名称.
+    :param Prefix(string): 设置匹配文件的前缀.
+    :param Marker(string): 从marker之后开始列出条目.
+    :param MaxThread(int): 并发列举的线程数.
+    :param Ordered(bool): 为True时按key的字典序产出, 为False时按完成顺序产出, 占用的内存更少.
+    :param MaxKeys(int): 单次请求返回最大的数量,最大为1000.
+    :param MaxBufferedKeys(int): 已列举但尚未被消费的最大条目数. 有序模式下正在被消费的区间单独计算,
+        其他区间的缓存超过该值时暂停列举, 因此最多缓存约两倍的条目.
+    :param kwargs(dict): 设置请求headers.
+    """
+
+    def __init__(self, client, Bucket, Prefix='', Marker='', MaxThread=10, Ordered=True, MaxKeys=1000,
+                 MaxBufferedKeys=100000, **kwargs):
+        self._client = client
+        self._bucket = Bucket
+        self._prefix = Prefix
+        self._marker = Marker
+        self._max_thread = max(1, MaxThread)
+        self._ordered = Ordered
+        self._max_keys = MaxKeys
+        self._max_buffered = MaxBufferedKeys
+        self._kwargs = kwargs
+
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._unordered_items = deque()
+        self._buffered = 0  # 有序模式下所有区间中尚未被消费的条目数
+        self._active = 0
+        self._stopped = False
+        self._started = False
+        self._exc_info = None
+        self._head = None
+
+        self._start_time = None
+        self._end_time = None
+        self._keys = 0
+        self._pages = 0
+        self._pages_in_flight = 0
+        self._shards = 0
+        self._alphabet = set()
+
+    def get_metrics(self):
+        """获取列举的统计信息
+
+        :return(dict): keys为已列举的条目数, pages为已完成的请求数, pages_in_flight为正在进行的请求数,
+            shards为切分出的区间数, elapsed为耗时(秒), keys_per_second为列举速度.
+        """
+        with self._cond:
+            if self._start_time is None:
+                elapsed = 0.0
+            else:
+                elapsed = (self._end_time or time.time()) - self._start_time
+            return {
+                'keys': self._keys,
+                'pages': self._pages,
+                'pages_in_flight': self._pages_in_flight,
+                'shards': self._shards,
+                'elapsed': elapsed,
+                'keys_per_second': self._keys / elapsed if elapsed > 0 else 0.0,
+            }
+
+    def close(self):
+        """停止列举, 已经发出的请求完成后线程退出"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def __iter__(self):
+        with self._cond:
+            if self._started:
+                raise ValueError('ParallelLister can only be iterated once')
+            self._started = True
+        self._start()
+        try:
+            if self._ordered:
+                for item in self._iter_ordered():
+                    yield item
+            else:
+                for item in self._iter_unordered():
+                    yield item
+        finally:
+            self.close()
+
+    def _list_page(self, marker, delimiter=''):
+        with self._cond:
+            self._pages_in_flight += 1
+        try:
+            return self._client.list_objects(Bucket=self._bucket, Prefix=self._prefix, Delimiter=delimiter, Marker=marker,
+                                             MaxKeys=self._max_keys, **self._kwargs)
+        finally:
+            with self._cond:
+                self._pages_in_flight -= 1
+                self._pages += 1
+
+    def _discover(self):
+        """通过Delimiter='/'列举得到的CommonPrefixes生成初始区间"""
+        page = self._list_page(self._marker, delimiter='/')
+        prefixes = [cp['Prefix'] for cp in page.get('CommonPrefixes', []) if cp['Prefix'] > self._marker]
+        prefixes.sort()
+        max_shards = self._max_thread * 4
+        if len(prefixes) > max_shards:
+            step = float(len(prefixes)) / max_shards
+            prefixes = [prefixes[int(i * step)] for i in range(max_shards)]
+        bounds = [self._marker] + prefixes + [None]
+        shards = [_Shard(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+        for i in range(len(shards) - 1):
+            shards[i].next = shards[i + 1]
+        logger.debug("parallel lister discovered {num} shards".format(num=len(shards)))
+        return shards
+
+    def _start(self):
+        self._start_time = time.time()
+        shards = self._discover()
+        self._head = shards[0]
+        with self._cond:
+            self._shards = len(shards)
+            self._pending.extend(shards)
+        for i in range(self._max_thread):
+            t = threading.Thread(target=self._worker)
+            t.daemon = True
+            t.start()
+
+    def _finished(self):
+        return not self._pending and self._active == 0
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped and self._active > 0:
+                    self._cond.wait()
+                if self._stopped or not self._pending:
+                    return
+                if self._ordered:
+                    # 优先列举最靠前的区间, 保证正在被消费的区间不会因为线程都在等待而无人列举
+                    shard = min(self._pending, key=lambda x: x.lo)
+                    self._pending.remove(shard)
+                else:
+                    shard = self._pending.popleft()
+                shard.started = True
+                self._active += 1
+            try:
+                self._list_shard(shard)
+            except Exception:
+                logger.exception("parallel list objects failed")
+                with self._cond:
+                    if self._exc_info is None:
+                        self._exc_info = sys.exc_info()
+                    self._stopped = True
+            finally:
+                with self._cond:
+                    shard.done = True
+                    self._active -= 1
+                    if self._finished():
+                        self._end_time = time.time()
+                    self._cond.notify_all()
+
+    def _emit(self, shard, items):
+        with self._cond:
+            self._keys += len(items)
+            if self._ordered:
+                shard.items.extend(items)
+                self._buffered += len(items)
+            else:
+                while len(self._unordered_items) >= self._max_buffered and not self._stopped:
+                    self._cond.wait()
+                self._unordered_items.extend(items)
+            self._cond.notify_all()
+
+    def _list_shard(self, shard):
+        marker = shard.lo
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+            page = self._list_page(marker)
+            contents = page.get('Contents', [])
+            finished = page.get('IsTruncated') != 'true'
+            items = []
+            for item in contents:
+                if shard.hi is not None and item['Key'] > shard.hi:
+                    finished = True
+                    break
+                items.append(item)
+            if items:
+                self._emit(shard, items)
+            if finished or not contents:
+                return
+            marker = page.get('NextMarker') or contents[-1]['Key']
+            if shard.hi is not None and marker >= shard.hi:
+                return
+            if self._ordered and not self._wait_for_buffer(shard, marker):
+                return
+            self._maybe_split(shard, contents, marker)
+
+    def _wait_for_buffer(self, shard, marker):
+        """有序模式下缓存的条目过多时等待消费, 返回False表示剩余部分已经交还给其他线程"""
+        with self._cond:
+            while not self._stopped:
+                if shard is self._head:
+                    # 正在被消费的区间只受自身缓存的限制, 其他区间的缓存不会阻塞消费
+                    if len(shard.items) < self._max_buffered:
+                        return True
+                elif self._buffered < self._max_buffered:
+                    return True
+                elif self._head is not None and not self._head.started:
+                    # 正在被消费的区间还在排队, 把剩余部分(marker, hi]放回队列, 让出线程
+                    rest = _Shard(marker, shard.hi)
+                    rest.next = shard.next
+                    shard.next = rest
+                    shard.hi = marker
+                    self._pending.append(rest)
+                    self._shards += 1
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait()
+            return True
+
+    def _maybe_split(self, shard, contents, marker):
+        """有空闲线程时把当前区间的剩余部分切分给空闲线程"""
+        chars = set()
+        for item in contents:
+            chars.update(item['Key'])
+        first_key = contents[0]['Key']
+        with self._cond:
+            self._alphabet.update(chars)
+            idle = self._max_thread - self._active - len(self._pending)
+            if idle <= 0 or self._stopped:
+                return
+            points = sample_split_points(first_key, marker, shard.hi, sorted(self._alphabet), idle, self._prefix)
+            if not points:
+                point = split_key_range(marker, shard.hi, self._prefix)
+                if point is None:
+                    return
+                points = [point]
+            # 当前区间保留(marker, points[0]], 其余部分依次交给新的区间
+            bounds = points + [shard.hi]
+            last = shard
+            for i in range(len(points)):
+                new_shard = _Shard(bounds[i], bounds[i + 1])
+                new_shard.next = last.next
+                last.next = new_shard
+                last = new_shard
+                self._pending.append(new_shard)
+            shard.hi = points[0]
+            self._shards += len(points)
+            self._cond.notify_all()
+
+    def _raise_if_failed(self):
+        if self._exc_info is not None:
+            reraise(*self._exc_info)
+
+    def _iter_ordered(self):
+        shard = self._head
+        while shard is not None:
+            with self._cond:
+                while not shard.items and not shard.done and self._exc_info is None:
+                    self._cond.wait()
+                self._raise_if_failed()
+                items = list(shard.items)
+                shard.items.clear()
+                self._buffered -= len(items)
+                if not items and shard.done:
+                    shard = shard.next
+                    self._head = shard
+                self._cond.notify_all()
+            for item in items:
+                yield item
+
+    def _iter_unordered(self):
+        while True:
+            with self._cond:
+                while not self._unordered_items and not self._finished() and self._exc_info is None:
+                    self._cond.wait()
+                self._raise_if_failed()
+                if not self._unordered_items and self._finished():
+                    return
+                items = list(self._unordered_items)
+                self._unordered_items.clear()
+                self._cond.notify_all()
+            for item in items:
+                yield item
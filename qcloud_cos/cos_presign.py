@@ -0,0 +1,211 @@
+# -*- coding=utf-8
+"""批量生成预签名url(CosS3Client.generate_presigned_urls)和预签名url的缓存(CosConfig.PresignedUrlCacheSize)"""
+
+import hmac
+import time
+import hashlib
+import logging
+import threading
+import multiprocessing
+from collections import deque, OrderedDict
+from six.moves.urllib.parse import quote, urlparse, urlencode
+from .cos_comm import to_unicode, to_bytes
+from .cos_auth import filter_headers, get_sign_key, _quote, _quote_name
+from .cos_exception import CosClientError
+
+logger = logging.getLogger(__name__)
+
+PRESIGN_CHUNK_SIZE = 1000  # 每批共用一个签名时间段和签名密钥的key数
+
+_worker_generator = None  # 进程池中每个子进程使用的生成器
+
+
+def _init_worker(generator):
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _sign_chunk(keys):
+    return _worker_generator.sign_keys(keys)
+
+
+def _iter_chunks(keys, chunk_size):
+    chunk = list()
+    for key in keys:
+        chunk.append(key)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = list()
+    if chunk:
+        yield chunk
+
+
+class PresignedUrlGenerator(object):
+    """为同一个存储桶中的大量key生成预签名url, 结果与get_presigned_url一致
+
+    Method, Params, Headers和host对所有key相同, 签名中与key无关的部分(头部和参数的encode, url中除签名以外的参数)
+    只在创建时计算一次; 每批key共用一个签名时间段和签名密钥, 每个key只需要一次SHA1和一次HMAC, 不需要构造Request.
+    只保存字符串, 可以传给进程池中的子进程.
+
+    :param conf(CosConfig): 配置.
+    :param bucket(string): 存储桶名称.
+    :param method(string): HTTP请求的方法.
+    :param expired(int): 签名过期时间, 单位为秒.
+    :param params(dict): 签入签名的参数.
+    :param headers(dict): 签入签名的头部.
+    :param sign_host(bool): 是否将host算入签名, 为None时使用配置.
+    :param use_ci_endpoint(bool): 是否使用数据万象的域名.
+    """
+
+    def __init__(self, conf, bucket, method, expired=300, params=None, headers=None, sign_host=None,
+                 use_ci_endpoint=False):
+        params = params or dict()
+        headers = headers or dict()
+        self._secret_id = conf._secret_id if conf._secret_id else \
+            (conf._credential_inst.secret_id if conf._credential_inst else None)
+        self._secret_key = conf._secret_key if conf._secret_key else \
+            (conf._credential_inst.secret_key if conf._credential_inst else None)
+        self._method = method.lower()
+        self._expired = expired
+
+        endpoint = conf._endpoint_ci if use_ci_endpoint else None
+        sample_url = conf.uri(bucket=bucket, path='k', endpoint=endpoint)
+        self._base_url = sample_url[:-1]  # scheme://host/
+
+        # 与CosS3Auth相同的规则计算签名的头部和参数
+        if sign_host is None:
+            sign_host = conf._sign_host
+        sign_headers = filter_headers(headers)
+        if sign_host and not any(k.lower() == 'host' for k in sign_headers):
+            hostname = urlparse(sample_url).hostname
+            if hostname is not None:
+                sign_headers['host'] = hostname
+        sign_headers = sorted(dict([(_quote_name(k), _quote(v)) for k, v in sign_headers.items()]).items())
+        sign_params = list()
+        if conf._sign_params:
+            sign_params = sorted(dict([(_quote_name(k), _quote(v)) for k, v in params.items()]).items())
+        self._headers_str = '&'.join(["%s=%s" % item for item in sign_headers])
+        self._params_str = '&'.join(["%s=%s" % item for item in sign_params])
+        self._header_list = ';'.join([k for k, v in sign_headers])
+        self._param_list = ';'.join([k for k, v in sign_params])
+        self._query_suffix = '&' + urlencode(params) if params else ''
+
+    def sign_keys(self, keys):
+        """为一批key生成预签名url, 这批key共用一个签名时间段
+
+        :param keys(list): COS路径.
+        :return(list): 与keys顺序一致的预签名url.
+        """
+        start_sign_time = int(time.time())
+        sign_time = "{bg_time};{ed_time}".format(bg_time=start_sign_time - 60, ed_time=start_sign_time + self._expired)
+        sign_key = to_bytes(get_sign_key(self._secret_key, sign_time))
+        query = urlencode([
+            ('q-sign-algorithm', 'sha1'),
+            ('q-ak', self._secret_id),
+            ('q-sign-time', sign_time),
+            ('q-key-time', sign_time),
+            ('q-header-list', self._header_list),
+            ('q-url-param-list', self._param_list),
+        ]) + '&q-signature='
+        sign_prefix = "sha1\n{time}\n".format(time=sign_time)
+        urls = list()
+        for key in keys:
+            if not key:
+                raise CosClientError("Key is required not empty")
+            key = to_unicode(key)
+            path = key if key[0] == u'/' else u'/' + key
+            format_str = u"{method}\n{path}\n{params}\n{headers}\n".format(
+                method=self._method, path=path, params=self._params_str, headers=self._headers_str)
+            str_to_sign = sign_prefix + hashlib.sha1(to_bytes(format_str)).hexdigest() + "\n"
+            sign = hmac.new(sign_key, to_bytes(str_to_sign), hashlib.sha1).hexdigest()
+            url_path = quote(to_bytes(path[1:]), '/-_.~').replace('./', '.%2F')
+            urls.append(self._base_url + url_path + '?' + query + sign + self._query_suffix)
+        return urls
+
+    def iter_urls(self, keys, processes=0, chunk_size=PRESIGN_CHUNK_SIZE):
+        """按keys的顺序产出预签名url
+
+        :param keys(iterable): COS路径.
+        :param processes(int): 大于1时在这么多个子进程中计算签名, 否则在当前线程中计算.
+        :param chunk_size(int): 每批的key数.
+        :return(generator): 预签名url.
+        """
+        chunks = _iter_chunks(keys, chunk_size)
+        if processes <= 1:
+            for chunk in chunks:
+                for url in self.sign_keys(chunk):
+                    yield url
+            return
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(self,))
+        try:
+            # 边读取keys边提交, 排队的批数有上限, keys很多时不会全部读入内存
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(_sign_chunk, (chunk,)))
+                if len(pending) >= processes * 2:
+                    for url in pending.popleft().get():
+                        yield url
+            while pending:
+                for url in pending.popleft().get():
+                    yield url
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+class PresignedUrlCache(object):
+    """预签名url的LRU缓存, 可以在多个线程中同时使用
+
+    缓存的url在剩余有效时间不少于min_validity秒时直接返回, 否则重新签名; 超过max_size个时淘汰最久未使用的url.
+
+    :param max_size(int): 最多缓存的url数.
+    :param min_validity(int): 返回缓存的url时要求的最短剩余有效时间, 单位为秒.
+    """
+
+    def __init__(self, max_size, min_validity=60):
+        self._max_size = max_size
+        self._min_validity = min_validity
+        self._lock = threading.Lock()
+        self._urls = OrderedDict()  # 缓存key -> (url, 过期时间), 最近使用的在最后
+        self._hits = 0
+        self._misses = 0
+
+    def get_or_sign(self, cache_key, expired, sign):
+        """返回缓存的url, 不存在或剩余有效时间不足时调用sign()生成并缓存
+
+        :param cache_key(tuple): 存储桶, key, 方法以及签入签名的参数和头部.
+        :param expired(int): 签名过期时间, 不超过min_validity时不缓存.
+        :param sign(function): 生成url.
+        :return(string): 预签名url.
+        """
+        if expired <= self._min_validity:
+            return sign()
+        now = time.time()
+        with self._lock:
+            entry = self._urls.pop(cache_key, None)
+            if entry is not None and entry[1] - now >= self._min_validity:
+                self._urls[cache_key] = entry
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+        # 签名在锁外进行, 同一个key并发未命中时各自签名, 最后写入的生效
+        expire_time = int(now) + expired
+        url = sign()
+        with self._lock:
+            self._urls.pop(cache_key, None)
+            self._urls[cache_key] = (url, expire_time)
+            while len(self._urls) > self._max_size:
+                self._urls.popitem(last=False)
+        return url
+
+    def clear(self):
+        with self._lock:
+            self._urls.clear()
+
+    def get_stats(self):
+        """获取缓存的统计信息
+
+        :return(dict): Size为缓存的url数, Hits为命中次数, Misses为未命中次数.
+        """
+        with self._lock:
+            return {'Size': len(self._urls), 'Hits': self._hits, 'Misses': self._misses}
@@ -0,0 +1,491 @@
+# -*- coding=utf-8
+"""本地目录与COS, COS与COS之间的同步, 由CosS3Client.sync创建"""
+
+import os
+import json
+import threading
+import logging
+import hashlib
+from six import string_types
+from .cos_comm import crc64_ecma, gen_copy_source_range, DEFAULT_CHUNK_SIZE
+from .cos_exception import CosClientError
+from .cos_directory import DirectoryUploader, DirectoryDownloader, TransferStats, parse_last_modified, _PartedFile
+from .cos_bulk_delete import BulkDeleter, DELETE_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+_NEED_CHECKSUM = 'checksum'  # _compare的返回值, 表示需要在任务组中比较MD5或CRC64
+
+
+def iter_local_entries(local_dir):
+    """按key的字典序产出本地目录下的文件, 与COS列举的顺序一致
+
+    每层目录单独排序, 子目录按"名称/"参与排序, 不需要一次读取整个目录树. 不跟随指向目录的符号链接.
+
+    :param local_dir(string): 本地目录.
+    :return(generator): 产出{'Key': 相对路径(以/分隔), 'Size', 'MTime', 'Path': 本地路径}.
+    """
+    def walk(path, rel_prefix):
+        try:
+            names = os.listdir(path)
+        except OSError as e:
+            logger.warning('list local dir {0} failed: {1}'.format(path, e))
+            return
+        entries = list()
+        for name in names:
+            full_path = os.path.join(path, name)
+            if os.path.isdir(full_path) and not os.path.islink(full_path):
+                entries.append((rel_prefix + name + '/', full_path, True))
+            elif os.path.isfile(full_path):
+                entries.append((rel_prefix + name, full_path, False))
+        entries.sort()
+        for rel_key, full_path, is_dir in entries:
+            if is_dir:
+                for entry in walk(full_path, rel_key):
+                    yield entry
+                continue
+            try:
+                stat = os.stat(full_path)
+            except OSError:  # 遍历过程中被删除
+                continue
+            yield {'Key': rel_key, 'Size': stat.st_size, 'MTime': stat.st_mtime, 'Path': full_path}
+
+    return walk(local_dir, '')
+
+
+def iter_cos_entries(client, bucket, prefix):
+    """按key的字典序产出COS上prefix下的对象, 忽略以/结尾的目录对象
+
+    :return(generator): 产出{'Key': 去掉prefix的key, 'Size', 'MTime', 'ETag', 'StorageClass', 'FullKey': 完整的key}.
+    """
+    for obj in client.iter_objects(Bucket=bucket, Prefix=prefix):
+        key = obj['Key']
+        if key.endswith('/'):
+            continue
+        yield {'Key': key[len(prefix):], 'Size': int(obj['Size']), 'MTime': parse_last_modified(obj['LastModified']),
+               'ETag': obj['ETag'], 'StorageClass': obj.get('StorageClass', 'STANDARD'), 'FullKey': key}
+
+
+def merge_entries(src_entries, dst_entries):
+    """按key合并两个有序的列表, 产出(源条目, 目标条目), 只在一边存在时另一边为None"""
+    src = next(src_entries, None)
+    dst = next(dst_entries, None)
+    while src is not None or dst is not None:
+        if dst is None or (src is not None and src['Key'] < dst['Key']):
+            yield src, None
+            src = next(src_entries, None)
+        elif src is None or dst['Key'] < src['Key']:
+            yield None, dst
+            dst = next(dst_entries, None)
+        else:
+            yield src, dst
+            src = next(src_entries, None)
+            dst = next(dst_entries, None)
+
+
+def _is_md5_etag(etag):
+    """简单上传的对象ETag为内容的MD5, 分块上传的对象ETag带有-"""
+    etag = etag.strip('"')
+    return len(etag) == 32 and '-' not in etag
+
+
+def _file_digest(path, algorithm):
+    md5 = hashlib.md5()
+    crc64 = 0
+    with open(path, 'rb') as f:
+        chunk = f.read(DEFAULT_CHUNK_SIZE)
+        while chunk:
+            if algorithm == 'md5':
+                md5.update(chunk)
+            else:
+                crc64 = crc64_ecma(chunk, crc64)
+            chunk = f.read(DEFAULT_CHUNK_SIZE)
+    return md5.hexdigest() if algorithm == 'md5' else str(crc64)
+
+
+class _SyncLocation(object):
+    """同步的一端, 本地目录或COS上的前缀"""
+
+    def __init__(self, client, location):
+        if isinstance(location, string_types):
+            self.is_local = True
+            self.local_dir = os.path.abspath(location)
+            self.client = None
+        elif isinstance(location, dict) and 'Bucket' in location:
+            self.is_local = False
+            self.client = location.get('Client', client)
+            self.bucket = location['Bucket']
+            self.prefix = location.get('Prefix', '')
+        else:
+            raise CosClientError("sync location must be a local dir or a dict like {'Bucket': bucket, 'Prefix': prefix}")
+
+    def entries(self):
+        if self.is_local:
+            return iter_local_entries(self.local_dir)
+        return iter_cos_entries(self.client, self.bucket, self.prefix)
+
+    def get_name(self, rel_key):
+        """条目在这一端的完整名称, 本地为路径, COS为key"""
+        if self.is_local:
+            return os.path.join(self.local_dir, *rel_key.split('/'))
+        return self.prefix + rel_key
+
+    def get_crc64(self, entry):
+        if self.is_local:
+            return _file_digest(entry['Path'], 'crc64')
+        response = self.client.head_object(Bucket=self.bucket, Key=entry['FullKey'])
+        for k, v in response.items():
+            if k.lower() == 'x-cos-hash-crc64ecma':
+                return v
+        return None
+
+    def describe(self):
+        if self.is_local:
+            return self.local_dir
+        return 'cos://{0}/{1}'.format(self.bucket, self.prefix)
+
+
+class _ActionLog(object):
+    """以JSON Lines格式记录每个同步操作, 可以在多个线程中同时写入"""
+
+    def __init__(self, target):
+        self._lock = threading.Lock()
+        self._own = isinstance(target, string_types)
+        self._fp = open(target, 'w') if self._own else target
+
+    def write(self, entry):
+        if self._fp is None:
+            return
+        line = json.dumps(entry, sort_keys=True) + '\n'
+        with self._lock:
+            self._fp.write(line)
+            self._fp.flush()
+
+    def close(self):
+        if self._own:
+            self._fp.close()
+
+
+class _SyncStats(TransferStats):
+    """上传和下载的统计, 每个文件结束时写入操作记录"""
+
+    def __init__(self, action, engine):
+        super(_SyncStats, self).__init__()
+        self._action = action
+        self._engine = engine
+
+    def add_file(self, key, local_path, size):
+        super(_SyncStats, self).add_file(key, local_path, size)
+        self._engine._finish_action(self._action, key, size)
+
+    def add_failed(self, key, local_path, error):
+        super(_SyncStats, self).add_failed(key, local_path, error)
+        self._engine._finish_action(self._action, key, None, error)
+
+
+class SyncEngine(object):
+    """把源端同步到目标端
+
+    源端和目标端都按key有序列举(本地目录按相同的顺序遍历), 合并两个列表得到差异, 不需要逐个对象head_object:
+    只在源端存在或者大小不同的文件需要传输; 大小相同时, 两端都有MD5形式的ETag时比较ETag,
+    否则开启checksum时比较MD5或CRC64(分块上传的对象需要head获取CRC64), 未开启时比较修改时间;
+    只在目标端存在的文件在开启delete时删除. 所有操作在同一个任务组中执行, 单个文件失败不影响其他文件,
+    需要计算MD5或head的比较也作为任务执行, 不阻塞列表的合并; 大文件的分块传输和分块拷贝拆成单独的任务.
+
+    本地到COS为上传, COS到本地为下载, COS到COS为服务端拷贝. 每个操作以JSON Lines格式写入action_log,
+    包括Action(upload, download, copy, delete), Key, Source, Destination, Size, Reason(missing, size, etag, md5,
+    crc64, mtime, extra)和Status(planned, done, failed), dry_run时只记录计划的操作, 不执行.
+
+    :param client(CosS3Client): 用于发送请求的client.
+    :param source(string|dict): 源端, 本地目录或{'Bucket': 存储桶, 'Prefix': 前缀, 'Client': 其他地域或账号的client(可选)}.
+    :param destination(string|dict): 目标端, 格式与source相同.
+    :param delete(bool): 是否删除只在目标端存在的文件.
+    :param dry_run(bool): 只计算差异并记录计划的操作, 不执行.
+    :param checksum(bool): 大小相同但无法比较ETag时, 是否比较内容的MD5或CRC64代替修改时间.
+    :param part_size(int): 分块大小, 单位为MB.
+    :param max_thread(int): 同时执行的操作数.
+    :param action_log(string|file): 操作记录的文件路径或可写的文件对象.
+    :param kwargs(dict): 设置上传, 下载或拷贝的headers.
+    """
+
+    def __init__(self, client, source, destination, delete=False, dry_run=False, checksum=False, part_size=10,
+                 max_thread=10, action_log=None, **kwargs):
+        self._client = client
+        self._src = _SyncLocation(client, source)
+        self._dst = _SyncLocation(client, destination)
+        if self._src.is_local and self._dst.is_local:
+            raise CosClientError('at least one of source and destination must be a COS location')
+        self._delete = delete
+        self._dry_run = dry_run
+        self._checksum = checksum
+        self._part_size = part_size
+        self._max_thread = max_thread
+        self._headers = kwargs
+        self._log = _ActionLog(action_log) if action_log is not None else None
+        self._lock = threading.Lock()
+        self._pending = dict()  # 执行中的操作: (action, 名称) -> 记录
+        self._planned = dict()
+        self._unchanged = 0
+        self._done = 0
+        self._bytes = 0
+        self._failed = list()
+        self._stats = TransferStats()
+        if self._src.is_local:
+            self._action = 'upload'
+            self._transfer = DirectoryUploader(self._dst.client, self._dst.bucket, self._src.local_dir, self._dst.prefix,
+                                               part_size, max_thread, stats=_SyncStats('upload', self), **kwargs)
+        elif self._dst.is_local:
+            self._action = 'download'
+            self._transfer = DirectoryDownloader(self._src.client, self._src.bucket, self._src.prefix, self._dst.local_dir,
+                                                 part_size, max_thread, stats=_SyncStats('download', self), **kwargs)
+        else:
+            self._action = 'copy'
+            self._transfer = None
+        if not self._dst.is_local:
+            self._deleter = BulkDeleter(self._dst.client, self._dst.bucket, max_thread)
+
+    def start(self):
+        """执行同步
+
+        :return(dict): Planned为各类操作的计划数, Unchanged为无需同步的文件数, Done为成功的操作数,
+            Failed为失败的操作, Bytes为传输的字节数, Elapsed为耗时(秒), DryRun为是否只计算差异.
+        """
+        # dry_run时任务组只用于比较checksum
+        pool = self._client._new_task_group(self._max_thread, max_pending=self._max_thread * 2, fail_fast=False)
+        delete_batch = list()
+        try:
+            for src, dst in merge_entries(self._src.entries(), self._dst.entries()):
+                if src is None:
+                    if self._delete:
+                        self._plan(pool, 'delete', dst, None, 'extra', delete_batch)
+                    continue
+                reason = 'missing' if dst is None else self._compare(src, dst)
+                if reason is None:
+                    self._add_unchanged()
+                elif reason == _NEED_CHECKSUM:
+                    pool.submit(self._compare_checksum_and_plan, pool, src, dst)
+                else:
+                    self._plan(pool, self._action, src, dst, reason, delete_batch)
+            if delete_batch:
+                self._submit_delete_batch(pool, delete_batch)
+            pool.wait(raise_error=False)
+        finally:
+            if self._log is not None:
+                self._log.close()
+        result = self._stats.get_result()
+        return {
+            'Planned': dict(self._planned),
+            'Unchanged': self._unchanged,
+            'Done': self._done,
+            'Failed': list(self._failed),
+            'Bytes': self._bytes,
+            'Elapsed': result['Elapsed'],
+            'DryRun': self._dry_run,
+        }
+
+    def _compare(self, src, dst):
+        """比较两端大小相同的文件, 一致时返回None, 否则返回需要同步的原因"""
+        if src['Size'] != dst['Size']:
+            return 'size'
+        if 'ETag' in src and 'ETag' in dst:
+            if src['ETag'] == dst['ETag']:
+                return None
+            if _is_md5_etag(src['ETag']) and _is_md5_etag(dst['ETag']):
+                return 'etag'
+        if self._checksum:
+            return _NEED_CHECKSUM
+        if self._dst.is_local:
+            # 下载时把本地文件的修改时间设置为对象的LastModified
+            return None if int(dst['MTime']) == src['MTime'] else 'mtime'
+        return None if dst['MTime'] >= int(src['MTime']) else 'mtime'
+
+    def _add_unchanged(self):
+        with self._lock:
+            self._unchanged += 1
+
+    def _compare_checksum_and_plan(self, pool, src, dst):
+        """在任务组中比较checksum, 不一致时提交同步操作"""
+        try:
+            reason = self._compare_checksum(src, dst)
+        except Exception as e:
+            logger.warning('sync compare {0} failed: {1}'.format(src['Key'], e))
+            with self._lock:
+                self._failed.append({'Action': self._action, 'Key': src['Key'], 'Error': e})
+            return
+        if reason is None:
+            self._add_unchanged()
+            return
+        # 只有上传, 下载和拷贝需要比较checksum, 不会产生删除
+        self._plan(pool, self._action, src, dst, reason, None)
+
+    def _compare_checksum(self, src, dst):
+        if self._src.is_local or self._dst.is_local:
+            local_entry, cos_entry = (src, dst) if self._src.is_local else (dst, src)
+            if _is_md5_etag(cos_entry['ETag']):
+                return None if _file_digest(local_entry['Path'], 'md5') == cos_entry['ETag'].strip('"') else 'md5'
+        src_crc64 = self._src.get_crc64(src)
+        dst_crc64 = self._dst.get_crc64(dst)
+        if src_crc64 is None or dst_crc64 is None:
+            return 'crc64'  # 无法确认一致, 重新同步
+        return None if src_crc64 == dst_crc64 else 'crc64'
+
+    def _plan(self, pool, action, src, dst, reason, delete_batch):
+        """记录一个操作, 非dry_run时提交执行"""
+        rel_key = (src or dst)['Key']
+        entry = {'Action': action, 'Key': rel_key, 'Reason': reason, 'Size': (src or dst)['Size']}
+        if action == 'delete':
+            entry['Destination'] = self._dst.get_name(rel_key)
+        else:
+            entry['Source'] = self._src.get_name(rel_key)
+            entry['Destination'] = self._dst.get_name(rel_key)
+        if action == 'download':
+            # 与DirectoryDownloader相同的检查, 包含..等超出本地目录的key不下载, 记录为失败
+            local_path = self._transfer._get_local_path(src['FullKey'])
+            if local_path is None:
+                with self._lock:
+                    self._pending[(action, src['FullKey'])] = entry
+                error = CosClientError('key {0} is outside of the local dir'.format(src['FullKey']))
+                self._finish_action(action, src['FullKey'], None, error)
+                return
+            entry['Destination'] = local_path
+        with self._lock:
+            self._planned[action] = self._planned.get(action, 0) + 1
+        if self._dry_run:
+            entry['Status'] = 'planned'
+            if self._log is not None:
+                self._log.write(entry)
+            return
+        # 与操作结束时的回调使用相同的名称: 上传和删除为目标端的名称, 下载和拷贝为源端的key
+        if action == 'download':
+            name = src['FullKey']
+        elif action == 'copy':
+            name = entry['Source']
+        else:
+            name = entry['Destination']
+        with self._lock:
+            self._pending[(action, name)] = entry
+        if action == 'upload':
+            self._transfer.submit_file(pool, entry['Destination'], src['Path'], src['Size'])
+        elif action == 'download':
+            self._transfer.submit_object(pool, src['FullKey'], entry['Destination'], src['Size'], src['MTime'], src['ETag'])
+        elif action == 'copy':
+            self._submit_copy(pool, src, entry['Destination'])
+        elif self._dst.is_local:
+            pool.submit(self._delete_local_file, entry['Destination'])
+        else:
+            delete_batch.append(entry['Destination'])
+            if len(delete_batch) >= DELETE_BATCH_SIZE:
+                self._submit_delete_batch(pool, delete_batch)
+
+    def _finish_action(self, action, name, size, error=None):
+        """操作结束时更新统计并写入操作记录"""
+        with self._lock:
+            entry = self._pending.pop((action, name), None)
+            if entry is None:
+                return
+            if error is None:
+                self._done += 1
+                if action != 'delete':
+                    self._bytes += size
+            else:
+                self._failed.append({'Action': action, 'Key': entry['Key'], 'Error': error})
+        entry['Status'] = 'done' if error is None else 'failed'
+        if error is not None:
+            entry['Error'] = str(error)
+            logger.warning('sync {0} {1} failed: {2}'.format(action, entry['Key'], error))
+        if self._log is not None:
+            self._log.write(entry)
+
+    def _submit_copy(self, pool, src, key):
+        """与CosS3Client.copy的策略相同: 同地域且不改存储类型或者小于分块拷贝阈值时copy_object, 否则分块拷贝,
+        每个分块作为单独的任务提交到任务组"""
+        client = self._dst.client
+        copy_source = {'Bucket': self._src.bucket, 'Key': src['FullKey'], 'Endpoint': self._src.client._conf._endpoint}
+        dst_storage_class = self._headers.get('StorageClass', 'standard').lower()
+        if (client._check_same_region(client._conf._endpoint, copy_source) and
+                src['StorageClass'].lower() == dst_storage_class) or src['Size'] < client._conf._copy_part_threshold_size:
+            pool.submit(self._copy_object, src, key, copy_source)
+        else:
+            self._submit_multipart_copy(pool, src, key, copy_source)
+
+    def _copy_object(self, src, key, copy_source):
+        try:
+            self._dst.client.copy_object(Bucket=self._dst.bucket, Key=key, CopySource=copy_source, **self._headers)
+        except Exception as e:
+            self._finish_action('copy', src['FullKey'], None, e)
+            return
+        self._finish_action('copy', src['FullKey'], src['Size'])
+
+    def _submit_multipart_copy(self, pool, src, key, copy_source):
+        size = src['Size']
+        part_size = self._part_size * 1024 * 1024
+        if (size + part_size - 1) // part_size > 10000:
+            part_size = (size + 9999) // 10000
+        parts_num = (size + part_size - 1) // part_size
+        try:
+            rt = self._dst.client.create_multipart_upload(Bucket=self._dst.bucket, Key=key, **self._headers)
+        except Exception as e:
+            self._finish_action('copy', src['FullKey'], None, e)
+            return
+        parted_file = _PartedFile(key, src['FullKey'], size, parts_num)
+        parted_file.upload_id = rt['UploadId']
+        parted_file.copy_source = copy_source
+        parted_file.parts = list()
+        part_headers = self._dst.client._get_copy_part_headers(self._headers)
+        for i in range(parts_num):
+            offset = i * part_size
+            copy_range = gen_copy_source_range(offset, min(offset + part_size, size) - 1)
+            pool.submit(self._copy_part, parted_file, i + 1, copy_range, part_headers)
+
+    def _copy_part(self, parted_file, part_num, copy_range, part_headers):
+        if parted_file.failed:  # 其他分块已经失败, 不再拷贝
+            return
+        try:
+            self._dst.client._upload_part_copy(self._dst.bucket, parted_file.key, part_num, parted_file.upload_id,
+                                               parted_file.copy_source, copy_range, parted_file.parts, **part_headers)
+        except Exception as e:
+            self._fail_multipart_copy(parted_file, e)
+            return
+        if parted_file.finish_part():
+            self._complete_multipart_copy(parted_file)
+
+    def _complete_multipart_copy(self, parted_file):
+        parts = sorted(parted_file.parts, key=lambda x: x['PartNumber'])
+        try:
+            self._dst.client.complete_multipart_upload(Bucket=self._dst.bucket, Key=parted_file.key,
+                                                       UploadId=parted_file.upload_id, MultipartUpload={'Part': parts})
+        except Exception as e:
+            self._fail_multipart_copy(parted_file, e)
+            return
+        # _PartedFile的local_path记录源端的key
+        self._finish_action('copy', parted_file.local_path, parted_file.size)
+
+    def _fail_multipart_copy(self, parted_file, error):
+        if not parted_file.set_failed():
+            return
+        self._finish_action('copy', parted_file.local_path, None, error)
+        try:
+            self._dst.client.abort_multipart_upload(Bucket=self._dst.bucket, Key=parted_file.key,
+                                                    UploadId=parted_file.upload_id)
+        except Exception as e:
+            logger.warning('abort multipart upload {0} failed: {1}'.format(parted_file.upload_id, e))
+
+    def _delete_local_file(self, path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            self._finish_action('delete', path, None, e)
+            return
+        self._finish_action('delete', path, 0)
+
+    def _submit_delete_batch(self, pool, delete_batch):
+        keys = list(delete_batch)
+        del delete_batch[:]
+        pool.submit(self._delete_objects, keys)
+
+    def _delete_objects(self, keys):
+        errors = dict()
+        for error in self._deleter.delete_batch([{'Key': key} for key in keys]):
+            errors[error['Key']] = CosClientError('{0}: {1}'.format(error['Code'], error['Message']))
+        for key in keys:
+            self._finish_action('delete', key, 0, errors.get(key))
@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import os
+import sys
+import threading
 from threading import Thread
 from logging import getLogger
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from six.moves.queue import Queue
+from six import reraise
 from threading import Lock
 import gc
 
@@ -85,6 +91,165 @@ class SimpleThreadPool:
         return {'success_all': succ_all, 'detail': detail}
 
 
+# 进程内共享的线程池, 所有client的并发任务都在这里执行
+_shared_executor = None
+_shared_executor_pid = 0
+_shared_executor_lock = Lock()
+_worker_local = threading.local()
+
+DEFAULT_THREAD_POOL_MAX_SIZE = 64
+
+
+def get_shared_executor(max_workers=DEFAULT_THREAD_POOL_MAX_SIZE):
+    """获取进程内共享的线程池, 第一次调用时按max_workers创建, fork后的子进程中会重新创建
+
+    :param max_workers(int): 线程池的最大线程数, 只在创建时生效.
+    :return(ThreadPoolExecutor): 共享的线程池.
+    """
+    global _shared_executor, _shared_executor_pid
+    if _shared_executor is not None and _shared_executor_pid == os.getpid():
+        return _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None or _shared_executor_pid != os.getpid():  # 加锁后double check
+            # fork出来的子进程中不存在父进程的线程, 不能复用父进程的线程池
+            _shared_executor = ThreadPoolExecutor(max_workers=max_workers)
+            _shared_executor_pid = os.getpid()
+            logger.info("generate shared thread pool success. max_workers=%d" % max_workers)
+    return _shared_executor
+
+
+def in_shared_executor():
+    """当前线程是否正在执行共享线程池中的任务"""
+    return getattr(_worker_local, 'active', False)
+
+
+class TaskGroup(object):
+    """一次调用中提交到共享线程池的一组任务
+
+    限制该组同时执行的任务数, 超出的任务在组内排队, 不会占用共享线程池的线程;
+    fail_fast为True时任意一个任务失败后取消组内尚未开始的任务; 每个任务返回一个Future.
+    如果在共享线程池的任务中再创建TaskGroup(例如在线程池中调用upload_file), 任务直接在当前线程中执行, 避免线程池死锁.
+
+    :param executor(ThreadPoolExecutor): 执行任务的线程池.
+    :param max_concurrency(int): 该组同时执行的最大任务数.
+    :param max_pending(int): 该组排队的最大任务数, 超出时submit阻塞(在共享线程池的任务中提交时不阻塞), 0表示不限制.
+    :param fail_fast(bool): 任务失败后是否取消剩余的任务.
+    :param keep_futures(bool): 是否保留所有任务的Future供wait返回. 默认不保留, 组内只记录执行中的任务数和第一个异常,
+        边列举边提交大量任务时内存不会随任务数增长.
+
+    .. code-block:: python
+
+        group = TaskGroup(get_shared_executor(), max_concurrency=5, keep_futures=True)
+        for i in range(10):
+            group.submit(func, i)
+        futures = group.wait()  # 有任务失败时抛出第一个失败任务的异常
+    """
+
+    def __init__(self, executor, max_concurrency=5, max_pending=0, fail_fast=True, keep_futures=False):
+        self._executor = executor
+        self._max_concurrency = max(1, max_concurrency)
+        self._max_pending = max_pending
+        self._fail_fast = fail_fast
+        self._inline = in_shared_executor()
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._running = 0
+        self._futures = list() if keep_futures else None
+        self._exc_info = None
+
+    def submit(self, func, *args, **kwargs):
+        """提交一个任务
+
+        :return(Future): 任务的Future, 被取消的任务的Future处于cancelled状态.
+        """
+        future = Future()
+        with self._cond:
+            if self._futures is not None:
+                self._futures.append(future)
+            # 组内的任务提交后续任务时不等待排队数下降, 否则所有线程都阻塞在submit中时无法继续执行
+            if not self._inline and not in_shared_executor():
+                while self._max_pending > 0 and len(self._pending) >= self._max_pending and self._exc_info is None:
+                    self._cond.wait()
+            if self._exc_info is not None and self._fail_fast:
+                future.cancel()
+                return future
+            if not self._inline:
+                self._pending.append((future, func, args, kwargs))
+                self._dispatch()
+                return future
+        self._run(future, func, args, kwargs)
+        return future
+
+    def set_max_concurrency(self, max_concurrency):
+        """调整该组同时执行的最大任务数, 调小时已经开始的任务会继续执行完"""
+        with self._cond:
+            self._max_concurrency = max(1, max_concurrency)
+            self._dispatch()
+
+    def _dispatch(self):
+        """在持有锁的情况下把排队的任务提交到线程池"""
+        while self._pending and self._running < self._max_concurrency:
+            task = self._pending.popleft()
+            self._running += 1
+            self._cond.notify_all()
+            self._executor.submit(self._worker, *task)
+
+    def _worker(self, future, func, args, kwargs):
+        active = in_shared_executor()
+        _worker_local.active = True
+        try:
+            self._run(future, func, args, kwargs)
+        finally:
+            _worker_local.active = active
+            with self._cond:
+                self._running -= 1
+                self._dispatch()
+                self._cond.notify_all()
+
+    def _run(self, future, func, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            logger.error(str(e))
+            with self._cond:
+                if self._exc_info is None:
+                    self._exc_info = sys.exc_info()
+                    if self._fail_fast:
+                        self._cancel_pending()
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _cancel_pending(self):
+        """在持有锁的情况下取消尚未开始的任务"""
+        while self._pending:
+            future = self._pending.popleft()[0]
+            future.cancel()
+        self._cond.notify_all()
+
+    def cancel(self):
+        """取消所有尚未开始的任务, 已经开始的任务会继续执行完"""
+        with self._cond:
+            self._cancel_pending()
+
+    def wait(self, raise_error=True):
+        """等待所有任务结束
+
+        :param raise_error(bool): 有任务失败时是否抛出第一个失败任务的原始异常.
+        :return(list): 按提交顺序排列的Future, keep_futures为False时为空列表.
+        """
+        with self._cond:
+            while self._pending or self._running > 0:
+                self._cond.wait()
+            futures = list(self._futures or [])
+            exc_info = self._exc_info
+        if raise_error and exc_info is not None:
+            reraise(*exc_info)
+        return futures
+
+
 if __name__ == '__main__':
     pass
 
@@ -4,6 +4,7 @@ import json
 from qcloud_cos import CosS3Auth
 from qcloud_cos.cos_client import logger, CosS3Client
 from .cos_comm import *
+from .cos_paginator import Paginator, get_list_items
 
 
 class CosVectorsClient(CosS3Client):
@@ -556,6 +557,50 @@ class CosVectorsClient(CosS3Client):
 
         return response, data
     
+    def iter_vectors(self, Bucket, Index, MaxResults=None, NextToken=None,
+                     ReturnData=None, ReturnMetaData=None, SegmentCount=None, SegmentIndex=None, Prefetch=True, **kwargs):
+        """ 遍历向量桶的索引中的向量, 自动翻页
+            :param Bucket(string) 向量存储桶名称.
+            :param Index(string) 向量索引名称.
+            :param MaxResults(int) 单次请求最大返回结果数.
+            :param NextToken(string) 从该token开始列出.
+            :param ReturnData(bool) 是否返回向量数据.
+            :param ReturnMetaData(bool) 是否返回向量元数据.
+            :param SegmentCount(int) 分段数.
+            :param SegmentIndex(int) 分段索引, 从0开始.
+            :param Prefetch(bool) 是否在处理当前页时在后台预取下一页.
+            :param kwargs:(dict) 设置上传的headers.
+            :return(Paginator): 迭代产出每个向量, pages()逐页产出list_vectors返回的(response, data).
+
+            .. code-block:: python
+
+                endpoint = "cos-vectors.ap-beijing.myqcloud.com" # 设置访问向量桶的endpoint
+                config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Endpoint=endpoint)
+                client = CosVectorsClient(config)
+                # 遍历向量
+                for vector in client.iter_vectors(
+                        Bucket="examplevectorbucket-1250000000",
+                        Index="example-index"):
+                    print(vector["key"])
+        """
+        def fetch_page(token):
+            return self.list_vectors(Bucket=Bucket, Index=Index, MaxResults=MaxResults, NextToken=token, ReturnData=ReturnData,
+                                     ReturnMetaData=ReturnMetaData, SegmentCount=SegmentCount, SegmentIndex=SegmentIndex, **kwargs)
+
+        def get_next_token(page):
+            data = page[1]
+            if isinstance(data, dict) and data.get('nextToken'):
+                return data['nextToken']
+            return None
+
+        def get_items(page):
+            data = page[1]
+            if not isinstance(data, dict):
+                return []
+            return get_list_items(data, 'vectors')
+
+        return Paginator(fetch_page, get_next_token, get_items, start_token=NextToken, prefetch=Prefetch)
+
     def delete_vectors(self, Bucket, Index, Keys, **kwargs):
         """ 删除向量桶的索引中的向量
             :param Bucket(string) 向量存储桶名称.
@@ -409,21 +409,29 @@ class DataDecryptAdapter(StreamBody):
         self._data_cipher = data_cipher
         self._offset = offset
 
-    def read(self, length, auto_decompress=False):
-        """读取解密后的数据"""
+    def read(self, length=1024, auto_decompress=False):
+        """读取最多length字节解密后的数据, length为None或负数时读取全部剩余数据"""
+        if length is None or length < 0:
+            return self.readall(auto_decompress)
         if self._read_len >= self._content_len:
-            return ''
+            return b''
 
         if self._use_encoding and not auto_decompress:
             content = self._rt.raw.read(length)
         else:
-            try:
-                content = next(self._rt.iter_content(length))
-            except StopIteration:
-                return ''
+            content = self._read_decoded(length)
+        if not content:
+            return b''
 
         content = self._data_cipher.decrypt(content)
         if self._read_len < self._offset and self._read_len + len(content) > self._offset:
             content = content[self._offset:]
             self._read_len = self._offset
         return content
+
+    def readinto(self, b):
+        """读取解密后的数据写入b中"""
+        view = memoryview(b)
+        data = self.read(len(view))
+        view[:len(data)] = data
+        return len(data)
@@ -8,17 +8,17 @@ import threading
 import logging
 import uuid
 import hashlib
-import crcmod
 from .cos_comm import *
 from .streambody import StreamBody
-from .cos_threadpool import SimpleThreadPool
+from .cos_autotune import TransferTuner
 
 logger = logging.getLogger(__name__)
 
 
 class ResumableDownLoader(object):
     def __init__(self, cos_client, bucket, key, dest_filename, object_info, part_size=20, max_thread=5,
-                 max_part_count=100, enable_crc=False, progress_callback=None, dump_record_dir=None, key_simplify_check=True, **kwargs):
+                 max_part_count=100, enable_crc=False, progress_callback=None, dump_record_dir=None, key_simplify_check=True,
+                 auto_tune=False, **kwargs):
         self.__cos_client = cos_client
         self.__bucket = bucket
         self.__key = key
@@ -29,6 +29,7 @@ class ResumableDownLoader(object):
         self.__progress_callback = progress_callback
         self.__headers = kwargs
         self.__key_simplify_check = key_simplify_check
+        self.__auto_tune = auto_tune
 
         self.__max_part_count = max_part_count  # 取决于服务端是否对并发有限制
         self.__min_part_size = 1024 * 1024  # 1M
@@ -36,6 +37,7 @@ class ResumableDownLoader(object):
         self.__finished_parts = []
         self.__lock = threading.Lock()
         self.__record = None  # 记录当前的上下文
+        self.__record_fp = None  # 以追加方式打开的record文件, 每完成一个分块追加一行
         if not dump_record_dir:
             self.__dump_record_dir = os.path.join(os.path.expanduser('~'), '.cos_download_tmp_file')
         else:
@@ -44,6 +46,7 @@ class ResumableDownLoader(object):
         record_filename = self.__get_record_filename(bucket, key, self.__dest_file_path)
         self.__record_filepath = os.path.join(self.__dump_record_dir, record_filename)
         self.__tmp_file = None
+        self.__tmp_fd = None  # 所有分块共享的文件描述符, 仅在支持os.pwrite的平台上使用
 
         if not os.path.exists(self.__dump_record_dir):
             # 多进程并发情况下makedirs会出现冲突, 需要进行异常捕获
@@ -70,17 +73,32 @@ class ResumableDownLoader(object):
 
         parts_need_to_download = self.__get_parts_need_to_download()
         logger.debug('parts_need_to_download: {0}'.format(parts_need_to_download))
-        pool = SimpleThreadPool(self.__max_thread)
-        for part in parts_need_to_download:
-            part_range = "bytes=" + str(part.start) + "-" + str(part.start + part.length - 1)
-            headers = dict.copy(self.__headers)
-            headers["Range"] = part_range
-            pool.add_task(self.__download_part, part, headers)
-
-        pool.wait_completion()
-        result = pool.get_result()
-        if not result['success_all']:
-            raise CosClientError('some download_part fail after max_retry, please download_file again')
+        self.__record_fp = open(self.__record_filepath, 'a')
+        tuner = None
+        try:
+            if hasattr(os, 'pwrite'):
+                self.__tmp_fd = os.open(self.__tmp_file, os.O_RDWR)
+                self.__preallocate(self.__tmp_fd, int(self.__object_info['Content-Length']))
+            pool = self.__cos_client._new_task_group(self.__max_thread)
+            if self.__auto_tune:
+                tuner = TransferTuner(pool, self.__max_thread, self.__part_size)
+            for part in parts_need_to_download:
+                part_range = "bytes=" + str(part.start) + "-" + str(part.start + part.length - 1)
+                headers = dict.copy(self.__headers)
+                headers["Range"] = part_range
+                if tuner is not None:
+                    pool.submit(tuner.run, part.length, self.__download_part, part, headers)
+                else:
+                    pool.submit(self.__download_part, part, headers)
+
+            # 任意分块失败后取消剩余的分块, 抛出失败分块的异常, 已完成的分块可以通过再次调用download_file续传
+            pool.wait()
+        finally:
+            self.__record_fp.close()
+            self.__record_fp = None
+            if self.__tmp_fd is not None:
+                os.close(self.__tmp_fd)
+                self.__tmp_fd = None
 
         if os.path.exists(self.__dest_file_path):
             os.remove(self.__dest_file_path)
@@ -91,6 +109,8 @@ class ResumableDownLoader(object):
 
         self.__del_record()
         logger.debug('download success, bucket: {0}, key: {1}'.format(self.__bucket, self.__key))
+        if tuner is not None:
+            return tuner.get_result()
 
     def __get_record_filename(self, bucket, key, dest_file_path):
         dest_file_path_md5 = hashlib.md5(dest_file_path.encode("utf-8")).hexdigest()
@@ -128,19 +148,35 @@ class ResumableDownLoader(object):
         logger.debug('finished_set: {0}'.format(len(finished_set)))
         return list(all_set - finished_set)
 
+    def __preallocate(self, fd, file_size):
+        """预先分配临时文件的空间, 减少大文件并发写入产生的碎片, 已经下载的数据不受影响"""
+        if os.fstat(fd).st_size >= file_size:
+            return
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, file_size)
+                return
+            except OSError as e:
+                # 部分文件系统不支持fallocate
+                logger.debug('posix_fallocate failed, errno: {0}, use ftruncate instead'.format(e.errno))
+        os.ftruncate(fd, file_size)
+
     def __download_part(self, part, headers):
-        with open(self.__tmp_file, 'rb+') as f:
-            f.seek(part.start, 0)
-            range = None
-            traffic_limit = None
-            if 'Range' in headers:
-                range = headers['Range']
-
-            if 'TrafficLimit' in headers:
-                traffic_limit = headers['TrafficLimit']
-            logger.debug("part_id: {0}, part_range: {1}, traffic_limit:{2}".format(part.part_id, range, traffic_limit))
-            result = self.__cos_client.get_object(Bucket=self.__bucket, Key=self.__key, KeySimplifyCheck=self.__key_simplify_check, **headers)
-            result["Body"].pget_stream_to_file(f, part.start, part.length)
+        range = None
+        traffic_limit = None
+        if 'Range' in headers:
+            range = headers['Range']
+
+        if 'TrafficLimit' in headers:
+            traffic_limit = headers['TrafficLimit']
+        logger.debug("part_id: {0}, part_range: {1}, traffic_limit:{2}".format(part.part_id, range, traffic_limit))
+        result = self.__cos_client.get_object(Bucket=self.__bucket, Key=self.__key, KeySimplifyCheck=self.__key_simplify_check, **headers)
+        if self.__tmp_fd is not None:
+            # 各线程共享同一个fd, 按绝对偏移写入, 不需要每个分块重新打开文件和seek
+            part.crc64 = result["Body"].pwrite_stream_to_fd(self.__tmp_fd, part.start, part.length, enable_crc=self.__enable_crc)
+        else:
+            with open(self.__tmp_file, 'rb+') as f:
+                part.crc64 = result["Body"].pget_stream_to_file(f, part.start, part.length, enable_crc=self.__enable_crc)
 
         self.__finish_part(part)
 
@@ -150,29 +186,23 @@ class ResumableDownLoader(object):
     def __finish_part(self, part):
         logger.debug('download part finished,bucket: {0}, key: {1}, part_id: {2}'.
                      format(self.__bucket, self.__key, part.part_id))
+        entry = json.dumps({'part_id': part.part_id, 'start': part.start, 'length': part.length, 'crc64': part.crc64})
+        # 只追加一行记录, 不重写整个record文件, 每个分块的开销与已完成的分块数无关
         with self.__lock:
             self.__finished_parts.append(part)
-            self.__record['parts'].append({'part_id': part.part_id, 'start': part.start, 'length': part.length})
-            self.__dump_record(self.__record)
+            self.__record_fp.write(entry + '\n')
+            self.__record_fp.flush()
 
     def __dump_record(self, record):
-        record_filepath = self.__record_filepath
-        if os.path.exists(self.__record_filepath):
-            record_filepath += '.tmp'
-        with open(record_filepath, 'w') as f:
-            json.dump(record, f)
-            logger.debug(
-                'dump record to {0}, bucket: {1}, key: {2}'.format(record_filepath, self.__bucket, self.__key))
-        if record_filepath != self.__record_filepath:
-            os.remove(self.__record_filepath)
-            os.rename(record_filepath, self.__record_filepath)
+        """整体写入record文件, 第一行为下载的上下文及已完成的分块, 之后每完成一个分块追加一行"""
+        dump_record_journal(self.__record_filepath, record)
+        logger.debug('dump record to {0}, bucket: {1}, key: {2}'.format(self.__record_filepath, self.__bucket, self.__key))
 
     def __load_record(self):
         record = None
 
         if os.path.exists(self.__record_filepath):
-            with open(self.__record_filepath, 'r') as f:
-                record = json.load(f)
+            record = read_record_journal(self.__record_filepath)
             ret = self.__check_record(record)
             # record记录是否跟head object的一致，不一致则删除
             if not ret:
@@ -187,9 +217,11 @@ class ResumableDownLoader(object):
                     self.__del_record()
                 else:
                     self.__finished_parts = list(
-                        PartInfo(p['part_id'], p['start'], p['length']) for p in record['parts'])
+                        PartInfo(p['part_id'], p['start'], p['length'], p.get('crc64')) for p in record['parts'])
                     logger.debug('load record: finished parts nums: {0}'.format(len(self.__finished_parts)))
                     self.__record = record
+                    # 把追加的分块记录合并到第一行, 同时去掉异常退出时可能写了一半的最后一行
+                    self.__dump_record(record)
 
         if not record:
             self.__tmp_file = "{file_name}_{uuid}".format(file_name=self.__dest_file_path, uuid=uuid.uuid4().hex)
@@ -208,21 +240,38 @@ class ResumableDownLoader(object):
         os.remove(self.__record_filepath)
         logger.debug('ResumableDownLoader delete record_file, path: {0}'.format(self.__record_filepath))
 
+    def __get_part_crc64(self, part):
+        """下载时没有记录crc64的分块(如旧版本的record文件), 从文件中分段读取计算"""
+        if part.crc64 is not None:
+            return part.crc64
+        crc64 = 0
+        with FileRangeReader(self.__dest_file_path, part.start, part.length) as f:
+            chunk = f.read(DEFAULT_CHUNK_SIZE)
+            while chunk:
+                crc64 = crc64_ecma(chunk, crc64)
+                chunk = f.read(DEFAULT_CHUNK_SIZE)
+        return crc64
+
     def __check_crc(self):
         logger.debug('start to check crc')
-        c64 = crcmod.mkCrcFun(0x142F0E1EBA9EA3693, initCrc=0, xorOut=0xffffffffffffffff, rev=True)
-        with open(self.__dest_file_path, 'rb') as f:
-            local_crc64 = str(c64(f.read()))
-        object_crc64 = self.__object_info['x-cos-hash-crc64ecma']
+        # 各分块的crc64在下载时已经计算, 按顺序合并即可得到整个文件的crc64, 不需要再读一遍文件
+        finished_parts = dict((part.part_id, part) for part in self.__finished_parts)
+        crc64 = 0
+        for part in self.__splite_to_parts():
+            part = finished_parts.get(part.part_id, part)
+            crc64 = crc64_combine(crc64, self.__get_part_crc64(part), part.length)
+        local_crc64 = str(crc64)
+        object_crc64 = self.__object_info.get('x-cos-hash-crc64ecma')
         if local_crc64 is not None and object_crc64 is not None and local_crc64 != object_crc64:
             raise CosClientError('crc of client: {0} is mismatch with cos: {1}'.format(local_crc64, object_crc64))
 
 
 class PartInfo(object):
-    def __init__(self, part_id, start, length):
+    def __init__(self, part_id, start, length, crc64=None):
         self.part_id = part_id
         self.start = start
         self.length = length
+        self.crc64 = crc64
 
     def __eq__(self, other):
         return self.__key() == other.__key()
@@ -1,15 +1,27 @@
 # -*- coding=utf-8
+import io
 import os
 import uuid
+from .cos_comm import crc64_ecma
 
 
-class StreamBody(object):
+class StreamBody(io.RawIOBase):
+    """get_object等接口返回的文件流
+
+    内部持有一个持续使用的读取迭代器和缓冲区, 多次小块读取不会重复创建迭代器, 读取到末尾返回b''.
+    实现了io.RawIOBase的readinto, 可以用io.BufferedReader包装后交给gzip, tarfile等按流读取的模块.
+    """
+    _MIN_BLOCK_SIZE = 64 * 1024  # 从连接中读取数据的最小块大小
+
     def __init__(self, rt):
         self._rt = rt
         self._read_len = 0
         self._content_len = 0
         self._use_chunked = False
         self._use_encoding = False
+        self._iter = None  # 解压后内容的迭代器, 第一次读取时创建
+        self._buffer = b''  # 从迭代器中取出但尚未返回的数据
+        self._buffer_pos = 0
         if 'Content-Length' in self._rt.headers:
             self._content_len = int(self._rt.headers['Content-Length'])
         elif 'Transfer-Encoding' in self._rt.headers and self._rt.headers['Transfer-Encoding'] == "chunked":
@@ -20,32 +32,96 @@ class StreamBody(object):
         if 'Content-Encoding' in self._rt.headers:
             self._use_encoding = True
 
+    def __del__(self):
+        # io.IOBase回收时会调用close, 这里不释放连接, 避免get_raw_stream返回的原始流被提前关闭
+        pass
+
     def __iter__(self):
         """提供一个默认的迭代器"""
-        return self._rt.iter_content(1024)
+        return self.get_stream(1024)
 
     def __len__(self):
         return self._content_len
 
+    def readable(self):
+        return True
+
+    def close(self):
+        """释放连接, 未读取完的数据被丢弃"""
+        if not self.closed:
+            self._rt.close()
+        super(StreamBody, self).close()
+
     def get_raw_stream(self):
         """提供原始流"""
         return self._rt.raw
 
     def get_stream(self, chunk_size=1024):
         """提供一个chunk可变的迭代器"""
-        return self._rt.iter_content(chunk_size=chunk_size)
+        while True:
+            chunk = self._read_decoded(chunk_size)
+            if not chunk:
+                break
+            yield chunk
 
-    def read(self, chunk_size=1024, auto_decompress=False):
-        chunk = None
-        if self._use_encoding and not auto_decompress:
-            chunk = self._rt.raw.read(chunk_size)
+    def _fill_buffer(self, size):
+        """缓冲区为空时从迭代器中取出下一块, 返回False表示已经读完"""
+        if self._buffer_pos < len(self._buffer):
+            return True
+        if self._iter is None:
+            self._iter = self._rt.iter_content(max(size, self._MIN_BLOCK_SIZE))
+        self._buffer = b''
+        self._buffer_pos = 0
+        for chunk in self._iter:
+            if chunk:
+                self._buffer = chunk
+                return True
+        return False
+
+    def _read_decoded(self, size):
+        """读取最多size字节解压后的数据"""
+        if not self._fill_buffer(size):
+            return b''
+        start = self._buffer_pos
+        if start == 0 and size >= len(self._buffer):
+            chunk = self._buffer
         else:
-            try:
-                chunk = next(self._rt.iter_content(chunk_size))
-            except StopIteration:
-                return ''
+            chunk = self._buffer[start:start + size]
+        self._buffer_pos += len(chunk)
         return chunk
 
+    def read(self, chunk_size=1024, auto_decompress=False):
+        """读取最多chunk_size字节, chunk_size为None或负数时读取全部剩余数据"""
+        if chunk_size is None or chunk_size < 0:
+            return self.readall(auto_decompress)
+        if self._use_encoding and not auto_decompress:
+            return self._rt.raw.read(chunk_size)
+        return self._read_decoded(chunk_size)
+
+    def readall(self, auto_decompress=False):
+        chunks = []
+        while True:
+            chunk = self.read(1024 * 1024, auto_decompress)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def readinto(self, b):
+        """读取数据写入预先分配的buffer中, 返回读取的字节数, 0表示已经读完"""
+        view = memoryview(b)
+        if self._use_encoding:
+            data = self._rt.raw.read(len(view))
+            view[:len(data)] = data
+            return len(data)
+        if not self._fill_buffer(len(view)):
+            return 0
+        start = self._buffer_pos
+        n = min(len(view), len(self._buffer) - start)
+        view[:n] = memoryview(self._buffer)[start:start + n]
+        self._buffer_pos += n
+        return n
+
     def get_stream_to_file(self, file_name, disable_tmp_file=False, auto_decompress=False):
         """保存流到本地文件"""
         self._read_len = 0
@@ -71,9 +147,10 @@ class StreamBody(object):
                 os.remove(file_name)
             os.rename(tmp_file_name, file_name)
 
-    def pget_stream_to_file(self, fdst, offset, expected_len, auto_decompress=False):
-        """保存流到本地文件的offset偏移"""
+    def pget_stream_to_file(self, fdst, offset, expected_len, auto_decompress=False, enable_crc=False):
+        """保存流到本地文件的offset偏移, enable_crc为True时返回写入数据的crc64"""
         self._read_len = 0
+        crc64 = 0
         fdst.seek(offset, 0)
         chunk_size = 1024 * 1024
         while True:
@@ -82,6 +159,34 @@ class StreamBody(object):
                 break
             self._read_len += len(chunk)
             fdst.write(chunk)
+            if enable_crc:
+                crc64 = crc64_ecma(chunk, crc64)
+
+        if not self._use_chunked and not (self._use_encoding and auto_decompress) and self._read_len != expected_len:
+            raise IOError("download failed with incomplete file")
+        if enable_crc:
+            return crc64
+        return None
+
+    def pwrite_stream_to_fd(self, fd, offset, expected_len, auto_decompress=False, enable_crc=False):
+        """使用os.pwrite把流写入文件描述符的offset偏移, 多个线程可以共享同一个fd, enable_crc为True时返回写入数据的crc64"""
+        self._read_len = 0
+        crc64 = 0
+        chunk_size = 1024 * 1024
+        while True:
+            chunk = self.read(chunk_size, auto_decompress)
+            if not chunk:
+                break
+            view = memoryview(chunk)
+            while view:
+                written = os.pwrite(fd, view, offset + self._read_len)
+                self._read_len += written
+                view = view[written:]
+            if enable_crc:
+                crc64 = crc64_ecma(chunk, crc64)
 
         if not self._use_chunked and not (self._use_encoding and auto_decompress) and self._read_len != expected_len:
             raise IOError("download failed with incomplete file")
+        if enable_crc:
+            return crc64
+        return None
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""upload_file断点续传的本地记录"""
+
+import json
+import os
+import errno
+import hashlib
+import threading
+import logging
+from .cos_comm import read_record_journal, dump_record_journal
+
+logger = logging.getLogger(__name__)
+
+
+class UploadCheckpoint(object):
+    """upload_file断点续传的本地记录文件
+
+    第一行为上传的上下文(uploadid, 本地文件的路径/大小/修改时间/inode, 分块大小), 之后每完成一个分块追加一行分块序号和ETag.
+    本地文件或分块大小发生变化时记录失效. 续传时直接使用记录中的uploadid和已完成的分块,
+    不需要列出服务端的分块上传, 也不需要重新读取本地文件计算已上传分块的MD5.
+
+    :param record_dir(string): 保存记录文件的目录, 为空时使用~/.cos_upload_record.
+    :param bucket(string): 存储桶名称.
+    :param key(string): COS路径.
+    :param local_path(string): 本地文件路径.
+    :param part_size(int): 分块大小, 单位为字节.
+    """
+
+    def __init__(self, record_dir, bucket, key, local_path, part_size):
+        local_path = os.path.abspath(local_path)
+        stat = os.stat(local_path)
+        self._context = {'bucket': bucket, 'key': key, 'local_path': local_path, 'file_size': stat.st_size,
+                         'mtime': stat.st_mtime, 'inode': stat.st_ino, 'part_size': part_size}
+        self.upload_id = None
+        self.parts = dict()  # 已完成的分块序号 -> ETag
+        self._lock = threading.Lock()
+        self._fp = None  # 以追加方式打开的记录文件, 每完成一个分块追加一行
+
+        if not record_dir:
+            record_dir = os.path.join(os.path.expanduser('~'), '.cos_upload_record')
+        if not os.path.exists(record_dir):
+            # 多进程并发情况下makedirs会出现冲突, 需要进行异常捕获
+            try:
+                os.makedirs(record_dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    logger.error('os makedir error: dir: {0}, errno {1}'.format(record_dir, e.errno))
+                    raise
+        key_md5 = hashlib.md5(key.encode('utf-8')).hexdigest()
+        path_md5 = hashlib.md5(local_path.encode('utf-8')).hexdigest()
+        self._record_path = os.path.join(record_dir, '{0}_{1}.{2}'.format(bucket, key_md5, path_md5))
+
+    @property
+    def record_path(self):
+        return self._record_path
+
+    def load(self):
+        """读取记录, 记录与当前的本地文件和分块大小一致时返回uploadid, 否则删除记录并返回None"""
+        if not os.path.exists(self._record_path):
+            return None
+        try:
+            record = read_record_journal(self._record_path)
+        except (IOError, ValueError, KeyError) as e:
+            logger.warning('read upload record {0} failed: {1}'.format(self._record_path, e))
+            record = None
+        if record is None or any(record.get(k) != v for k, v in self._context.items()):
+            logger.info('upload record {0} is outdated, discard it'.format(self._record_path))
+            self.delete()
+            return None
+        self.upload_id = record['upload_id']
+        self.parts = dict((int(p['part_num']), p['etag']) for p in record['parts'])
+        self._dump()
+        logger.debug('load upload record: uploadid: {0}, finished parts nums: {1}'.format(self.upload_id, len(self.parts)))
+        return self.upload_id
+
+    def create(self, upload_id):
+        """为新的分块上传创建记录"""
+        self.upload_id = upload_id
+        self.parts = dict()
+        self._dump()
+
+    def reset_parts(self, parts):
+        """只保留校验通过的分块
+
+        :param parts(dict): 分块序号 -> ETag.
+        """
+        self.parts = dict(parts)
+        self._dump()
+
+    def open(self):
+        self._fp = open(self._record_path, 'a')
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def finish_part(self, part_num, etag):
+        """记录一个上传完成的分块, 只追加一行, 开销与已完成的分块数无关"""
+        entry = json.dumps({'part_num': part_num, 'etag': etag})
+        with self._lock:
+            self.parts[part_num] = etag
+            self._fp.write(entry + '\n')
+            self._fp.flush()
+
+    def delete(self):
+        self.close()
+        if os.path.exists(self._record_path):
+            os.remove(self._record_path)
+            logger.debug('delete upload record, path: {0}'.format(self._record_path))
+
+    def _dump(self):
+        """整体写入记录文件, 已完成的分块合并到第一行"""
+        record = dict(self._context)
+        record['upload_id'] = self.upload_id
+        record['parts'] = [{'part_num': n, 'etag': etag} for n, etag in sorted(self.parts.items())]
+        dump_record_journal(self._record_path, record)
@@ -41,5 +41,8 @@ setup(
     description='cos-python-sdk-v5',
     long_description=long_description(),
     packages=find_packages(),
-    install_requires=requirements()
+    install_requires=requirements(),
+    extras_require={
+        'async': ['aiohttp'],  # AsyncCosS3Client依赖aiohttp, 仅支持python3
+    }
 )
@@ -9,6 +9,7 @@ import requests
 import json
 import base64
 import multiprocessing
+import threading
 
 from qcloud_cos import CosS3Client, MetaInsightClient, CosVectorsClient, AIRecognitionClient
 from qcloud_cos import CosConfig
@@ -277,6 +278,128 @@ def tearDown():
     print("function teardown")
 
 
+def test_file_range_reader():
+    from qcloud_cos.cos_comm import FileRangeReader
+    file_name = 'tmp_file_range_reader'
+    raw = os.urandom(2048)
+    with open(file_name, 'wb') as f:
+        f.write(raw)
+    with FileRangeReader(file_name, 100, 1000) as r:
+        assert len(r) == 1000
+        assert r.read(10) == raw[100:110]
+        assert r.tell() == 10
+        assert r.read() == raw[110:1100]
+        assert r.read(1) == b''
+        r.seek(0)
+        assert r.read(2000) == raw[100:1100]
+    if os.path.exists(file_name):
+        os.remove(file_name)
+
+
+def test_crc64_combine():
+    from qcloud_cos.cos_comm import crc64_ecma, crc64_combine
+    data = os.urandom(3 * 1024 + 5)
+    crc64 = 0
+    for offset in range(0, len(data), 1024):
+        part = data[offset:offset + 1024]
+        crc64 = crc64_combine(crc64, crc64_ecma(part), len(part))
+    assert crc64 == crc64_ecma(data)
+    assert crc64_combine(crc64, crc64_ecma(b''), 0) == crc64
+
+
+def test_upload_checkpoint():
+    """upload_file断点续传的本地记录, 本地文件变化后记录失效"""
+    from qcloud_cos.upload_checkpoint import UploadCheckpoint
+    file_name = 'tmp_upload_checkpoint'
+    record_dir = 'tmp_upload_record'
+    with open(file_name, 'wb') as f:
+        f.write(os.urandom(1024))
+    checkpoint = UploadCheckpoint(record_dir, test_bucket, file_name, file_name, 1024 * 1024)
+    assert checkpoint.load() is None
+    checkpoint.create('uploadid')
+    checkpoint.open()
+    checkpoint.finish_part(1, '"etag1"')
+    checkpoint.finish_part(2, '"etag2"')
+    checkpoint.close()
+    with open(checkpoint.record_path, 'a') as f:
+        f.write('{"part_num": 3, "et')  # 模拟异常退出时写了一半的记录
+
+    checkpoint = UploadCheckpoint(record_dir, test_bucket, file_name, file_name, 1024 * 1024)
+    assert checkpoint.load() == 'uploadid'
+    assert checkpoint.parts == {1: '"etag1"', 2: '"etag2"'}
+    # 分块大小不同时记录失效
+    assert UploadCheckpoint(record_dir, test_bucket, file_name, file_name, 2 * 1024 * 1024).load() is None
+    assert not os.path.exists(checkpoint.record_path)
+
+    checkpoint.create('uploadid')
+    time.sleep(0.01)
+    with open(file_name, 'ab') as f:
+        f.write(b'changed')
+    assert UploadCheckpoint(record_dir, test_bucket, file_name, file_name, 1024 * 1024).load() is None
+    os.remove(file_name)
+    os.rmdir(record_dir)
+
+
+def test_upload_checkpoint_all_parts_done():
+    """记录中所有分块都已上传, 但uploadid已经不存在时, 删除记录并重新上传"""
+    file_name = 'tmp_upload_checkpoint_done'
+    record_dir = 'tmp_upload_record_done'
+    gen_file(file_name, 3)
+    complete = client.complete_multipart_upload
+
+    def fail_complete(*args, **kwargs):
+        raise CosClientError('simulated crash before complete')
+    client.complete_multipart_upload = fail_complete
+    try:
+        client.upload_file(Bucket=test_bucket, Key=file_name, LocalFilePath=file_name, PartSize=1,
+                           EnableCheckpoint=True, DumpRecordDir=record_dir)
+        assert False
+    except CosClientError:
+        pass
+    finally:
+        client.complete_multipart_upload = complete
+    # 记录中的uploadid被中止(过期), 续传时所有分块都在记录中
+    for upload in client.iter_multipart_uploads(Bucket=test_bucket, Prefix=file_name):
+        client.abort_multipart_upload(Bucket=test_bucket, Key=upload['Key'], UploadId=upload['UploadId'])
+    assert len(os.listdir(record_dir)) == 1
+
+    client.upload_file(Bucket=test_bucket, Key=file_name, LocalFilePath=file_name, PartSize=1,
+                       EnableCheckpoint=True, DumpRecordDir=record_dir)
+    assert os.listdir(record_dir) == []
+    response = client.head_object(Bucket=test_bucket, Key=file_name)
+    assert int(response['Content-Length']) == os.path.getsize(file_name)
+    os.remove(file_name)
+    os.rmdir(record_dir)
+
+
+def test_buffer_pool():
+    import io
+    from qcloud_cos.cos_comm import BufferPool, readinto_full
+    pool = BufferPool(8, 2)
+    buf1 = pool.acquire()
+    buf2 = pool.acquire()
+    assert len(buf1) == 8 and buf1 is not buf2
+    pool.release(buf1)
+    assert pool.acquire() is buf1
+    assert readinto_full(io.BytesIO(b'0123456789'), buf2) == 8
+    assert bytes(buf2) == b'01234567'
+    assert readinto_full(io.BytesIO(b'abc'), buf1) == 3
+
+
+def test_cos_comm_xml_to_dict():
+    from qcloud_cos.cos_comm import xml_to_dict
+    data = xml_to_dict(u'<ListBucketResult xmlns="http://www.qcloud.com/document/product/436/7751"><Name>b</Name>'
+                       u'<Contents><Key>a</Key><Size>1</Size></Contents><Contents><Key>b</Key><Size>2</Size></Contents>'
+                       u'<Prefix/></ListBucketResult>'.encode('utf-8'))
+    assert data == {'Name': 'b', 'Contents': [{'Key': 'a', 'Size': '1'}, {'Key': 'b', 'Size': '2'}], 'Prefix': None}
+
+    data = xml_to_dict(b'<AccessControlPolicy><Owner><DisplayName>type</DisplayName></Owner><AccessControlList><Grant>'
+                       b'<Grantee xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:type="Group"><URI>u</URI></Grantee>'
+                       b'</Grant></AccessControlList></AccessControlPolicy>', "type", "Type")
+    assert data['AccessControlList']['Grant']['Grantee'] == {'Type': 'Group', 'URI': 'u'}
+    assert data['Owner']['DisplayName'] == 'type'
+
+
 def test_cos_comm_format_region():
     from qcloud_cos.cos_comm import format_region
     try:
@@ -432,6 +555,56 @@ def test_get_object_special_names():
     assert response
 
 
+def test_get_object_buffered_read():
+    """以文件流的方式读取下载内容"""
+    import io
+    data = os.urandom(200 * 1024 + 1)
+    client.put_object(Bucket=test_bucket, Key=test_object, Body=data)
+    body = client.get_object(Bucket=test_bucket, Key=test_object)['Body']
+    assert body.read(10) == data[:10]
+    buf = bytearray(1000)
+    n = body.readinto(buf)
+    assert bytes(buf[:n]) == data[10:10 + n]
+    assert body.read(-1) == data[10 + n:]
+    assert body.read(1) == b''
+    body = client.get_object(Bucket=test_bucket, Key=test_object)['Body']
+    with io.BufferedReader(body) as reader:
+        assert reader.read(7) + reader.read() == data
+
+
+def test_open_object_read():
+    """以可seek的文件对象读取cos上的文件"""
+    data = os.urandom(3 * 1024 * 1024 + 7)
+    client.put_object(Bucket=test_bucket, Key=test_object, Body=data)
+    with client.open(Bucket=test_bucket, Key=test_object, BlockSize=512 * 1024) as fp:
+        assert fp.read(10) == data[:10]
+        fp.seek(-7, os.SEEK_END)
+        assert fp.read() == data[-7:]
+        fp.seek(100)
+        assert fp.read() == data[100:]
+        stats = fp.get_stats()
+        assert stats['requests'] > 0
+        assert stats['prefetch_hits'] + stats['hits'] > 0
+    with client.open(Bucket=test_bucket, Key=test_object, Mode='r') as fp:
+        assert fp.read(10) == data[:10]
+
+
+def test_open_object_write():
+    """以文件对象的方式流式上传文件"""
+    import io
+    import gzip
+    with client.open(Bucket=test_bucket, Key=test_object, Mode='wb') as fp:
+        fp.write(b'small object')
+    assert fp.response['ETag']
+    data = os.urandom(3 * 1024 * 1024 + 7)
+    with client.open(Bucket=test_bucket, Key=test_object + '.gz', Mode='wb', PartSize=1) as fp:
+        with gzip.GzipFile(fileobj=fp, mode='wb') as gz:
+            gz.write(data)
+    body = client.get_object(Bucket=test_bucket, Key=test_object + '.gz')['Body']
+    assert gzip.GzipFile(fileobj=io.BufferedReader(body)).read() == data
+    client.delete_object(Bucket=test_bucket, Key=test_object + '.gz')
+
+
 def test_delete_object_special_names():
     """特殊字符文件删除"""
     response = client.delete_object(
@@ -764,6 +937,146 @@ def test_list_objects():
         print(e)
 
 
+def test_list_objects_stream():
+    """流式列出bucket下的objects"""
+    response = client.list_objects(Bucket=test_bucket, MaxKeys=100)
+    result = client.list_objects_stream(Bucket=test_bucket, MaxKeys=100)
+    keys = [obj.Key for obj in result]
+    assert keys == [obj['Key'] for obj in response.get('Contents', [])]
+    assert result.is_truncated == (response['IsTruncated'] == 'true')
+
+    result = client.list_objects_versions_stream(Bucket=test_bucket, MaxKeys=50)
+    for version in result:
+        assert version.Key and version.VersionId
+    try:
+        list(result)
+    except CosClientError as e:
+        print(e)
+
+
+def test_iter_objects():
+    """自动翻页遍历bucket下的objects"""
+    response = client.list_objects(Bucket=test_bucket, MaxKeys=1000)
+    keys = [obj['Key'] for obj in client.iter_objects(Bucket=test_bucket, MaxKeys=10)]
+    if response['IsTruncated'] == 'false':
+        assert keys == [obj['Key'] for obj in response.get('Contents', [])]
+    assert keys == sorted(keys)
+    for page in client.iter_objects(Bucket=test_bucket, Delimiter='/', MaxKeys=10, Prefetch=False).pages():
+        assert 'IsTruncated' in page
+    for version in client.iter_object_versions(Bucket=test_bucket, MaxKeys=10):
+        assert version['IsDeleteMarker'] in ('true', 'false')
+
+
+def test_iter_object_versions_order():
+    """同一个key的版本和删除标记按修改时间从新到旧产出, 不修改pages()返回的结果"""
+    page = {
+        'IsTruncated': 'false',
+        'Version': [
+            {'Key': 'a', 'VersionId': 'a2', 'IsLatest': 'false', 'LastModified': '2024-01-02T00:00:00.000Z'},
+            {'Key': 'a', 'VersionId': 'a1', 'IsLatest': 'false', 'LastModified': '2024-01-01T00:00:00.000Z'},
+            {'Key': 'b', 'VersionId': 'b1', 'IsLatest': 'true', 'LastModified': '2024-01-01T00:00:00.000Z'},
+        ],
+        'DeleteMarker': [
+            {'Key': 'a', 'VersionId': 'a3', 'IsLatest': 'true', 'LastModified': '2024-01-03T00:00:00.000Z'},
+        ],
+    }
+    list_objects_versions = client.list_objects_versions
+    client.list_objects_versions = lambda **kwargs: page
+    try:
+        versions = list(client.iter_object_versions(Bucket=test_bucket, Prefetch=False))
+    finally:
+        client.list_objects_versions = list_objects_versions
+    assert [v['VersionId'] for v in versions] == ['a3', 'a2', 'a1', 'b1']
+    assert [v['IsDeleteMarker'] for v in versions] == ['true', 'false', 'false', 'false']
+    assert 'IsDeleteMarker' not in page['Version'][0]
+    assert 'IsDeleteMarker' not in page['DeleteMarker'][0]
+
+
+def test_iter_objects_parallel():
+    """多线程并发遍历bucket下的objects"""
+    keys = [obj['Key'] for obj in client.iter_objects(Bucket=test_bucket)]
+    lister = client.iter_objects_parallel(Bucket=test_bucket, MaxThread=4, MaxKeys=100)
+    assert [obj['Key'] for obj in lister] == keys
+    assert lister.get_metrics()['keys'] == len(keys)
+    lister = client.iter_objects_parallel(Bucket=test_bucket, MaxThread=4, Ordered=False)
+    assert sorted([obj['Key'] for obj in lister]) == keys
+    # 缓存很小时按顺序产出的结果不变
+    lister = client.iter_objects_parallel(Bucket=test_bucket, MaxThread=4, MaxKeys=10, MaxBufferedKeys=10)
+    assert [obj['Key'] for obj in lister] == keys
+
+
+def test_task_group():
+    """共享线程池上的任务组, 任意任务失败后取消剩余任务并抛出原始异常"""
+    from qcloud_cos.cos_threadpool import TaskGroup, get_shared_executor
+
+    def _task(i):
+        if i == 3:
+            raise CosClientError('task failed')
+        time.sleep(0.1)
+        return i
+
+    pool = TaskGroup(get_shared_executor(8), max_concurrency=2)
+    futures = [pool.submit(_task, i) for i in range(10)]
+    try:
+        pool.wait()
+        assert False
+    except CosClientError as e:
+        assert 'task failed' in str(e)
+    assert any(f.cancelled() for f in futures)
+    assert futures[0].result() == 0
+
+    # 在共享线程池的任务中提交的任务直接在当前线程执行, 不会占满线程池导致死锁
+    outer = TaskGroup(get_shared_executor(8), max_concurrency=8, keep_futures=True)
+    for i in range(8):
+        outer.submit(lambda: TaskGroup(get_shared_executor(8)).submit(_task, 0).result())
+    assert [f.result() for f in outer.wait()] == [0] * 8
+
+    # 默认不保留Future, 大量任务时内存不随任务数增长
+    pool = TaskGroup(get_shared_executor(8), max_concurrency=4)
+    for i in range(1000):
+        pool.submit(lambda: None)
+    assert pool.wait() == []
+    assert pool._futures is None
+
+
+def test_transfer_tuner():
+    """AutoTune根据吞吐增加并发, 收到503(SlowDown)后减半并且不再超过触发限流的并发"""
+    from qcloud_cos.cos_threadpool import TaskGroup, get_shared_executor
+    from qcloud_cos.cos_autotune import TransferTuner, choose_part_size, record_throttle
+    lock = threading.Lock()
+    state = {'running': 0}
+
+    def _part():
+        # 模拟服务端: 同时超过4个请求时返回503, send_request在重试前记录限流
+        with lock:
+            state['running'] += 1
+            throttled = state['running'] > 4
+        try:
+            if throttled:
+                record_throttle()
+                time.sleep(0.05)
+            time.sleep(0.02)
+        finally:
+            with lock:
+                state['running'] -= 1
+
+    pool = TaskGroup(get_shared_executor(32), max_concurrency=16)
+    tuner = TransferTuner(pool, 16, 1024)
+    for i in range(200):
+        pool.submit(tuner.run, 1024, _part)
+    pool.wait()
+    result = tuner.get_result()
+    assert result['Parts'] == 200
+    assert result['SlowDowns'] > 0
+    assert result['MaxConcurrency'] > 2
+    assert result['Concurrency'] <= 4
+    assert 'slowdown' in [h['Reason'] for h in result['History']]
+
+    assert choose_part_size(10 * 1024 * 1024, 5) == 4
+    assert choose_part_size(1024 * 1024 * 1024, 5) == 52
+    assert choose_part_size(5 * 1024 * 1024 * 1024 * 1024, 5) == 525
+
+
 def test_list_objects_versions():
     """列出bucket下的带版本信息的objects"""
     response = client.list_objects_versions(
@@ -804,6 +1117,47 @@ def test_get_presigned_url():
     print(url)
 
 
+def test_generate_presigned_urls():
+    """批量生成预签名url, 结果与get_presigned_url一致"""
+    keys = ['中文.txt', 'dir/a b.txt', '/abs/key'] + ['batch/obj_%d' % i for i in range(10)]
+    params = {'response-content-type': 'text/plain'}
+    now = time.time()
+    real_time = time.time
+    time.time = lambda: now  # 固定签名时间
+    try:
+        expected = [client.get_presigned_url(Bucket=test_bucket, Key=key, Method='GET', Expired=600, Params=params)
+                    for key in keys]
+        urls = client.generate_presigned_urls(Bucket=test_bucket, Keys=iter(keys), Method='GET', Expired=600,
+                                              Params=params)
+        assert list(urls) == expected
+    finally:
+        time.time = real_time
+
+    client.put_object(Bucket=test_bucket, Key='batch/obj_0', Body='presigned')
+    url = next(client.generate_presigned_urls(Bucket=test_bucket, Keys=['batch/obj_0']))
+    response = requests.get(url)
+    assert response.status_code == 200
+    assert response.content == b'presigned'
+
+
+def test_presigned_url_cache():
+    """开启预签名url缓存后, 相同参数在剩余有效时间足够时返回缓存的url"""
+    cache_conf = CosConfig(Region=REGION, SecretId=SECRET_ID, SecretKey=SECRET_KEY, PresignedUrlCacheSize=2,
+                           PresignedUrlMinValidity=60)
+    cache_client = CosS3Client(cache_conf)
+    url = cache_client.get_presigned_download_url(Bucket=test_bucket, Key='cache_a', Expired=600)
+    time.sleep(1.1)
+    assert cache_client.get_presigned_download_url(Bucket=test_bucket, Key='cache_a', Expired=600) == url
+    assert cache_client.get_presigned_download_url(Bucket=test_bucket, Key='cache_a', Expired=900) != url
+    # 超过缓存大小时淘汰最久未使用的url
+    cache_client.get_presigned_download_url(Bucket=test_bucket, Key='cache_b', Expired=600)
+    assert cache_client.get_presigned_download_url(Bucket=test_bucket, Key='cache_a', Expired=600) != url
+    # 有效时间不超过PresignedUrlMinValidity的url不缓存
+    url = cache_client.get_presigned_download_url(Bucket=test_bucket, Key='cache_c', Expired=30)
+    time.sleep(1.1)
+    assert cache_client.get_presigned_download_url(Bucket=test_bucket, Key='cache_c', Expired=30) != url
+
+
 def test_get_bucket_location():
     """获取bucket的地域信息"""
     response = client.get_bucket_location(
@@ -1334,6 +1688,204 @@ def test_upload_file_multithreading():
     print(ed - st)
 
 
+def test_upload_directory():
+    """上传本地目录, 小文件简单上传, 大文件分块上传, 再次上传时跳过未变化的文件"""
+    import shutil
+    local_dir = 'tmp_upload_directory'
+    os.makedirs(os.path.join(local_dir, 'sub'))
+    for i in range(5):
+        gen_file_small(os.path.join(local_dir, 'small_%d' % i), 1024)
+    gen_file(os.path.join(local_dir, 'sub', 'large'), 3)
+    response = client.upload_directory(
+        Bucket=test_bucket,
+        LocalDir=local_dir,
+        Prefix='upload_directory/',
+        PartSize=1,
+        MAXThread=5
+    )
+    assert response['Files'] == 6
+    assert response['Failed'] == []
+    response = client.head_object(Bucket=test_bucket, Key='upload_directory/sub/large')
+    assert int(response['Content-Length']) == 3 * 1024 * 1024
+
+    response = client.upload_directory(
+        Bucket=test_bucket,
+        LocalDir=local_dir,
+        Prefix='upload_directory/',
+        PartSize=1,
+        SkipUnchanged=True
+    )
+    assert response['Skipped'] == 6
+    assert response['Files'] == 0
+    shutil.rmtree(local_dir)
+
+
+def test_download_directory():
+    """下载目录, 小文件一次GET下载, 大文件分块下载, 再次下载时跳过未变化的文件"""
+    import shutil
+    local_dir = 'tmp_download_directory'
+    file_name = 'tmp_download_directory_large'
+    gen_file(file_name, 3)
+    client.upload_file(Bucket=test_bucket, Key='download_directory/sub/large', LocalFilePath=file_name)
+    for i in range(3):
+        client.put_object(Bucket=test_bucket, Key='download_directory/small_%d' % i, Body='x' * 1024)
+    response = client.download_directory(
+        Bucket=test_bucket,
+        Prefix='download_directory/',
+        LocalDir=local_dir,
+        PartSize=1,
+        MAXThread=5
+    )
+    assert response['Files'] == 4
+    assert response['Failed'] == []
+    with open(os.path.join(local_dir, 'sub', 'large'), 'rb') as f1, open(file_name, 'rb') as f2:
+        assert f1.read() == f2.read()
+
+    response = client.download_directory(
+        Bucket=test_bucket,
+        Prefix='download_directory/',
+        LocalDir=local_dir,
+        PartSize=1,
+        SkipUnchanged=True
+    )
+    assert response['Skipped'] == 4
+    assert response['Files'] == 0
+    shutil.rmtree(local_dir)
+    os.remove(file_name)
+
+
+def test_sync():
+    """同步本地目录到COS, 先dry run查看计划的操作, 再同步并删除COS上多余的对象"""
+    import io
+    import json
+    import shutil
+    local_dir = 'tmp_sync'
+    os.makedirs(os.path.join(local_dir, 'sub'))
+    for i in range(3):
+        with open(os.path.join(local_dir, 'sub', 'file_%d' % i), 'w') as f:
+            f.write('x' * 1024 * (i + 1))
+    client.put_object(Bucket=test_bucket, Key='sync/extra', Body='extra')
+    destination = {'Bucket': test_bucket, 'Prefix': 'sync/'}
+
+    action_log = io.StringIO()
+    response = client.sync(Source=local_dir, Destination=destination, Delete=True, DryRun=True, ActionLog=action_log)
+    assert response['Planned'] == {'upload': 3, 'delete': 1}
+    actions = [json.loads(line) for line in action_log.getvalue().splitlines()]
+    assert all(action['Status'] == 'planned' for action in actions)
+    assert client.object_exists(Bucket=test_bucket, Key='sync/extra')
+
+    action_log = io.StringIO()
+    response = client.sync(Source=local_dir, Destination=destination, Delete=True, ActionLog=action_log)
+    assert response['Done'] == 4
+    assert response['Failed'] == []
+    actions = [json.loads(line) for line in action_log.getvalue().splitlines()]
+    assert sorted(action['Key'] for action in actions if action['Status'] == 'done') == \
+        ['extra', 'sub/file_0', 'sub/file_1', 'sub/file_2']
+    assert not client.object_exists(Bucket=test_bucket, Key='sync/extra')
+
+    # 再次同步时没有需要执行的操作
+    response = client.sync(Source=local_dir, Destination=destination, Delete=True, Checksum=True)
+    assert response['Planned'] == {}
+    assert response['Unchanged'] == 3
+    shutil.rmtree(local_dir)
+
+    # COS之间同步, 超过分块拷贝阈值并且改变存储类型的对象按分块拷贝
+    threshold = client._conf._copy_part_threshold_size
+    client._conf._copy_part_threshold_size = 2 * 1024
+    try:
+        response = client.sync(Source=destination, Destination={'Bucket': test_bucket, 'Prefix': 'sync_copy/'},
+                               PartSize=1, StorageClass='STANDARD_IA')
+    finally:
+        client._conf._copy_part_threshold_size = threshold
+    assert response['Done'] == 3
+    assert response['Failed'] == []
+    response = client.head_object(Bucket=test_bucket, Key='sync_copy/sub/file_2')
+    assert response['Content-Length'] == str(3 * 1024)
+    client.delete_prefix(Bucket=test_bucket, Prefix='sync_copy/')
+
+
+def test_sync_download_outside_local_dir():
+    """COS同步到本地时, 包含..而超出本地目录的key记录为失败, 不写入本地目录之外"""
+    import shutil
+    local_dir = os.path.join('tmp_sync_down', 'inner')
+    objects = [
+        {'Key': 'sync_down/../../escaped.txt', 'Size': '1', 'ETag': '"x"', 'LastModified': '2024-01-01T00:00:00.000Z'},
+    ]
+    iter_objects = client.iter_objects
+    client.iter_objects = lambda **kwargs: iter(objects)
+    try:
+        for dry_run in (True, False):
+            response = client.sync(Source={'Bucket': test_bucket, 'Prefix': 'sync_down/'}, Destination=local_dir,
+                                   DryRun=dry_run)
+            assert response['Planned'] == {}
+            assert [f['Key'] for f in response['Failed']] == ['../../escaped.txt']
+    finally:
+        client.iter_objects = iter_objects
+    assert not os.path.exists('escaped.txt')
+    shutil.rmtree('tmp_sync_down', ignore_errors=True)
+
+
+def test_delete_prefix():
+    """按1000个一批并发删除前缀下的对象, bulk_delete返回删除失败的对象"""
+    keys = ['delete_prefix/obj_%d' % i for i in range(20)]
+    for key in keys:
+        client.put_object(Bucket=test_bucket, Key=key, Body='x')
+    response = client.bulk_delete(Bucket=test_bucket, Keys=iter(keys[:5]), MAXThread=2)
+    assert response['Deleted'] == 5
+    assert response['Failed'] == []
+    assert not client.object_exists(Bucket=test_bucket, Key=keys[0])
+
+    response = client.delete_prefix(Bucket=test_bucket, Prefix='delete_prefix/', MAXThread=2)
+    assert response['Deleted'] == 15
+    assert response['Requests'] == 1
+    assert not client.object_exists(Bucket=test_bucket, Key=keys[-1])
+
+
+def test_head_objects():
+    """并发查询多个对象的元数据, 不存在的对象不抛出异常"""
+    keys = ['head_objects/obj_%d' % i for i in range(10)]
+    for key in keys[:5]:
+        client.put_object(Bucket=test_bucket, Key=key, Body='x' * 10)
+    results = list(client.head_objects(Bucket=test_bucket, Keys=iter(keys), MAXThread=3))
+    assert [r['Key'] for r in results] == keys
+    for r in results[:5]:
+        assert r['Exists'] is True
+        assert r['Metadata']['Content-Length'] == '10'
+    for r in results[5:]:
+        assert r['Exists'] is False
+        assert r['Error'] is None
+
+    results = list(client.head_objects(Bucket=test_bucket, Keys=keys, MAXThread=3, Ordered=False))
+    assert sorted(r['Key'] for r in results) == keys
+    client.bulk_delete(Bucket=test_bucket, Keys=keys[:5])
+
+
+def test_head_objects_bounded_memory():
+    """head_objects边查询边产出, 已经产出的结果不会被保留"""
+    state = {'live': 0, 'max_live': 0}
+
+    class _Response(dict):
+        def __init__(self):
+            super(_Response, self).__init__()
+            state['live'] += 1
+            state['max_live'] = max(state['max_live'], state['live'])
+
+        def __del__(self):
+            state['live'] -= 1
+
+    head_object = client.head_object
+    client.head_object = lambda **kwargs: _Response()
+    try:
+        count = 0
+        for result in client.head_objects(Bucket=test_bucket, Keys=('key_%d' % i for i in range(5000)), MAXThread=4):
+            count += 1
+        del result
+    finally:
+        client.head_object = head_object
+    assert count == 5000
+    assert state['max_live'] < 100
+
+
 def multiprocessing_worker(file_name):
     gen_file(file_name, 10)
     client = CosS3Client(conf)
@@ -1437,6 +1989,22 @@ def test_use_get_auth():
     assert response.status_code == 200
 
 
+def test_sign_key_cache():
+    """签名密钥按有效时间段缓存, 缓存的结果与直接计算的一致"""
+    import hmac
+    from qcloud_cos.cos_auth import get_sign_key
+    key_time = '1700000000;1700010000'
+    sign_key = hmac.new(b'secret', to_bytes(key_time), hashlib.sha1).hexdigest()
+    assert get_sign_key('secret', key_time) == sign_key
+    assert get_sign_key('secret', key_time) == sign_key
+    assert get_sign_key('other', key_time) != sign_key
+
+    auth = client.get_auth(Method='GET', Bucket=test_bucket, Key='test.txt', Params={'acl': ''},
+                           Headers={'Content-Type': 'text/plain; charset=utf-8', 'X-Cos-Meta-Name': 'a b/c'})
+    assert 'q-header-list=content-type;host;x-cos-meta-name' in auth
+    assert 'q-url-param-list=acl' in auth
+
+
 def test_upload_with_server_side_encryption():
     """上传带上加密头部,下载时验证有该头部"""
     response = client.put_object(
@@ -1515,6 +2083,30 @@ def test_put_object_enable_md5():
         os.remove(file_name)
 
 
+def test_put_object_enable_crc():
+    """上传文件,发送数据的同时计算crc64并与服务端校验"""
+    file_name = 'test_object_sdk_caculate_crc.file'
+    gen_file(file_name, 11)
+    with open(file_name, 'rb') as fp:
+        put_response = client.put_object(
+            Bucket=test_bucket,
+            Body=fp,
+            Key=file_name,
+            EnableCRC=True
+        )
+        assert put_response['x-cos-hash-crc64ecma']
+    response = client.upload_file(
+        Bucket=test_bucket,
+        Key=file_name,
+        LocalFilePath=file_name,
+        PartSize=5,
+        EnableCRC=True
+    )
+    assert response
+    if os.path.exists(file_name):
+        os.remove(file_name)
+
+
 def test_put_object_from_local_file():
     """通过本地文件路径来上传文件"""
     file_size = 1
@@ -2532,6 +3124,20 @@ def test_aes_client2():
         os.remove('test_for_aes_local')
 
 
+def test_aes_client_read():
+    """测试以文件流的方式读取aes加密客户端下载的内容"""
+    content = b'123456' * 1024 + b'1'
+    client_for_aes.put_object(test_bucket, content, 'test_for_aes')
+    body = client_for_aes.get_object(test_bucket, 'test_for_aes')['Body']
+    assert body.read(10) == content[:10]
+    assert body.read(-1) == content[10:]
+    assert body.read(1) == b''
+    body = client_for_aes.get_object(test_bucket, 'test_for_aes')['Body']
+    assert body.read() == content[:1024]
+    assert body.read(None) == content[1024:]
+    client_for_aes.delete_object(test_bucket, 'test_for_aes')
+
+
 def test_rsa_client():
     """测试rsa加密客户端的上传下载操作"""
     content = '123456' * 1024 + '1'
@@ -7203,6 +7809,89 @@ def test_put_get_symlink_multiver():
     client.delete_object(Bucket=test_bucket, Key=symlink_name)
     client.delete_object(Bucket=test_bucket, Key=target_file_name)
 
+
+def test_async_client():
+    """测试asyncio版本的client"""
+    if sys.version_info[0] < 3:
+        return
+    import asyncio
+    from qcloud_cos.cos_async_client import AsyncCosS3Client
+    loop = asyncio.new_event_loop()
+    async_client = AsyncCosS3Client(conf, retry=3, max_connections=32)
+    try:
+        keys = ['test_async_client/' + str(i) for i in range(10)]
+
+        async def _put_all():
+            # gather需要在loop中调用, 否则会绑定到默认的事件循环
+            await asyncio.gather(*[async_client.put_object(Bucket=test_bucket, Body=to_bytes(key), Key=key) for key in keys])
+        loop.run_until_complete(_put_all())
+        response = loop.run_until_complete(async_client.get_object(Bucket=test_bucket, Key=keys[0]))
+        assert loop.run_until_complete(response['Body'].read(1024)) == to_bytes(keys[0])
+        response['Body'].close()
+        response = loop.run_until_complete(async_client.head_object(Bucket=test_bucket, Key=keys[1]))
+        assert int(response['Content-Length']) == len(keys[1])
+        response = loop.run_until_complete(async_client.list_objects(Bucket=test_bucket, Prefix='test_async_client/'))
+        assert len(response['Contents']) == len(keys)
+        assert loop.run_until_complete(async_client.object_exists(Bucket=test_bucket, Key='test_async_client/not_exist')) is False
+        response = loop.run_until_complete(async_client.delete_objects(
+            Bucket=test_bucket, Delete={'Object': [{'Key': key} for key in keys], 'Quiet': 'true'}))
+    finally:
+        loop.run_until_complete(async_client.close())
+        loop.close()
+
+
+def test_async_client_retry_file_body():
+    """asyncio版本的client上传文件流时不关闭调用方的文件, 网络错误后从原来的位置重新发送"""
+    if sys.version_info[0] < 3:
+        return
+    import asyncio
+    import aiohttp
+    from qcloud_cos.cos_async_client import AsyncCosS3Client
+
+    class _FlakySession(object):
+        """第一次请求发送完成后模拟连接断开"""
+
+        def __init__(self, session):
+            self._session = session
+            self.calls = 0
+
+        async def request(self, *args, **kwargs):
+            self.calls += 1
+            res = await self._session.request(*args, **kwargs)
+            if self.calls == 1:
+                res.release()
+                raise aiohttp.ClientConnectionError('connection reset')
+            return res
+
+    file_name = 'test_async_retry_local'
+    data = os.urandom(100 * 1024)
+    with open(file_name, 'wb') as f:
+        f.write(b'skip' + data)
+    loop = asyncio.new_event_loop()
+    async_client = AsyncCosS3Client(conf, retry=3)
+    try:
+        async def _put():
+            flaky = _FlakySession(async_client._get_session())
+            async_client._get_session = lambda: flaky
+            fp = open(file_name, 'rb')
+            fp.seek(4)
+            await async_client.put_object(Bucket=test_bucket, Body=fp, Key='test_async_retry')
+            return flaky, fp
+
+        flaky, fp = loop.run_until_complete(_put())
+        assert flaky.calls == 2
+        assert not fp.closed
+        fp.close()
+        assert async_client.get_retry_exe_times() == 1
+        response = client.get_object(Bucket=test_bucket, Key='test_async_retry')
+        assert response['Body'].read(None) == data
+        client.delete_object(Bucket=test_bucket, Key='test_async_retry')
+    finally:
+        loop.run_until_complete(async_client.close())
+        loop.close()
+        os.remove(file_name)
+
+
 if __name__ == "__main__":
     setUp()
     """
@@ -7213,6 +7902,9 @@ if __name__ == "__main__":
     test_put_get_delete_object_10MB()
     test_put_object_speacil_names()
     test_get_object_special_names()
+    test_get_object_buffered_read()
+    test_open_object_read()
+    test_open_object_write()
     test_delete_object_special_names()
     test_put_object_non_exist_bucket()
     test_put_object_acl()
@@ -7229,6 +7921,8 @@ if __name__ == "__main__":
     test_list_objects()
     test_list_objects_versions()
     test_get_presigned_url()
+    test_generate_presigned_urls()
+    test_presigned_url_cache()
     test_get_bucket_location()
     test_get_service()
     test_put_get_delete_cors()
@@ -7239,13 +7933,22 @@ if __name__ == "__main__":
     test_list_multipart_uploads()
     test_upload_file_from_buffer()
     test_upload_file_multithreading()
+    test_upload_directory()
+    test_download_directory()
+    test_sync()
+    test_sync_download_outside_local_dir()
+    test_delete_prefix()
+    test_head_objects()
+    test_head_objects_bounded_memory()
     test_upload_file_with_progress_callback()
     test_copy_file_automatically()
     test_upload_empty_file()
     test_use_get_auth()
+    test_sign_key_cache()
     test_upload_with_server_side_encryption()
     test_put_get_bucket_logging()
     test_put_object_enable_md5()
+    test_put_object_enable_crc()
     test_put_object_from_local_file()
     test_object_exists()
     test_bucket_exists()
@@ -7266,6 +7969,7 @@ if __name__ == "__main__":
     test_download_file()
     test_bucket_encryption()
     test_aes_client()
+    test_aes_client_read()
     test_rsa_client()
     test_live_channel()
     test_get_object_url()
@@ -7332,5 +8036,19 @@ if __name__ == "__main__":
     test_ci_file_hash()
     test_meta_insight()
     test_cos_vectors()
+    test_async_client()
+    test_async_client_retry_file_body()
+    test_cos_comm_xml_to_dict()
+    test_crc64_combine()
+    test_buffer_pool()
+    test_upload_checkpoint()
+    test_upload_checkpoint_all_parts_done()
+    test_file_range_reader()
+    test_list_objects_stream()
+    test_iter_objects()
+    test_iter_object_versions_order()
+    test_iter_objects_parallel()
+    test_task_group()
+    test_transfer_tuner()
     """
     tearDown()